@@ -0,0 +1,203 @@
+import argparse
+import datetime
+import json
+import random
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from models.punishments import NoteRecord, PunishmentRecord
+from services.database import Database, from_epoch_ms, to_epoch_ms
+from services.history import HistoryStore
+from services.sharding import ShardedDatabase
+
+
+FIRST_GUILD_ID = 1_000
+FIRST_USER_ID = 100_000
+FIRST_MODERATOR_ID = 10
+MODERATORS = 25
+# Fixed, so two runs with the same spec produce identical files.
+ANCHOR = datetime.datetime(2025, 1, 1)
+ACTIONS = ["Warn"] * 6 + ["Timeout"] * 3 + ["Mute"] * 2 + ["Kick", "Ban", "Softban", "Jail"]
+EMOJI = ["👍", "❤️", "🎮", "🎨", "📢", "🔔", "✅", "⭐", "<:pog:123456789012345678>", "<a:wave:223456789012345678>"]
+# FTS5 needs realistic text; a few fixed phrases give the search benchmarks stable hits.
+WORDS = (
+    "spam raid scam links phishing invite advertising slurs harassment alt account evasion "
+    "nsfw gore doxxing threats trolling flooding mentions caps emoji bot selfbot token "
+    "nitro giveaway fake crypto wallet impersonation staff appeal repeated warning final "
+    "channel voice earrape soundboard reaction images attachments malware download"
+).split()
+PHRASES = ["scam links", "raid cleanup", "alt account", "repeated spam", "ban evasion"]
+
+
+@dataclass
+class DatasetSpec:
+    guilds: int = 4
+    users: int = 2_000
+    punishments: int = 50_000
+    notes: int = 10_000
+    tickets: int = 2_000
+    reaction_messages: int = 200
+    days: int = 365
+    seed: int = 1
+
+    @property
+    def guild_ids(self) -> List[int]:
+        return [FIRST_GUILD_ID + index for index in range(self.guilds)]
+
+
+def spec_path(db_path: Path) -> Path:
+    return db_path.with_name(db_path.name + ".dataset.json")
+
+
+def load_spec(db_path: Path) -> DatasetSpec:
+    return DatasetSpec(**json.loads(spec_path(db_path).read_text()))
+
+
+def pick_user(rnd: random.Random, users: int) -> int:
+    # Cubing skews towards low indexes: a few users collect most of the history.
+    return FIRST_USER_ID + int(users * rnd.random() ** 3)
+
+
+def _reason(rnd: random.Random) -> str:
+    words = rnd.sample(WORDS, rnd.randint(2, 7))
+    if rnd.random() < 0.2:
+        words.insert(rnd.randrange(len(words) + 1), rnd.choice(PHRASES))
+    return " ".join(words)
+
+
+def _created(rnd: random.Random, days: int) -> int:
+    return to_epoch_ms(ANCHOR) - int(rnd.random() * days * 86_400_000)
+
+
+def _punishments(rnd: random.Random, spec: DatasetSpec, count: int) -> Iterator[PunishmentRecord]:
+    for _ in range(count):
+        action = rnd.choice(ACTIONS)
+        created_ms = _created(rnd, spec.days)
+        expires_ms = None
+        if action in ("Timeout", "Mute", "Jail"):
+            expires_ms = created_ms + rnd.choice([3_600_000, 86_400_000, 7 * 86_400_000])
+        yield PunishmentRecord(
+            user_id=pick_user(rnd, spec.users),
+            moderator_id=FIRST_MODERATOR_ID + rnd.randrange(MODERATORS),
+            action=action,
+            reason=_reason(rnd) if rnd.random() < 0.9 else None,
+            created_at=created_ms,
+            expires_at=expires_ms,
+        )
+
+
+def _notes(rnd: random.Random, spec: DatasetSpec, count: int) -> Iterator[NoteRecord]:
+    for _ in range(count):
+        yield NoteRecord(
+            user_id=pick_user(rnd, spec.users),
+            moderator_id=FIRST_MODERATOR_ID + rnd.randrange(MODERATORS),
+            text=_reason(rnd),
+            created_at=_created(rnd, spec.days),
+        )
+
+
+def _split(total: int, parts: int) -> List[int]:
+    base, extra = divmod(total, parts)
+    return [base + (1 if index < extra else 0) for index in range(parts)]
+
+
+def generate(db: Database, spec: DatasetSpec, *, chunk_size: int = 20_000, verbose: bool = False) -> None:
+    # Goes through HistoryStore so the FTS and counter triggers do the same work
+    # they do in production; tickets and reaction roles are plain bulk inserts.
+    rnd = random.Random(spec.seed)
+    history = HistoryStore(db)
+    started = time.perf_counter()
+    for guild_id, punishments, notes, messages in zip(
+        spec.guild_ids,
+        _split(spec.punishments, spec.guilds),
+        _split(spec.notes, spec.guilds),
+        _split(spec.reaction_messages, spec.guilds),
+    ):
+        while punishments > 0:
+            step = min(chunk_size, punishments)
+            history.add_punishments(guild_id, _punishments(rnd, spec, step))
+            punishments -= step
+            if verbose:
+                print(f"guild {guild_id}: {punishments} punishments left ({time.perf_counter() - started:.0f}s)")
+        while notes > 0:
+            step = min(chunk_size, notes)
+            history.add_notes(guild_id, _notes(rnd, spec, step))
+            notes -= step
+        with db.for_guild(guild_id).transaction() as tx:
+            tx.executemany(
+                "INSERT OR IGNORE INTO reaction_roles (guild_id, message_id, emoji, role_id, channel_id) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (guild_id, 900_000 + message, emoji, 500_000 + message * 10 + index, 700_000 + message % 5)
+                    for message in range(messages)
+                    for index, emoji in enumerate(rnd.sample(EMOJI, rnd.randint(1, 6)))
+                ),
+            )
+    # Tickets live in the catalog; each one is linked to a channel in some guild.
+    with db.transaction() as tx:
+        tickets = []
+        channels = []
+        for ticket_id in range(1, spec.tickets + 1):
+            updated_ms = _created(rnd, spec.days)
+            status = rnd.choice(["open", "open", "closed", "closed", "closed", "escalated"])
+            tickets.append(
+                (ticket_id, rnd.choice(["low", "medium", "high", "critical"]), status,
+                 pick_user(rnd, spec.users), None, from_epoch_ms(updated_ms).isoformat(), updated_ms)
+            )
+            channels.append((ticket_id, rnd.choice(spec.guild_ids), 800_000 + ticket_id))
+        tx.executemany(
+            """
+            INSERT INTO tickets (id, priority, status, reporter_id, escalated_by, updated_at, updated_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            tickets,
+        )
+        tx.executemany("INSERT INTO ticket_channels (ticket_id, guild_id, channel_id) VALUES (?, ?, ?)", channels)
+    db.flush()
+
+
+def open_database(path: Path, shard_dir: Optional[Path]) -> Database:
+    if shard_dir is not None:
+        return ShardedDatabase(path, shard_dir)
+    return Database(path)
+
+
+def main() -> None:
+    defaults = DatasetSpec()
+    parser = argparse.ArgumentParser(description="Fill a database with a synthetic, reproducible moderation dataset")
+    parser.add_argument("path", type=Path, help="Database file to create")
+    parser.add_argument("--shards", type=Path, help="Write per-guild shards into this directory")
+    parser.add_argument("--guilds", type=int, default=defaults.guilds)
+    parser.add_argument("--users", type=int, default=defaults.users, help="Users per guild")
+    parser.add_argument("--punishments", type=int, default=defaults.punishments, help="Total, split across guilds")
+    parser.add_argument("--notes", type=int, default=defaults.notes, help="Total, split across guilds")
+    parser.add_argument("--tickets", type=int, default=defaults.tickets)
+    parser.add_argument("--reaction-messages", type=int, default=defaults.reaction_messages)
+    parser.add_argument("--days", type=int, default=defaults.days, help="Spread history over this many days")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    args = parser.parse_args()
+    if args.path.exists():
+        parser.error(f"{args.path} already exists")
+    spec = DatasetSpec(
+        guilds=max(1, args.guilds),
+        users=max(1, args.users),
+        punishments=args.punishments,
+        notes=args.notes,
+        tickets=args.tickets,
+        reaction_messages=args.reaction_messages,
+        days=max(1, args.days),
+        seed=args.seed,
+    )
+    started = time.perf_counter()
+    db = open_database(args.path, args.shards)
+    try:
+        generate(db, spec, verbose=True)
+    finally:
+        db.close()
+    spec_path(args.path).write_text(json.dumps(asdict(spec), indent=2) + "\n")
+    print(f"wrote {spec.punishments} punishments and {spec.notes} notes in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+import asyncio
+import datetime
+import random
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import discord
+
+from core.bot import QuefBot
+from core.config import BotConfig
+
+
+# Offline stand-ins for the discord.py objects the cogs touch. Members and text
+# channels subclass the real classes because the cogs and permission checks use
+# isinstance on them; roles are real discord.Role objects. Every call that would
+# hit Discord's REST API goes through SimRest instead.
+
+SIM_EPOCH = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class SimRest:
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, rate: float = 0.0, seed: int = 1) -> None:
+        # latency/jitter in seconds per request; rate limits each bucket to that
+        # many requests per second (0 = unlimited), queuing the excess.
+        self.latency = latency
+        self.jitter = jitter
+        self.rate = rate
+        self.calls: Dict[str, int] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._next_slot: Dict[str, float] = {}
+        self._random = random.Random(seed)
+
+    async def call(self, route: str, bucket: str) -> None:
+        self.calls[route] = self.calls.get(route, 0) + 1
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if self.rate > 0:
+            now = asyncio.get_running_loop().time()
+            slot = max(now, self._next_slot.get(bucket, now))
+            self._next_slot[bucket] = slot + 1 / self.rate
+            delay += slot - now
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self.in_flight -= 1
+
+
+class SimGuild:
+    def __init__(self, guild_id: int, name: str, rest: SimRest, *, owner_id: int = 0) -> None:
+        self.id = guild_id
+        self.name = name
+        self.owner_id = owner_id
+        self.rest = rest
+        self._roles: Dict[int, discord.Role] = {}
+        self._members: Dict[int, "SimMember"] = {}
+        self._channels: Dict[int, "SimTextChannel"] = {}
+        self.default_role = self.add_role(guild_id, "@everyone", position=0)
+        self.system_channel: Optional[SimTextChannel] = None
+        self.me: Optional[SimMember] = None
+        self.bans = 0
+
+    def add_role(self, role_id: int, name: str, *, position: int, permissions: int = 0) -> discord.Role:
+        role = discord.Role(
+            guild=self,  # type: ignore[arg-type]
+            state=None,  # type: ignore[arg-type]
+            data={"id": role_id, "name": name, "position": position, "permissions": str(permissions)},  # type: ignore[typeddict-item]
+        )
+        self._roles[role_id] = role
+        return role
+
+    def add_member(self, member_id: int, name: str, roles: Iterable[discord.Role] = ()) -> "SimMember":
+        member = SimMember(self, member_id, name, roles)
+        self._members[member_id] = member
+        return member
+
+    def add_channel(self, channel_id: int, name: str) -> "SimTextChannel":
+        channel = SimTextChannel(self, channel_id, name)
+        self._channels[channel_id] = channel
+        return channel
+
+    @property
+    def roles(self) -> List[discord.Role]:
+        return sorted(self._roles.values())
+
+    @property
+    def members(self) -> List["SimMember"]:
+        return list(self._members.values())
+
+    def get_role(self, role_id: int) -> Optional[discord.Role]:
+        return self._roles.get(role_id)
+
+    def get_member(self, member_id: int) -> Optional["SimMember"]:
+        return self._members.get(member_id)
+
+    def get_channel(self, channel_id: int) -> Optional["SimTextChannel"]:
+        return self._channels.get(channel_id)
+
+    async def ban(self, user: discord.abc.Snowflake, *, reason: Optional[str] = None, **kwargs: Any) -> None:
+        await self.rest.call("ban", f"guild:{self.id}")
+        self.bans += 1
+
+    async def unban(self, user: discord.abc.Snowflake, *, reason: Optional[str] = None) -> None:
+        await self.rest.call("unban", f"guild:{self.id}")
+
+
+class SimMember(discord.Member):
+    def __init__(self, guild: SimGuild, member_id: int, name: str, roles: Iterable[discord.Role] = ()) -> None:
+        self.guild = guild  # type: ignore[assignment]
+        self.joined_at = SIM_EPOCH
+        self._sim_id = member_id
+        self._sim_name = name
+        self._sim_roles: Dict[int, discord.Role] = {role.id: role for role in roles}
+        self.timed_out_until: Optional[datetime.datetime] = None
+
+    def __str__(self) -> str:
+        return self._sim_name
+
+    def __repr__(self) -> str:
+        return f"<SimMember id={self._sim_id} name={self._sim_name!r}>"
+
+    def __hash__(self) -> int:
+        return self._sim_id >> 22
+
+    @property
+    def id(self) -> int:  # type: ignore[override]
+        return self._sim_id
+
+    @property
+    def name(self) -> str:  # type: ignore[override]
+        return self._sim_name
+
+    @property
+    def display_name(self) -> str:
+        return self._sim_name
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self._sim_id}>"
+
+    @property
+    def bot(self) -> bool:  # type: ignore[override]
+        return False
+
+    @property
+    def created_at(self) -> datetime.datetime:
+        return discord.utils.snowflake_time(self._sim_id)
+
+    @property
+    def roles(self) -> List[discord.Role]:
+        return sorted([self.guild.default_role, *self._sim_roles.values()])
+
+    @property
+    def top_role(self) -> discord.Role:
+        return self.roles[-1]
+
+    @property
+    def guild_permissions(self) -> discord.Permissions:
+        if self.guild.owner_id == self._sim_id:
+            return discord.Permissions.all()
+        value = 0
+        for role in self.roles:
+            value |= role.permissions.value
+        permissions = discord.Permissions(value)
+        if permissions.administrator:
+            return discord.Permissions.all()
+        return permissions
+
+    async def add_roles(self, *roles: discord.abc.Snowflake, reason: Optional[str] = None, atomic: bool = True) -> None:
+        for role in roles:
+            await self.guild.rest.call("add_role", f"guild:{self.guild.id}:member-roles")
+            self._sim_roles[role.id] = self.guild.get_role(role.id)  # type: ignore[assignment]
+
+    async def remove_roles(self, *roles: discord.abc.Snowflake, reason: Optional[str] = None, atomic: bool = True) -> None:
+        for role in roles:
+            await self.guild.rest.call("remove_role", f"guild:{self.guild.id}:member-roles")
+            self._sim_roles.pop(role.id, None)
+
+    async def edit(self, *, roles: Any = discord.utils.MISSING, reason: Optional[str] = None, **kwargs: Any) -> None:
+        await self.guild.rest.call("edit_member", f"guild:{self.guild.id}:member")
+        if roles is not discord.utils.MISSING:
+            self._sim_roles = {role.id: self.guild.get_role(role.id) for role in roles if role.id != self.guild.id}  # type: ignore[misc]
+
+    async def timeout(self, until: Any, /, *, reason: Optional[str] = None) -> None:
+        await self.guild.rest.call("edit_member", f"guild:{self.guild.id}:member")
+        if isinstance(until, datetime.timedelta):
+            until = discord.utils.utcnow() + until
+        self.timed_out_until = until
+
+    async def kick(self, *, reason: Optional[str] = None) -> None:
+        await self.guild.rest.call("kick", f"guild:{self.guild.id}")
+        self.guild._members.pop(self._sim_id, None)
+
+
+class SimTextChannel(discord.TextChannel):
+    def __init__(self, guild: SimGuild, channel_id: int, name: str) -> None:
+        self.guild = guild  # type: ignore[assignment]
+        self.id = channel_id
+        self.name = name
+        self.sent = 0
+
+    def __repr__(self) -> str:
+        return f"<SimTextChannel id={self.id} name={self.name!r}>"
+
+    async def send(self, content: Optional[str] = None, **kwargs: Any) -> None:  # type: ignore[override]
+        await self.guild.rest.call("send_message", f"channel:{self.id}")
+        self.sent += 1
+
+
+class SimResponse:
+    def __init__(self, interaction: "SimInteraction") -> None:
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def _respond(self, route: str) -> None:
+        if self._done:
+            raise discord.InteractionResponded(self._interaction)  # type: ignore[arg-type]
+        self._done = True
+        await self._interaction.guild.rest.call(route, f"interaction:{self._interaction.id}")
+
+    async def send_message(self, content: Optional[str] = None, **kwargs: Any) -> None:
+        await self._respond("interaction_response")
+
+    async def edit_message(self, **kwargs: Any) -> None:
+        await self._respond("interaction_response")
+
+    async def defer(self, **kwargs: Any) -> None:
+        await self._respond("interaction_defer")
+
+
+class SimFollowup:
+    def __init__(self, interaction: "SimInteraction") -> None:
+        self._interaction = interaction
+
+    async def send(self, content: Optional[str] = None, **kwargs: Any) -> None:
+        await self._interaction.guild.rest.call("followup", f"webhook:{self._interaction.id}")
+
+
+class SimInteraction:
+    def __init__(self, client: discord.Client, guild: SimGuild, user: SimMember, channel: SimTextChannel, interaction_id: int) -> None:
+        self.id = interaction_id
+        self.client = client
+        self.guild = guild
+        self.guild_id = guild.id
+        self.user = user
+        self.channel = channel
+        self.channel_id = channel.id
+        self.created_at = discord.utils.utcnow()
+        self.response = SimResponse(self)
+        self.followup = SimFollowup(self)
+
+
+class SimBot(QuefBot):
+    # A real QuefBot (stores, cache, scheduler, cogs) that resolves guilds from
+    # the simulation instead of the gateway cache and never logs in.
+    def __init__(self, config: BotConfig, data_dir: Path) -> None:
+        super().__init__(config, data_dir)
+        self.sim_guilds: Dict[int, SimGuild] = {}
+
+    def get_guild(self, guild_id: int, /) -> Optional[SimGuild]:  # type: ignore[override]
+        return self.sim_guilds.get(guild_id)
+
+    async def close(self) -> None:
+        if self.scheduler is not None:
+            for identifier in list(self.scheduler.tasks):
+                self.scheduler.cancel(identifier)
+        await super().close()
+
+
+def sim_config(**overrides: Any) -> BotConfig:
+    values: Dict[str, Any] = {
+        "token": "simulation",
+        "guild_ids": None,
+        "owner_ids": None,
+        "log_channel_id": None,
+        "welcome_channel_id": None,
+        "welcome_webhook_url": None,
+        "default_mute_role_id": None,
+        "staff_role_ids": None,
+    }
+    values.update(overrides)
+    return BotConfig(**values)
@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Set, Tuple
+
+import discord
+
+from benchmarks.dataset import EMOJI
+from benchmarks.fakes import SimBot, SimGuild, SimInteraction, SimMember, SimRest, sim_config
+from cogs.community.core import Community
+from cogs.moderation.core import Moderation
+from cogs.welcome.core import Welcome
+
+
+SCENARIOS = ("reactions", "joins", "moderation")
+FIRST_GUILD_ID = 10_000
+FIRST_MEMBER_ID = 1_000_000
+WELCOME_CHANNEL_ID = 50
+LOG_CHANNEL_ID = 51
+MUTE_ROLE_ID = 60
+JOIN_ROLE_ID = 61
+STAFF_ROLE_ID = 62
+BOT_ROLE_ID = 63
+MEMBER_ROLE_ID = 64
+FIRST_MESSAGE_ID = 700_000
+FIRST_REACTION_ROLE_ID = 800_000
+
+Event = Callable[[], Awaitable[Any]]
+
+
+@dataclass
+class SimReport:
+    scenario: str
+    dispatched: int = 0
+    completed: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+    max_backlog: int = 0
+    backlog_samples: List[int] = field(default_factory=list)
+    errors: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def events_per_second(self) -> float:
+        return self.completed / self.seconds if self.seconds else 0.0
+
+    def latency_ms(self, fraction: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[int(round(fraction * (len(ordered) - 1)))] * 1000
+
+
+@dataclass
+class World:
+    bot: SimBot
+    rest: SimRest
+    guilds: List[SimGuild]
+    staff: Dict[int, SimMember]
+    members: Dict[int, List[SimMember]]
+    # guild id -> message id -> emoji -> role id
+    reaction_roles: Dict[int, Dict[int, Dict[str, int]]]
+
+
+def build_world(bot: SimBot, rest: SimRest, guilds: int, members: int, messages: int, rnd: random.Random) -> World:
+    world = World(bot=bot, rest=rest, guilds=[], staff={}, members={}, reaction_roles={})
+    for index in range(guilds):
+        guild_id = FIRST_GUILD_ID + index
+        guild = SimGuild(guild_id, f"sim-{index}", rest, owner_id=1)
+        bot_role = guild.add_role(BOT_ROLE_ID, "QuefBot", position=100, permissions=discord.Permissions.all().value)
+        staff_role = guild.add_role(STAFF_ROLE_ID, "Staff", position=50, permissions=discord.Permissions.all().value)
+        guild.add_role(MUTE_ROLE_ID, "Muted", position=5)
+        guild.add_role(JOIN_ROLE_ID, "Newcomer", position=4)
+        member_role = guild.add_role(MEMBER_ROLE_ID, "Member", position=3)
+        guild.me = guild.add_member(2, "QuefBot", [bot_role])
+        guild.system_channel = guild.add_channel(WELCOME_CHANNEL_ID, "welcome")
+        guild.add_channel(LOG_CHANNEL_ID, "mod-log")
+        world.staff[guild_id] = guild.add_member(3, "moderator", [staff_role])
+        world.members[guild_id] = [
+            guild.add_member(FIRST_MEMBER_ID + number, f"member-{number}", [member_role]) for number in range(members)
+        ]
+        mappings: Dict[int, Dict[str, int]] = {}
+        for message in range(messages):
+            # Message ids are global snowflakes, so every guild gets its own range.
+            message_id = FIRST_MESSAGE_ID + index * messages + message
+            emoji = rnd.sample(EMOJI, 5)
+            mappings[message_id] = {}
+            for slot, name in enumerate(emoji):
+                role = guild.add_role(FIRST_REACTION_ROLE_ID + message * 10 + slot, f"rr-{message}-{slot}", position=2)
+                mappings[message_id][name] = role.id
+                bot.reaction_roles.set_mapping(guild_id, message_id, name, role.id)
+        world.reaction_roles[guild_id] = mappings
+        bot.auto_roles.set_role(guild_id, "join", JOIN_ROLE_ID)
+        bot.sim_guilds[guild_id] = guild
+        world.guilds.append(guild)
+    return world
+
+
+def reaction_events(world: World, cog: Community, rnd: random.Random, unmapped: float) -> Iterator[Event]:
+    # About half the events take back an earlier reaction, like users flipping
+    # opt-ins; a share lands on messages without mappings, as in a busy channel.
+    held: List[Tuple[SimGuild, SimMember, int, str]] = []
+    while True:
+        adding = not held or rnd.random() < 0.5
+        if adding:
+            guild = rnd.choice(world.guilds)
+            member = rnd.choice(world.members[guild.id])
+            mappings = world.reaction_roles[guild.id]
+            if not mappings or rnd.random() < unmapped:
+                message_id, emoji = FIRST_MESSAGE_ID - 1 - rnd.randrange(1000), rnd.choice(EMOJI)
+            else:
+                message_id = rnd.choice(list(mappings))
+                emoji = rnd.choice(list(mappings[message_id]))
+            held.append((guild, member, message_id, emoji))
+        else:
+            index = rnd.randrange(len(held))
+            held[index], held[-1] = held[-1], held[index]
+            guild, member, message_id, emoji = held.pop()
+        data: Dict[str, Any] = {
+            "message_id": message_id,
+            "channel_id": WELCOME_CHANNEL_ID,
+            "user_id": member.id,
+            "guild_id": guild.id,
+            "type": 0,
+        }
+        payload = discord.RawReactionActionEvent(
+            data,  # type: ignore[arg-type]
+            discord.PartialEmoji.from_str(emoji),
+            "REACTION_ADD" if adding else "REACTION_REMOVE",
+        )
+        if adding:
+            # The gateway only includes the member on add events.
+            payload.member = member
+            yield lambda payload=payload: cog.on_raw_reaction_add(payload)
+        else:
+            yield lambda payload=payload: cog.on_raw_reaction_remove(payload)
+
+
+def join_events(world: World, cog: Welcome, rnd: random.Random) -> Iterator[Event]:
+    number = 0
+    while True:
+        guild = rnd.choice(world.guilds)
+        number += 1
+        member = guild.add_member(FIRST_MEMBER_ID * 2 + number, f"joiner-{number}")
+        yield lambda member=member: cog.on_member_join(member)
+
+
+async def invoke(command: discord.app_commands.Command, interaction: SimInteraction, **kwargs: Any) -> None:
+    # What CommandTree does after resolving the options: run the checks, then the callback.
+    for check in command.checks:
+        if not await discord.utils.maybe_coroutine(check, interaction):
+            raise discord.app_commands.CheckFailure(command.name)
+    await command.callback(command.binding, interaction, **kwargs)  # type: ignore[arg-type]
+
+
+def moderation_events(world: World, cog: Moderation, rnd: random.Random) -> Iterator[Event]:
+    commands = {command.name: command for command in cog.get_app_commands()}
+    number = 0
+    while True:
+        guild = rnd.choice(world.guilds)
+        target = rnd.choice(world.members[guild.id])
+        number += 1
+        interaction = SimInteraction(world.bot, guild, world.staff[guild.id], guild.get_channel(LOG_CHANNEL_ID), number)
+        choice = rnd.random()
+        if choice < 0.4:
+            yield lambda i=interaction, t=target: invoke(commands["note"], i, member=t, text="Simulated note")
+        elif choice < 0.7:
+            yield lambda i=interaction, t=target: invoke(commands["warn"], i, member=t, reason="Simulated warning")
+        elif choice < 0.9:
+            yield lambda i=interaction, t=target: invoke(
+                commands["timeout"], i, member=t, duration_minutes=10, reason="Simulated timeout"
+            )
+        else:
+            yield lambda i=interaction, t=target: invoke(commands["softban"], i, member=t, reason="Simulated softban")
+
+
+async def drive(events: Iterator[Event], count: int, rate: float, report: SimReport) -> None:
+    # Open loop: events are released on a fixed schedule whether or not earlier
+    # ones finished, so a slow handler shows up as backlog instead of a lower rate.
+    loop = asyncio.get_running_loop()
+    pending: Set[asyncio.Task] = set()
+    started = loop.time()
+
+    async def run(event: Event, released: float) -> None:
+        try:
+            await event()
+            report.completed += 1
+        except Exception as exc:
+            report.failed += 1
+            name = f"{type(exc).__name__}: {exc}"
+            report.errors[name] = report.errors.get(name, 0) + 1
+        finally:
+            report.latencies.append(loop.time() - released)
+
+    async def sample() -> None:
+        while True:
+            report.backlog_samples.append(len(pending))
+            report.max_backlog = max(report.max_backlog, len(pending))
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.create_task(sample())
+    try:
+        for index, event in zip(range(count), events):
+            released = started + index / rate if rate > 0 else loop.time()
+            delay = released - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(run(event, released))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            report.dispatched += 1
+            report.max_backlog = max(report.max_backlog, len(pending))
+            if rate <= 0 and index % 100 == 99:
+                # Unthrottled: still let handlers run instead of queueing everything first.
+                await asyncio.sleep(0)
+        if pending:
+            await asyncio.wait(pending)
+    finally:
+        sampler.cancel()
+    report.seconds = loop.time() - started
+
+
+def print_report(report: SimReport, world: World) -> None:
+    mean_backlog = sum(report.backlog_samples) / len(report.backlog_samples) if report.backlog_samples else 0.0
+    print(f"scenario: {report.scenario}")
+    print(f"  events: {report.completed} completed, {report.failed} failed in {report.seconds:.2f}s ({report.events_per_second:.0f} events/sec)")
+    print(
+        f"  handler latency ms: p50 {report.latency_ms(0.5):.1f}  p95 {report.latency_ms(0.95):.1f}  "
+        f"p99 {report.latency_ms(0.99):.1f}  max {report.latency_ms(1.0):.1f}"
+    )
+    print(f"  backlog (in-flight handlers): max {report.max_backlog}, mean {mean_backlog:.1f}")
+    print(f"  REST calls: {sum(world.rest.calls.values())} {dict(sorted(world.rest.calls.items()))}, max concurrent {world.rest.max_in_flight}")
+    for pool, queued in sorted(world.bot.db.metrics.snapshot().queue_wait_ms.items()):
+        # Histogram percentiles are bucket bounds; clamp them to what was observed.
+        p50, p99 = (min(queued.percentile(fraction), queued.max) for fraction in (0.5, 0.99))
+        print(f"  db {pool} queue wait ms: p50 {p50:.2f}  p99 {p99:.2f}  max {queued.max:.2f}")
+    for name, count in sorted(report.errors.items(), key=lambda item: -item[1])[:5]:
+        print(f"  error x{count}: {name}")
+
+
+async def main_async(args: argparse.Namespace) -> SimReport:
+    rnd = random.Random(args.seed)
+    rest = SimRest(latency=args.rest_latency_ms / 1000, jitter=args.rest_jitter_ms / 1000, rate=args.rest_rate, seed=args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        config = sim_config(
+            log_channel_id=LOG_CHANNEL_ID,
+            welcome_channel_id=WELCOME_CHANNEL_ID,
+            default_mute_role_id=MUTE_ROLE_ID,
+            db_group_commit_ms=args.group_commit_ms,
+        )
+        bot = SimBot(config, Path(tmp))
+        async with bot:
+            world = build_world(bot, rest, args.guilds, args.members, args.messages, rnd)
+            community, welcome, moderation = Community(bot), Welcome(bot), Moderation(bot)
+            for cog in (community, welcome, moderation):
+                await bot.add_cog(cog)
+            if args.scenario == "reactions":
+                events = reaction_events(world, community, rnd, args.unmapped)
+            elif args.scenario == "joins":
+                events = join_events(world, welcome, rnd)
+            else:
+                events = moderation_events(world, moderation, rnd)
+            bot.db.metrics.reset()
+            report = SimReport(scenario=args.scenario)
+            await drive(events, args.events, args.rate, report)
+            await bot.db.wait_durable()
+            print_report(report, world)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Drive cog listeners and commands with simulated gateway events")
+    parser.add_argument("scenario", choices=SCENARIOS)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=500, help="Events per second to release (0 = as fast as possible)")
+    parser.add_argument("--guilds", type=int, default=5)
+    parser.add_argument("--members", type=int, default=2000, help="Members per guild")
+    parser.add_argument("--messages", type=int, default=20, help="Reaction-role messages per guild (5 emoji each)")
+    parser.add_argument("--unmapped", type=float, default=0.2, help="Share of reactions on messages without mappings")
+    parser.add_argument("--rest-latency-ms", type=float, default=50)
+    parser.add_argument("--rest-jitter-ms", type=float, default=20)
+    parser.add_argument("--rest-rate", type=float, default=0, help="Requests per second per rate-limit bucket (0 = unlimited)")
+    parser.add_argument("--group-commit-ms", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    started = time.perf_counter()
+    report = asyncio.run(main_async(args))
+    print(f"  wall time {time.perf_counter() - started:.1f}s")
+    if report.failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
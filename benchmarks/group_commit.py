@@ -0,0 +1,68 @@
+import argparse
+import asyncio
+import datetime
+import tempfile
+import time
+from pathlib import Path
+
+from models.punishments import PunishmentRecord
+from services.database import Database
+from services.history import HistoryStore
+
+
+async def _burst(history: HistoryStore, writes: int, concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    now = datetime.datetime.utcnow()
+
+    async def one(index: int) -> None:
+        record = PunishmentRecord(
+            user_id=100_000 + index,
+            moderator_id=1,
+            action="Ban",
+            reason="Raid cleanup",
+            created_at=now,
+            expires_at=None,
+        )
+        async with semaphore:
+            await history.add_punishment_async(1, record)
+
+    await asyncio.gather(*(one(i) for i in range(writes)))
+
+
+async def _run_mode(label: str, writes: int, concurrency: int, window: float, max_batch: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(Path(tmp) / "bench.db", group_commit_window=window, group_commit_max=max_batch)
+        history = HistoryStore(db)
+        start = time.perf_counter()
+        await _burst(history, writes, concurrency)
+        await db.wait_durable()
+        elapsed = time.perf_counter() - start
+        db.close()
+    rate = writes / elapsed if elapsed else float("inf")
+    print(f"{label:<28} {writes:>7} writes in {elapsed:7.3f}s  {rate:10.0f} writes/sec")
+    return rate
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    baseline = await _run_mode("per-statement commit", args.writes, args.concurrency, 0.0, 1)
+    grouped = await _run_mode(
+        f"group commit ({args.window_ms}ms/{args.max_batch})",
+        args.writes,
+        args.concurrency,
+        args.window_ms / 1000,
+        args.max_batch,
+    )
+    print(f"speedup: {grouped / baseline:.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare per-statement commits with group commit")
+    parser.add_argument("--writes", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--window-ms", type=int, default=20)
+    parser.add_argument("--max-batch", type=int, default=200)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
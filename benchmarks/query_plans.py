@@ -0,0 +1,221 @@
+import argparse
+import datetime
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+from models.punishments import HistoryCursor, JailState, NoteRecord, PunishmentQuery, PunishmentRecord
+from services.auto_roles import AutoRoleStore
+from services.database import Database
+from services.history import HistoryStore
+from services.incidents import IncidentStore
+from services.reaction_roles import ReactionRoleStore
+from services.retention import ARCHIVE_ALIAS, RetentionPolicy, RetentionService
+from services.staff import StaffWhitelistStore
+from services.tickets import TicketService
+
+
+STATEMENT_PREFIXES = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+# A plan line containing one of these means the statement reads a whole table
+# or sorts its result instead of walking an index.
+BAD_PLAN_MARKERS = ("SCAN ", "USE TEMP B-TREE")
+# Statements that read a whole (small) table on purpose.
+ALLOWED_SCANS = {
+    "SELECT * FROM retention_policies",
+    # Startup load of the in-memory reaction-role index.
+    "SELECT guild_id, message_id, emoji, role_id FROM reaction_roles",
+}
+# "SCAN x VIRTUAL TABLE INDEX" is an FTS5 index lookup, not a table scan, and
+# full-text matches have to be sorted by their bm25 score.
+FTS_LOOKUP = "VIRTUAL TABLE INDEX"
+FTS_MATCH = " MATCH "
+
+
+def _store_calls(db: Database, archive_dir: Path) -> Dict[object, List[Tuple[str, Callable[[], Any]]]]:
+    now = datetime.datetime.utcnow()
+    history = HistoryStore(db, archive_dir)
+    tickets = TicketService(db)
+    incidents = IncidentStore(db)
+    auto_roles = AutoRoleStore(db)
+    reaction_roles = ReactionRoleStore(db)
+    retention = RetentionService(db, archive_dir)
+    staff = StaffWhitelistStore(db)
+    policy = RetentionPolicy(guild_id=1, archive_after_days=1, purge_after_days=2)
+    punishment = PunishmentRecord(user_id=2, moderator_id=3, action="Warn", reason=None, created_at=now, expires_at=None)
+    note = NoteRecord(user_id=2, moderator_id=3, text="note", created_at=now)
+    jail = JailState(guild_id=1, user_id=2, role_id=4, reason=None, created_at=now, expires_at=None)
+    cursor = HistoryCursor(created_ms=0, id=1)
+    by_user = PunishmentQuery(user_id=2)
+    by_moderator = PunishmentQuery(moderator_id=3, since=now)
+    by_action = PunishmentQuery(action="Ban", until=now, reason_contains="raid", active_only=True)
+    return {
+        history: [
+            ("add_punishment", lambda: history.add_punishment(1, punishment)),
+            ("add_note", lambda: history.add_note(1, note)),
+            ("add_punishments", lambda: history.add_punishments(1, [punishment, punishment])),
+            ("add_notes", lambda: history.add_notes(1, [note])),
+            ("get_punishments", lambda: history.get_punishments(1)),
+            ("get_notes", lambda: history.get_notes(1)),
+            ("get_punishments_for_user", lambda: history.get_punishments_for_user(1, 2)),
+            ("get_notes_for_user", lambda: history.get_notes_for_user(1, 2)),
+            ("scan_punishments", lambda: list(history.scan_punishments(1, 2))),
+            ("scan_notes", lambda: list(history.scan_notes(1))),
+            ("get_punishment_page", lambda: history.get_punishment_page(1)),
+            ("get_punishment_page", lambda: history.get_punishment_page(1, before=cursor)),
+            ("get_punishment_page", lambda: history.get_punishment_page(1, after=cursor)),
+            ("get_punishment_page", lambda: history.get_punishment_page(1, by_user, before=cursor)),
+            ("get_punishment_page", lambda: history.get_punishment_page(1, by_user, after=cursor)),
+            ("get_punishment_page", lambda: history.get_punishment_page(1, by_moderator, before=cursor)),
+            ("get_punishment_page", lambda: history.get_punishment_page(1, by_action)),
+            ("query_punishments", lambda: history.query_punishments(1)),
+            ("query_punishments", lambda: history.query_punishments(1, by_user)),
+            ("query_punishments", lambda: history.query_punishments(1, by_moderator)),
+            ("query_punishments", lambda: history.query_punishments(1, by_action)),
+            ("iter_punishments", lambda: list(history.iter_punishments(1, by_user, chunk_size=1))),
+            ("iter_notes", lambda: list(history.iter_notes(1, chunk_size=1))),
+            ("query_notes", lambda: history.query_notes(1)),
+            ("query_notes", lambda: history.query_notes(1, by_user)),
+            ("query_notes", lambda: history.query_notes(1, by_moderator)),
+            ("get_infraction_summary", lambda: history.get_infraction_summary(1, 2)),
+            ("search", lambda: history.search(1, "raid*")),
+            ("search", lambda: history.search(1, '"scam links"', user_id=2, include_notes=False, offset=10)),
+            ("get_archived_punishments_for_user", lambda: history.get_archived_punishments_for_user(1, 2)),
+            ("set_jail", lambda: history.set_jail(jail)),
+            ("get_jail", lambda: history.get_jail(1, 2)),
+            ("clear_jail", lambda: history.clear_jail(1, 2)),
+        ],
+        tickets: [
+            ("set_category", lambda: tickets.set_category(1, 10)),
+            ("get_category", lambda: tickets.get_category(1)),
+            ("set_transcript_channel", lambda: tickets.set_transcript_channel(1, 11)),
+            ("get_transcript_channel", lambda: tickets.get_transcript_channel(1)),
+            ("create_ticket", lambda: tickets.create_ticket(2, "high")),
+            ("link_channel", lambda: tickets.link_channel(1, 1, 12)),
+            ("get_channel_for_ticket", lambda: tickets.get_channel_for_ticket(1)),
+            ("get_ticket_by_channel", lambda: tickets.get_ticket_by_channel(1, 12)),
+            ("get_open_ticket_for_user", lambda: tickets.get_open_ticket_for_user(1, 2)),
+            ("escalate_ticket", lambda: tickets.escalate_ticket(1, "critical", 3)),
+            ("close_ticket", lambda: tickets.close_ticket(1)),
+            ("get_ticket", lambda: tickets.get_ticket(1)),
+        ],
+        incidents: [
+            ("create_incident", lambda: incidents.create_incident("title", "description", 3)),
+            ("get_incident", lambda: incidents.get_incident(1)),
+            ("set_status", lambda: incidents.set_status(1, "resolved")),
+            ("delete_incident", lambda: incidents.delete_incident(1)),
+        ],
+        auto_roles: [
+            ("set_role", lambda: auto_roles.set_role(1, "join", 5)),
+            ("get_role", lambda: auto_roles.get_role(1, "join")),
+            ("all_triggers", lambda: auto_roles.all_triggers(1)),
+            ("clear_trigger", lambda: auto_roles.clear_trigger(1, "join")),
+        ],
+        reaction_roles: [
+            ("set_mapping", lambda: reaction_roles.set_mapping(1, 20, "✅", 6, 30)),
+            ("set_channel", lambda: reaction_roles.set_channel(1, 20, 30)),
+            ("get_panels", lambda: reaction_roles.get_panels(1)),
+            ("get_mappings_for_message", lambda: reaction_roles.get_mappings_for_message(1, 20)),
+            ("clear_mapping", lambda: reaction_roles.clear_mapping(1, 20, "✅")),
+            ("clear_message", lambda: reaction_roles.clear_message(1, 20)),
+            ("load", reaction_roles.load),
+            ("role_for_reaction", lambda: reaction_roles.role_for_reaction(1, 20, "✅")),
+        ],
+        retention: [
+            ("set_policy", lambda: retention.set_policy(policy)),
+            ("get_policy", lambda: retention.get_policy(1)),
+            ("all_policies", lambda: retention.all_policies()),
+            # Far-future "now" so the rows added above are old enough to move.
+            ("archive_chunk", lambda: retention.archive_chunk(policy, "punishments", 2**42)),
+            ("purge", lambda: retention.purge(policy, 2**42)),
+            ("sweep", lambda: retention.sweep()),
+            ("clear_policy", lambda: retention.clear_policy(1)),
+        ],
+        staff: [
+            ("set_level", lambda: staff.set_level(3, "moderator")),
+            ("get_level", lambda: staff.get_level(3)),
+            ("remove", lambda: staff.remove(3)),
+        ],
+    }
+
+
+def _public_methods(store: object) -> Set[str]:
+    names = set()
+    for name in dir(type(store)):
+        if name.startswith("_") or name.endswith("_async"):
+            continue
+        if callable(getattr(store, name)):
+            names.add(name)
+    return names
+
+
+def collect_statements(db: Database, archive_dir: Path) -> Tuple[List[str], List[str]]:
+    statements: List[str] = []
+    missing: List[str] = []
+
+    def trace(sql: str) -> None:
+        text = " ".join(sql.split())
+        # Archive files are detached again by the time plans are checked.
+        if f"{ARCHIVE_ALIAS}." in text:
+            return
+        # FTS5's own reads of its shadow tables, e.g. reloading its config after
+        # a migration changed the schema; not something a store issues.
+        if text.startswith("SELECT k, v FROM 'main'.") and "_fts_config'" in text:
+            return
+        if text.upper().startswith(STATEMENT_PREFIXES) and text not in statements:
+            statements.append(text)
+
+    db._conn.set_trace_callback(trace)
+    try:
+        for store, calls in _store_calls(db, archive_dir).items():
+            covered = {name for name, _ in calls}
+            for name in sorted(_public_methods(store) - covered):
+                missing.append(f"{type(store).__name__}.{name}")
+            for _, call in calls:
+                call()
+    finally:
+        db._conn.set_trace_callback(None)
+    return statements, missing
+
+
+def check_plans(db: Database, statements: List[str], verbose: bool) -> List[str]:
+    failures: List[str] = []
+    for sql in statements:
+        rows = db.query_all(f"EXPLAIN QUERY PLAN {sql}")
+        details = [str(row["detail"]) for row in rows]
+        bad = [d for d in details if any(marker in d for marker in BAD_PLAN_MARKERS) and FTS_LOOKUP not in d]
+        if FTS_MATCH in sql:
+            bad = [d for d in bad if "USE TEMP B-TREE" not in d]
+        if sql in ALLOWED_SCANS:
+            bad = []
+        if bad:
+            failures.append(f"{sql}\n    " + "\n    ".join(bad))
+        if verbose:
+            print(sql)
+            for detail in details:
+                print(f"    {detail}")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fail if any store query needs a full scan or a temp B-tree sort")
+    parser.add_argument("--verbose", action="store_true", help="Print the plan of every statement")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(Path(tmp) / "plans.db")
+        try:
+            statements, missing = collect_statements(db, Path(tmp) / "archive")
+            failures = check_plans(db, statements, args.verbose)
+        finally:
+            db.close()
+    for name in missing:
+        print(f"not exercised: {name}")
+    for failure in failures:
+        print(f"bad plan: {failure}")
+    print(f"{len(statements)} statements checked, {len(failures)} bad plan(s), {len(missing)} unexercised method(s)")
+    if failures or missing:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+import argparse
+import asyncio
+import contextvars
+import logging
+import re
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import aiohttp
+import discord
+
+from benchmarks.fakes import sim_config
+from benchmarks.rest_server import BOT_USER_ID, FakeDiscord, add_fault_arguments, faults_from_args
+from cogs.ops.core import TicketControlsView
+from core.bot import QuefBot
+
+
+# End-to-end command paths against benchmarks.rest_server: a real QuefBot logs
+# in over HTTP, receives interactions through the same parser the gateway
+# feeds, and does every REST call through discord.py's own client, retries
+# and rate-limit handling included.
+
+FLOWS = ("kick", "ban", "jail", "ticket", "purge")
+GUILD_ID = 1_000
+OWNER_ID = 10
+STAFF_ID = 11
+FIRST_MEMBER_ID = 100_000
+PURGE_SEED = 60
+PURGE_COUNT = 50
+TICKET_CHATTER = 20
+
+_flow: contextvars.ContextVar[Optional["FlowStats"]] = contextvars.ContextVar("flow", default=None)
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[int(round(fraction * (len(ordered) - 1)))] * 1000
+
+
+@dataclass
+class FlowStats:
+    name: str
+    runs: int = 0
+    failed: int = 0
+    latencies: List[float] = field(default_factory=list)
+    steps: Dict[str, List[float]] = field(default_factory=dict)
+    requests: Dict[str, int] = field(default_factory=dict)
+    rate_limited: int = 0
+    server_errors: int = 0
+    errors: Dict[str, int] = field(default_factory=dict)
+
+
+class FlowFailed(Exception):
+    pass
+
+
+def _route(method: str, url: "aiohttp.typedefs.StrOrURL") -> str:
+    path = str(getattr(url, "path", url))
+    path = path.split("/api/v10", 1)[-1]
+    path = re.sub(r"/\d+", "/{id}", path)
+    return f"{method} " + re.sub(r"(/(?:interactions|webhooks)/\{id\})/[^/]+", r"\1/{token}", path)
+
+
+def http_trace() -> aiohttp.TraceConfig:
+    # Runs inside the task that made the request; tasks spawned while a flow
+    # dispatches copy its context, so their calls are counted against it.
+    trace = aiohttp.TraceConfig()
+
+    async def on_request_end(session: Any, context: Any, params: aiohttp.TraceRequestEndParams) -> None:
+        stats = _flow.get()
+        if stats is None:
+            return
+        route = _route(params.method, params.url)
+        stats.requests[route] = stats.requests.get(route, 0) + 1
+        if params.response.status == 429:
+            stats.rate_limited += 1
+        elif params.response.status >= 500:
+            stats.server_errors += 1
+
+    trace.on_request_end.append(on_request_end)
+    return trace
+
+
+class World:
+    def __init__(self, server: FakeDiscord, members: int) -> None:
+        self.server = server
+        server.add_guild(GUILD_ID, "scenarios", owner_id=OWNER_ID)
+        server.add_member(GUILD_ID, OWNER_ID, "owner")
+        staff_permissions = discord.Permissions(
+            kick_members=True, ban_members=True, manage_roles=True, manage_messages=True, manage_channels=True
+        )
+        self.staff_role = int(server.add_role(GUILD_ID, "Staff", position=50, permissions=staff_permissions.value)["id"])
+        self.jail_role = int(server.add_role(GUILD_ID, "Jailed", position=5)["id"])
+        server.add_member(GUILD_ID, STAFF_ID, "moderator", roles=[self.staff_role])
+        self.targets = [FIRST_MEMBER_ID + number for number in range(members)]
+        for user_id in self.targets:
+            server.add_member(GUILD_ID, user_id, f"member-{user_id - FIRST_MEMBER_ID}")
+        self.commands_channel = int(server.add_channel(GUILD_ID, "staff-commands")["id"])
+        self.log_channel = int(server.add_channel(GUILD_ID, "mod-log")["id"])
+        self.transcripts = int(server.add_channel(GUILD_ID, "transcripts")["id"])
+        self.category = int(server.add_channel(GUILD_ID, "Tickets", type=4)["id"])
+        self.panel_channel = int(server.add_channel(GUILD_ID, "support")["id"])
+        button = {"type": 2, "style": 1, "label": "Open Ticket", "custom_id": "ticket_open"}
+        self.panel = server.add_message(
+            self.panel_channel, BOT_USER_ID, components=[{"type": 1, "components": [button]}]
+        )
+        self.bot: Optional[QuefBot] = None
+        self.command_ids: Dict[str, str] = {}
+
+    def take_member(self) -> int:
+        if not self.targets:
+            raise FlowFailed("ran out of target members; raise --members")
+        return self.targets.pop()
+
+    def attach(self, bot: QuefBot) -> None:
+        self.bot = bot
+        state = bot._connection
+        state._add_guild_from_data(self.server.guild_payload(GUILD_ID))  # type: ignore[arg-type]
+        self.server.listeners.append(lambda event, data: state.parsers[event](data))
+        self.command_ids = {command["name"]: command["id"] for command in self.server.commands}
+
+    def command(self, name: str, options: List[Dict[str, Any]], *, channel_id: Optional[int] = None) -> Dict[str, Any]:
+        resolved: Dict[str, Dict[str, Any]] = {"users": {}, "members": {}}
+        for option in options:
+            if option["type"] == 6:
+                user_id = int(option["value"])
+                resolved["users"][option["value"]] = self.server.users[user_id]
+                resolved["members"][option["value"]] = {
+                    **self.server.member_payload(GUILD_ID, user_id, with_user=False),
+                    "permissions": str(self.server.member_permissions(GUILD_ID, user_id)),
+                }
+        data = {"id": self.command_ids[name], "name": name, "type": 1, "options": options, "resolved": resolved}
+        return self.server.interaction_payload(GUILD_ID, channel_id or self.commands_channel, STAFF_ID, 2, data)
+
+    def click(self, message: Dict[str, Any], custom_id: str, user_id: int = STAFF_ID) -> Dict[str, Any]:
+        data = {"custom_id": custom_id, "component_type": 2}
+        return self.server.interaction_payload(GUILD_ID, int(message["channel_id"]), user_id, 3, data, message=message)
+
+    def button(self, payload: Dict[str, Any], label: str) -> Dict[str, Any]:
+        # The message the bot answered the interaction with, and the custom_id of one of its buttons.
+        interaction = self.server.interactions[payload["token"]]
+        for row in interaction["components"]:
+            for component in row.get("components", []):
+                if component.get("label") == label:
+                    message = self.server.find_message(interaction["channel_id"], interaction["original"] or 0)
+                    if message is None:
+                        raise FlowFailed(f"no response message carrying {label!r}")
+                    return {"message": message, "custom_id": component["custom_id"]}
+        raise FlowFailed(f"response has no {label!r} button")
+
+    async def deliver(self, payload: Dict[str, Any]) -> None:
+        # INTERACTION_CREATE through discord.py's parser, then wait for whatever
+        # it scheduled (the command tree or view callback) to finish.
+        assert self.bot is not None
+        before = asyncio.all_tasks()
+        self.bot._connection.parse_interaction_create(payload)  # type: ignore[arg-type]
+        spawned = asyncio.all_tasks() - before
+        if spawned:
+            await asyncio.gather(*spawned)
+
+
+async def step(stats: FlowStats, name: str, work: Awaitable[Any]) -> None:
+    started = time.perf_counter()
+    await work
+    stats.steps.setdefault(name, []).append(time.perf_counter() - started)
+
+
+async def kick_flow(world: World, stats: FlowStats) -> None:
+    target = world.take_member()
+    command = world.command("kick", [{"name": "member", "type": 6, "value": str(target)}])
+    await step(stats, "command", world.deliver(command))
+    confirm = world.button(command, "Confirm kick")
+    await step(stats, "confirm", world.deliver(world.click(confirm["message"], confirm["custom_id"])))
+    if target in world.server.members[GUILD_ID]:
+        raise FlowFailed("member was not kicked")
+
+
+async def ban_flow(world: World, stats: FlowStats) -> None:
+    target = world.take_member()
+    command = world.command(
+        "ban", [{"name": "member", "type": 6, "value": str(target)}, {"name": "reason", "type": 3, "value": "Scenario ban"}]
+    )
+    await step(stats, "command", world.deliver(command))
+    confirm = world.button(command, "Confirm ban")
+    await step(stats, "confirm", world.deliver(world.click(confirm["message"], confirm["custom_id"])))
+    if target not in world.server.bans[GUILD_ID]:
+        raise FlowFailed("member was not banned")
+
+
+async def jail_flow(world: World, stats: FlowStats) -> None:
+    target = world.take_member()
+    command = world.command("jail", [{"name": "member", "type": 6, "value": str(target)}])
+    await step(stats, "command", world.deliver(command))
+    if str(world.jail_role) not in world.server.members[GUILD_ID][target]["roles"]:
+        raise FlowFailed("jail role was not applied")
+    pardon = world.button(command, "Pardon now")
+    await step(stats, "pardon", world.deliver(world.click(pardon["message"], pardon["custom_id"])))
+    if str(world.jail_role) in world.server.members[GUILD_ID][target]["roles"]:
+        raise FlowFailed("jail role was not removed")
+
+
+async def ticket_flow(world: World, stats: FlowStats) -> None:
+    assert world.bot is not None
+    reporter = world.take_member()
+    await step(stats, "open", world.deliver(world.click(world.panel, "ticket_open", reporter)))
+    ticket = await world.bot.tickets.get_open_ticket_for_user_async(GUILD_ID, reporter)
+    channel_id = await world.bot.tickets.get_channel_for_ticket_async(ticket.id) if ticket else None
+    if channel_id is None or channel_id not in world.server.channels:
+        raise FlowFailed("ticket channel was not created")
+    for number in range(TICKET_CHATTER):
+        world.server.add_message(channel_id, reporter, f"ticket message {number}")
+    first = next(iter(world.server.messages[channel_id].values()))
+    await step(stats, "close", world.deliver(world.click(first, "ticket_close", reporter)))
+    if channel_id in world.server.channels:
+        raise FlowFailed("ticket channel was not deleted")
+
+
+async def purge_flow(world: World, stats: FlowStats) -> None:
+    channel = world.server.add_channel(GUILD_ID, "purge")
+    world.server.dispatch("CHANNEL_CREATE", channel)
+    channel_id = int(channel["id"])
+    for number in range(PURGE_SEED):
+        world.server.add_message(channel_id, FIRST_MEMBER_ID, f"spam {number}")
+    command = world.command("purge", [{"name": "count", "type": 4, "value": PURGE_COUNT}], channel_id=channel_id)
+    await step(stats, "command", world.deliver(command))
+    left = len(world.server.messages[channel_id])
+    if left != PURGE_SEED - PURGE_COUNT - 1:
+        raise FlowFailed(f"purge left {left} messages")
+
+
+FLOW_FUNCTIONS: Dict[str, Callable[[World, FlowStats], Awaitable[None]]] = {
+    "kick": kick_flow,
+    "ban": ban_flow,
+    "jail": jail_flow,
+    "ticket": ticket_flow,
+    "purge": purge_flow,
+}
+
+
+async def run_flow(world: World, name: str, iterations: int, concurrency: int) -> FlowStats:
+    stats = FlowStats(name=name)
+    flow = FLOW_FUNCTIONS[name]
+    remaining = iter(range(iterations))
+
+    async def worker() -> None:
+        _flow.set(stats)
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                await flow(world, stats)
+            except Exception as exc:
+                stats.failed += 1
+                message = f"{type(exc).__name__}: {exc}"
+                stats.errors[message] = stats.errors.get(message, 0) + 1
+            else:
+                stats.latencies.append(time.perf_counter() - started)
+            stats.runs += 1
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return stats
+
+
+def print_stats(stats: FlowStats) -> None:
+    completed = stats.runs - stats.failed
+    total_requests = sum(stats.requests.values())
+    print(f"flow: {stats.name}  ({completed} completed, {stats.failed} failed)")
+    print(
+        f"  end-to-end ms: p50 {_percentile(stats.latencies, 0.5):.1f}  p95 {_percentile(stats.latencies, 0.95):.1f}  "
+        f"p99 {_percentile(stats.latencies, 0.99):.1f}  max {_percentile(stats.latencies, 1.0):.1f}"
+    )
+    for name, values in stats.steps.items():
+        print(f"    {name}: p50 {_percentile(values, 0.5):.1f}  p99 {_percentile(values, 0.99):.1f}")
+    per_run = total_requests / stats.runs if stats.runs else 0.0
+    print(f"  requests: {total_requests} ({per_run:.1f} per run), 429s {stats.rate_limited}, 5xx {stats.server_errors}")
+    for route, count in sorted(stats.requests.items(), key=lambda item: -item[1]):
+        print(f"    {count:6d}  {route}")
+    for message, count in sorted(stats.errors.items(), key=lambda item: -item[1])[:5]:
+        print(f"  error x{count}: {message}")
+
+
+async def main_async(args: argparse.Namespace) -> List[FlowStats]:
+    server = FakeDiscord(faults_from_args(args), seed=args.seed)
+    world = World(server, members=args.members or args.iterations * len(args.flows) + 10)
+    url = await server.start()
+    results: List[FlowStats] = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            config = sim_config(
+                log_channel_id=world.log_channel,
+                default_mute_role_id=world.jail_role,
+                staff_role_ids=[world.staff_role],
+                api_base_url=url,
+                db_group_commit_ms=args.group_commit_ms,
+            )
+            bot = QuefBot(config, Path(tmp))
+            bot.http.http_trace = http_trace()
+            async with bot:
+                await bot.login(config.token)
+                # The close button's view is not registered by the bot itself yet;
+                # registering it here lets the close path be measured.
+                bot.add_view(TicketControlsView())
+                await bot.tickets.set_category_async(GUILD_ID, world.category)
+                await bot.tickets.set_transcript_channel_async(GUILD_ID, world.transcripts)
+                world.attach(bot)
+                for name in args.flows:
+                    server.reset_counters()
+                    stats = await run_flow(world, name, args.iterations, args.concurrency)
+                    print_stats(stats)
+                    results.append(stats)
+                await bot.db.wait_durable()
+    finally:
+        await server.stop()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run moderation and ticket flows end to end against a fake Discord API")
+    parser.add_argument("flows", nargs="*", metavar="FLOW", help=f"Any of {', '.join(FLOWS)} (default: all)")
+    parser.add_argument("--iterations", type=int, default=50, help="Runs per flow")
+    parser.add_argument("--concurrency", type=int, default=4, help="Flows in flight at once")
+    parser.add_argument("--members", type=int, default=0, help="Target members to seed (default: enough for every run)")
+    parser.add_argument("--group-commit-ms", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="Show discord.py's rate-limit and retry warnings")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+    unknown = [name for name in args.flows if name not in FLOWS]
+    if unknown:
+        parser.error(f"unknown flow(s): {', '.join(unknown)}")
+    args.flows = args.flows or list(FLOWS)
+    if not args.verbose:
+        logging.getLogger("discord").setLevel(logging.ERROR)
+    started = time.perf_counter()
+    results = asyncio.run(main_async(args))
+    print(f"wall time {time.perf_counter() - started:.1f}s")
+    if any(stats.failed for stats in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,822 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import secrets
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import discord
+from aiohttp import web
+
+
+# A local stand-in for the slice of Discord's REST API the bot uses, serving
+# in-memory guild state. Point a bot at it with `api_base_url` (the runner in
+# benchmarks.rest_scenarios does). State changes are also pushed to listeners
+# as gateway dispatches, so a client cache stays in step without a websocket.
+
+API_PREFIX = "/api/v10"
+BOT_USER_ID = 900_000_000_000_000_001
+APPLICATION_ID = 900_000_000_000_000_002
+EPHEMERAL = 64
+
+Dispatch = Callable[[str, Dict[str, Any]], None]
+
+
+@dataclass
+class Faults:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    # Requests allowed per bucket (route + major parameter) per window; 0 sends no
+    # rate-limit headers at all. Exhausting a bucket answers 429 with scope "user".
+    bucket_limit: int = 0
+    bucket_window: float = 1.0
+    # Shares of requests answered with a "shared" 429 or with a 500/502/504
+    # before touching any state, so client retries stay idempotent.
+    rate_limit_rate: float = 0.0
+    error_rate: float = 0.0
+    retry_after: float = 0.25
+
+
+@dataclass
+class _Bucket:
+    remaining: int
+    reset_at: float
+
+
+class FakeDiscord:
+    def __init__(self, faults: Optional[Faults] = None, *, seed: int = 1) -> None:
+        self.faults = faults or Faults()
+        self.users: Dict[int, Dict[str, Any]] = {}
+        self.guilds: Dict[int, Dict[str, Any]] = {}
+        self.roles: Dict[int, Dict[int, Dict[str, Any]]] = {}
+        self.members: Dict[int, Dict[int, Dict[str, Any]]] = {}
+        self.bans: Dict[int, Set[int]] = {}
+        self.channels: Dict[int, Dict[str, Any]] = {}
+        self.messages: Dict[int, Dict[int, Dict[str, Any]]] = {}
+        # Ephemeral interaction responses never show up in channel history.
+        self.ephemeral: Dict[int, Dict[str, Any]] = {}
+        self.interactions: Dict[str, Dict[str, Any]] = {}
+        self.commands: List[Dict[str, Any]] = []
+        self.requests: Dict[str, int] = {}
+        self.statuses: Dict[int, int] = {}
+        self.listeners: List[Dispatch] = []
+        self._buckets: Dict[Tuple[str, str], _Bucket] = {}
+        self._random = random.Random(seed)
+        self._last_id = 0
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+        self.add_user(BOT_USER_ID, "QuefBot", bot=True)
+        self.app = web.Application(middlewares=[self._middleware], client_max_size=16 * 1024 * 1024)
+        self._add_routes()
+
+    # -- lifecycle ---------------------------------------------------------
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound = self._runner.addresses[0][1]
+        self.url = f"http://{host}:{bound}{API_PREFIX}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def snowflake(self) -> int:
+        self._last_id = max(self._last_id + 1, discord.utils.time_snowflake(discord.utils.utcnow()))
+        return self._last_id
+
+    def dispatch(self, event: str, data: Dict[str, Any]) -> None:
+        for listener in self.listeners:
+            listener(event, data)
+
+    def reset_counters(self) -> None:
+        self.requests.clear()
+        self.statuses.clear()
+
+    # -- seeding -----------------------------------------------------------
+
+    def add_user(self, user_id: int, name: str, *, bot: bool = False) -> Dict[str, Any]:
+        user = {
+            "id": str(user_id),
+            "username": name,
+            "discriminator": "0",
+            "global_name": None,
+            "avatar": None,
+            "bot": bot,
+        }
+        self.users[user_id] = user
+        return user
+
+    def add_guild(self, guild_id: int, name: str, *, owner_id: int) -> Dict[str, Any]:
+        self.guilds[guild_id] = {"id": str(guild_id), "name": name, "owner_id": str(owner_id)}
+        self.roles[guild_id] = {}
+        self.members[guild_id] = {}
+        self.bans[guild_id] = set()
+        self.add_role(guild_id, "@everyone", role_id=guild_id, position=0, permissions=discord.Permissions.general().value)
+        bot_role = self.add_role(guild_id, "QuefBot", position=100, permissions=discord.Permissions.all().value)
+        self.add_member(guild_id, BOT_USER_ID, "QuefBot", roles=[int(bot_role["id"])])
+        return self.guilds[guild_id]
+
+    def add_role(
+        self,
+        guild_id: int,
+        name: str,
+        *,
+        role_id: Optional[int] = None,
+        position: int = 1,
+        permissions: int = 0,
+    ) -> Dict[str, Any]:
+        role_id = role_id or self.snowflake()
+        role = {
+            "id": str(role_id),
+            "name": name,
+            "color": 0,
+            "hoist": False,
+            "position": position,
+            "permissions": str(permissions),
+            "managed": False,
+            "mentionable": False,
+            "flags": 0,
+        }
+        self.roles[guild_id][role_id] = role
+        return role
+
+    def add_member(self, guild_id: int, user_id: int, name: str, *, roles: Iterable[int] = ()) -> Dict[str, Any]:
+        if user_id not in self.users:
+            self.add_user(user_id, name)
+        member = {
+            "user_id": user_id,
+            "roles": [str(role_id) for role_id in roles],
+            "joined_at": discord.utils.utcnow().isoformat(),
+            "communication_disabled_until": None,
+        }
+        self.members[guild_id][user_id] = member
+        return member
+
+    def add_channel(self, guild_id: int, name: str, *, type: int = 0, parent_id: Optional[int] = None) -> Dict[str, Any]:
+        channel_id = self.snowflake()
+        channel = {
+            "id": str(channel_id),
+            "guild_id": str(guild_id),
+            "type": type,
+            "name": name,
+            "position": len(self.channels),
+            "parent_id": str(parent_id) if parent_id else None,
+            "permission_overwrites": [],
+            "nsfw": False,
+            "topic": None,
+            "rate_limit_per_user": 0,
+            "last_message_id": None,
+        }
+        self.channels[channel_id] = channel
+        self.messages[channel_id] = {}
+        return channel
+
+    def add_message(
+        self,
+        channel_id: int,
+        author_id: int,
+        content: str = "",
+        *,
+        flags: int = 0,
+        components: Optional[List[Dict[str, Any]]] = None,
+        embeds: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        message_id = self.snowflake()
+        channel = self.channels.get(channel_id)
+        message = {
+            "id": str(message_id),
+            "channel_id": str(channel_id),
+            "author": self.users[author_id],
+            "content": content,
+            "timestamp": discord.utils.snowflake_time(message_id).isoformat(),
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": embeds or [],
+            "components": components or [],
+            "pinned": False,
+            "type": 0,
+            "flags": flags,
+        }
+        if channel is not None:
+            message["guild_id"] = channel["guild_id"]
+        if flags & EPHEMERAL:
+            self.ephemeral[message_id] = message
+        else:
+            self.messages.setdefault(channel_id, {})[message_id] = message
+            if channel is not None:
+                channel["last_message_id"] = str(message_id)
+        return message
+
+    def find_message(self, channel_id: int, message_id: int) -> Optional[Dict[str, Any]]:
+        return self.messages.get(channel_id, {}).get(message_id) or self.ephemeral.get(message_id)
+
+    # -- payloads ----------------------------------------------------------
+
+    def member_payload(self, guild_id: int, user_id: int, *, with_user: bool = True) -> Dict[str, Any]:
+        member = self.members[guild_id][user_id]
+        payload: Dict[str, Any] = {
+            "roles": list(member["roles"]),
+            "joined_at": member["joined_at"],
+            "nick": None,
+            "avatar": None,
+            "deaf": False,
+            "mute": False,
+            "pending": False,
+            "flags": 0,
+            "premium_since": None,
+            "communication_disabled_until": member["communication_disabled_until"],
+        }
+        if with_user:
+            payload["user"] = self.users[user_id]
+        return payload
+
+    def member_permissions(self, guild_id: int, user_id: int) -> int:
+        if int(self.guilds[guild_id]["owner_id"]) == user_id:
+            return discord.Permissions.all().value
+        roles = self.roles[guild_id]
+        value = int(roles[guild_id]["permissions"])
+        for role_id in self.members[guild_id][user_id]["roles"]:
+            role = roles.get(int(role_id))
+            if role is not None:
+                value |= int(role["permissions"])
+        if value & discord.Permissions(administrator=True).value:
+            return discord.Permissions.all().value
+        return value
+
+    def guild_payload(self, guild_id: int) -> Dict[str, Any]:
+        # Shaped like GUILD_CREATE: enough for discord.py to build and cache the guild.
+        guild = self.guilds[guild_id]
+        return {
+            **guild,
+            "icon": None,
+            "splash": None,
+            "discovery_splash": None,
+            "banner": None,
+            "description": None,
+            "features": [],
+            "afk_channel_id": None,
+            "afk_timeout": 300,
+            "verification_level": 0,
+            "default_message_notifications": 0,
+            "explicit_content_filter": 0,
+            "mfa_level": 0,
+            "nsfw_level": 0,
+            "premium_tier": 0,
+            "premium_progress_bar_enabled": False,
+            "preferred_locale": "en-US",
+            "system_channel_id": None,
+            "system_channel_flags": 0,
+            "rules_channel_id": None,
+            "public_updates_channel_id": None,
+            "application_id": None,
+            "vanity_url_code": None,
+            "large": False,
+            "unavailable": False,
+            "member_count": len(self.members[guild_id]),
+            "roles": list(self.roles[guild_id].values()),
+            "emojis": [],
+            "stickers": [],
+            "members": [self.member_payload(guild_id, user_id) for user_id in self.members[guild_id]],
+            "channels": [
+                {key: value for key, value in channel.items() if key != "guild_id"}
+                for channel in self.channels.values()
+                if int(channel["guild_id"]) == guild_id
+            ],
+            "threads": [],
+            "presences": [],
+            "voice_states": [],
+            "stage_instances": [],
+            "guild_scheduled_events": [],
+            "soundboard_sounds": [],
+        }
+
+    def interaction_payload(
+        self,
+        guild_id: int,
+        channel_id: int,
+        user_id: int,
+        type: int,
+        data: Dict[str, Any],
+        *,
+        message: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        # What the gateway sends as INTERACTION_CREATE; the token is registered
+        # so the callback and webhook routes can find the interaction again.
+        interaction_id = self.snowflake()
+        token = secrets.token_urlsafe(24)
+        self.interactions[token] = {
+            "id": interaction_id,
+            "type": type,
+            "source_message": int(message["id"]) if message is not None else None,
+            "guild_id": guild_id,
+            "channel_id": channel_id,
+            "user_id": user_id,
+            "original": None,
+            "components": [],
+        }
+        payload: Dict[str, Any] = {
+            "id": str(interaction_id),
+            "application_id": str(APPLICATION_ID),
+            "type": type,
+            "data": data,
+            "guild_id": str(guild_id),
+            "channel_id": str(channel_id),
+            "channel": self.channels[channel_id],
+            "member": {
+                **self.member_payload(guild_id, user_id),
+                "permissions": str(self.member_permissions(guild_id, user_id)),
+            },
+            "token": token,
+            "version": 1,
+            "app_permissions": str(discord.Permissions.all().value),
+            "attachment_size_limit": 10 * 1024 * 1024,
+            "locale": "en-US",
+            "guild_locale": "en-US",
+            "entitlements": [],
+            "authorizing_integration_owners": {"0": str(guild_id)},
+            "context": 0,
+        }
+        if message is not None:
+            payload["message"] = message
+        return payload
+
+    def _message_from_body(self, channel_id: int, author_id: int, body: Dict[str, Any], files: int) -> Dict[str, Any]:
+        message = self.add_message(
+            channel_id,
+            author_id,
+            body.get("content") or "",
+            flags=int(body.get("flags") or 0),
+            components=body.get("components"),
+            embeds=body.get("embeds"),
+        )
+        for index in range(files):
+            attachment_id = self.snowflake()
+            message["attachments"].append(
+                {
+                    "id": str(attachment_id),
+                    "filename": f"file-{index}",
+                    "size": 0,
+                    "url": f"{self.url}/attachments/{attachment_id}",
+                    "proxy_url": f"{self.url}/attachments/{attachment_id}",
+                }
+            )
+        return message
+
+    # -- HTTP plumbing -----------------------------------------------------
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler: Callable[[web.Request], Any]) -> web.StreamResponse:
+        resource = request.match_info.route.resource
+        template = resource.canonical[len(API_PREFIX):] if resource is not None else request.path
+        route = f"{request.method} {template}"
+        self.requests[route] = self.requests.get(route, 0) + 1
+        faults = self.faults
+        delay = faults.latency_ms + self._random.uniform(0, faults.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if resource is None:
+            response: web.StreamResponse = self._error(404, "404: Not Found", 0)
+        elif faults.error_rate and self._random.random() < faults.error_rate:
+            response = self._error(self._random.choice((500, 502, 504)), "Internal Server Error", 0)
+        else:
+            headers, retry_after = self._take_bucket(request, route)
+            if retry_after is None and faults.rate_limit_rate and self._random.random() < faults.rate_limit_rate:
+                retry_after, headers["X-RateLimit-Scope"] = faults.retry_after, "shared"
+            if retry_after is not None:
+                response = self._rate_limited(retry_after, headers)
+            else:
+                try:
+                    response = await handler(request)
+                except _ApiError as exc:
+                    response = self._error(exc.status, exc.message, exc.code)
+                response.headers.update(headers)
+        # discord.py treats a 429 without Via as a Cloudflare ban.
+        response.headers["Via"] = "1.1 google"
+        self.statuses[response.status] = self.statuses.get(response.status, 0) + 1
+        return response
+
+    def _take_bucket(self, request: web.Request, route: str) -> Tuple[Dict[str, str], Optional[float]]:
+        limit = self.faults.bucket_limit
+        if limit <= 0:
+            return {}, None
+        info = request.match_info
+        major = info.get("channel_id") or info.get("guild_id") or info.get("webhook_id") or ""
+        key = (route, major)
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None or now >= bucket.reset_at:
+            bucket = _Bucket(remaining=limit, reset_at=now + self.faults.bucket_window)
+            self._buckets[key] = bucket
+        reset_after = max(bucket.reset_at - now, 0.0)
+        headers = {
+            "X-RateLimit-Limit": str(limit),
+            "X-RateLimit-Bucket": hashlib.sha1(route.encode()).hexdigest()[:16],
+            "X-RateLimit-Reset": f"{time.time() + reset_after:.3f}",
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+        }
+        if bucket.remaining <= 0:
+            headers["X-RateLimit-Remaining"] = "0"
+            headers["X-RateLimit-Scope"] = "user"
+            return headers, reset_after
+        bucket.remaining -= 1
+        headers["X-RateLimit-Remaining"] = str(bucket.remaining)
+        return headers, None
+
+    def _rate_limited(self, retry_after: float, headers: Dict[str, str]) -> web.Response:
+        headers = dict(headers)
+        headers["Retry-After"] = str(max(1, int(retry_after + 0.999)))
+        body = {"message": "You are being rate limited.", "retry_after": round(retry_after, 3), "global": False}
+        return _json(body, status=429, headers=headers)
+
+    def _error(self, status: int, message: str, code: int) -> web.Response:
+        return _json({"message": message, "code": code}, status=status)
+
+    async def _body(self, request: web.Request) -> Tuple[Dict[str, Any], int]:
+        # JSON, or multipart with a payload_json part plus files; returns the payload and the file count.
+        if request.content_type == "multipart/form-data":
+            form = await request.post()
+            payload = json.loads(form.get("payload_json") or "{}")  # type: ignore[arg-type]
+            return payload, sum(1 for key in form if key != "payload_json")
+        if request.can_read_body:
+            return await request.json(), 0
+        return {}, 0
+
+    def _add_routes(self) -> None:
+        routes = [
+            ("GET", "/users/@me", self._get_me),
+            ("GET", "/oauth2/applications/@me", self._get_application),
+            ("PUT", "/applications/{application_id}/commands", self._put_commands),
+            ("PUT", "/applications/{application_id}/guilds/{guild_id}/commands", self._put_commands),
+            ("POST", "/interactions/{webhook_id}/{webhook_token}/callback", self._interaction_callback),
+            ("POST", "/webhooks/{webhook_id}/{webhook_token}", self._followup),
+            ("GET", "/webhooks/{webhook_id}/{webhook_token}/messages/{message_id}", self._get_webhook_message),
+            ("PATCH", "/webhooks/{webhook_id}/{webhook_token}/messages/{message_id}", self._edit_webhook_message),
+            ("DELETE", "/webhooks/{webhook_id}/{webhook_token}/messages/{message_id}", self._delete_webhook_message),
+            ("GET", "/channels/{channel_id}", self._get_channel),
+            ("PATCH", "/channels/{channel_id}", self._edit_channel),
+            ("DELETE", "/channels/{channel_id}", self._delete_channel),
+            ("PUT", "/channels/{channel_id}/permissions/{overwrite_id}", self._edit_permissions),
+            ("GET", "/channels/{channel_id}/messages", self._get_messages),
+            ("POST", "/channels/{channel_id}/messages", self._create_message),
+            ("DELETE", "/channels/{channel_id}/messages/{message_id}", self._delete_message),
+            ("POST", "/channels/{channel_id}/messages/bulk-delete", self._bulk_delete),
+            ("POST", "/guilds/{guild_id}/channels", self._create_channel),
+            ("GET", "/guilds/{guild_id}/members/{user_id}", self._get_member),
+            ("PATCH", "/guilds/{guild_id}/members/{user_id}", self._edit_member),
+            ("DELETE", "/guilds/{guild_id}/members/{user_id}", self._kick),
+            ("PUT", "/guilds/{guild_id}/members/{user_id}/roles/{role_id}", self._add_member_role),
+            ("DELETE", "/guilds/{guild_id}/members/{user_id}/roles/{role_id}", self._remove_member_role),
+            ("PUT", "/guilds/{guild_id}/bans/{user_id}", self._ban),
+            ("DELETE", "/guilds/{guild_id}/bans/{user_id}", self._unban),
+        ]
+        for method, path, handler in routes:
+            self.app.router.add_route(method, API_PREFIX + path, handler)
+
+    # -- lookups -----------------------------------------------------------
+
+    def _guild(self, request: web.Request) -> int:
+        guild_id = int(request.match_info["guild_id"])
+        if guild_id not in self.guilds:
+            raise _ApiError(404, "Unknown Guild", 10004)
+        return guild_id
+
+    def _channel(self, request: web.Request) -> Dict[str, Any]:
+        channel = self.channels.get(int(request.match_info["channel_id"]))
+        if channel is None:
+            raise _ApiError(404, "Unknown Channel", 10003)
+        return channel
+
+    def _member(self, request: web.Request) -> Tuple[int, int]:
+        guild_id = self._guild(request)
+        user_id = int(request.match_info["user_id"])
+        if user_id not in self.members[guild_id]:
+            raise _ApiError(404, "Unknown Member", 10007)
+        return guild_id, user_id
+
+    def _interaction(self, request: web.Request) -> Dict[str, Any]:
+        interaction = self.interactions.get(request.match_info["webhook_token"])
+        if interaction is None:
+            raise _ApiError(404, "Unknown interaction", 10062)
+        return interaction
+
+    def _member_updated(self, guild_id: int, user_id: int) -> Dict[str, Any]:
+        payload = self.member_payload(guild_id, user_id)
+        self.dispatch("GUILD_MEMBER_UPDATE", {**payload, "guild_id": str(guild_id)})
+        return payload
+
+    # -- handlers ----------------------------------------------------------
+
+    async def _get_me(self, request: web.Request) -> web.Response:
+        return _json(self.users[BOT_USER_ID])
+
+    async def _get_application(self, request: web.Request) -> web.Response:
+        return _json(
+            {
+                "id": str(APPLICATION_ID),
+                "name": "QuefBot",
+                "icon": None,
+                "description": "",
+                "bot_public": True,
+                "bot_require_code_grant": False,
+                "verify_key": "0" * 64,
+                "flags": 0,
+                "owner": self.users[BOT_USER_ID],
+                "team": None,
+                "interactions_endpoint_url": None,
+            }
+        )
+
+    async def _put_commands(self, request: web.Request) -> web.Response:
+        body, _ = await self._body(request)
+        guild_id = request.match_info.get("guild_id")
+        self.commands = [
+            {**command, "id": str(self.snowflake()), "application_id": str(APPLICATION_ID), "version": "1",
+             **({"guild_id": guild_id} if guild_id else {})}
+            for command in body
+        ]
+        return _json(self.commands)
+
+    async def _interaction_callback(self, request: web.Request) -> web.Response:
+        interaction = self._interaction(request)
+        body, files = await self._body(request)
+        kind = int(body.get("type", 0))
+        data = body.get("data") or {}
+        result: Dict[str, Any] = {
+            "interaction": {"id": str(interaction["id"]), "type": interaction["type"]},
+        }
+        if kind in (4, 5):
+            # Channel message (4) or deferred (5): the response becomes the original message.
+            message = self._message_from_body(interaction["channel_id"], BOT_USER_ID, data, files)
+            interaction["original"] = int(message["id"])
+            interaction["components"] = data.get("components") or []
+            result["interaction"].update(
+                response_message_id=message["id"],
+                response_message_loading=kind == 5,
+                response_message_ephemeral=bool(int(data.get("flags") or 0) & EPHEMERAL),
+            )
+            result["resource"] = {"type": kind, "message": message}
+        elif kind in (6, 7):
+            # Deferred or immediate update of the message the component was on.
+            message = self.find_message(interaction["channel_id"], interaction["source_message"] or 0)
+            if message is not None and kind == 7:
+                message.update({key: data[key] for key in ("content", "embeds", "components") if key in data})
+                interaction["components"] = message["components"]
+            result["resource"] = {"type": kind, **({"message": message} if message is not None else {})}
+        else:
+            result["resource"] = {"type": kind}
+        return _json(result)
+
+    async def _followup(self, request: web.Request) -> web.Response:
+        interaction = self._interaction(request)
+        body, files = await self._body(request)
+        message = self._message_from_body(interaction["channel_id"], BOT_USER_ID, body, files)
+        if body.get("components"):
+            interaction["components"] = body["components"]
+        return _json(message)
+
+    def _webhook_message(self, request: web.Request) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        interaction = self._interaction(request)
+        raw = request.match_info["message_id"]
+        message_id = interaction["original"] if raw == "@original" else int(raw)
+        message = self.find_message(interaction["channel_id"], message_id or 0)
+        if message is None:
+            raise _ApiError(404, "Unknown Message", 10008)
+        return interaction, message
+
+    async def _get_webhook_message(self, request: web.Request) -> web.Response:
+        _, message = self._webhook_message(request)
+        return _json(message)
+
+    async def _edit_webhook_message(self, request: web.Request) -> web.Response:
+        interaction, message = self._webhook_message(request)
+        body, _ = await self._body(request)
+        message.update({key: body[key] for key in ("content", "embeds", "components") if key in body})
+        if "components" in body:
+            interaction["components"] = body["components"] or []
+        return _json(message)
+
+    async def _delete_webhook_message(self, request: web.Request) -> web.Response:
+        interaction, message = self._webhook_message(request)
+        self.messages.get(interaction["channel_id"], {}).pop(int(message["id"]), None)
+        self.ephemeral.pop(int(message["id"]), None)
+        return web.Response(status=204)
+
+    async def _get_channel(self, request: web.Request) -> web.Response:
+        return _json(self._channel(request))
+
+    async def _edit_channel(self, request: web.Request) -> web.Response:
+        channel = self._channel(request)
+        body, _ = await self._body(request)
+        channel.update({key: value for key, value in body.items() if key in channel})
+        self.dispatch("CHANNEL_UPDATE", channel)
+        return _json(channel)
+
+    async def _delete_channel(self, request: web.Request) -> web.Response:
+        channel = self._channel(request)
+        channel_id = int(channel["id"])
+        del self.channels[channel_id]
+        self.messages.pop(channel_id, None)
+        self.dispatch("CHANNEL_DELETE", channel)
+        return _json(channel)
+
+    async def _edit_permissions(self, request: web.Request) -> web.Response:
+        channel = self._channel(request)
+        body, _ = await self._body(request)
+        overwrite_id = request.match_info["overwrite_id"]
+        overwrites = [item for item in channel["permission_overwrites"] if item["id"] != overwrite_id]
+        overwrites.append({"id": overwrite_id, "type": body.get("type", 0), "allow": body.get("allow", "0"), "deny": body.get("deny", "0")})
+        channel["permission_overwrites"] = overwrites
+        self.dispatch("CHANNEL_UPDATE", channel)
+        return web.Response(status=204)
+
+    async def _get_messages(self, request: web.Request) -> web.Response:
+        channel = self._channel(request)
+        limit = min(int(request.query.get("limit", 50)), 100)
+        before = request.query.get("before")
+        after = request.query.get("after")
+        ids = list(self.messages[int(channel["id"])])
+        if after is not None:
+            # Oldest first from `after`, returned newest first like Discord does.
+            selected = [message_id for message_id in ids if message_id > int(after)][:limit][::-1]
+        else:
+            if before is not None:
+                ids = [message_id for message_id in ids if message_id < int(before)]
+            selected = ids[::-1][:limit]
+        messages = self.messages[int(channel["id"])]
+        return _json([messages[message_id] for message_id in selected])
+
+    async def _create_message(self, request: web.Request) -> web.Response:
+        channel = self._channel(request)
+        body, files = await self._body(request)
+        message = self._message_from_body(int(channel["id"]), BOT_USER_ID, body, files)
+        return _json(message)
+
+    async def _delete_message(self, request: web.Request) -> web.Response:
+        channel = self._channel(request)
+        if self.messages[int(channel["id"])].pop(int(request.match_info["message_id"]), None) is None:
+            raise _ApiError(404, "Unknown Message", 10008)
+        return web.Response(status=204)
+
+    async def _bulk_delete(self, request: web.Request) -> web.Response:
+        channel = self._channel(request)
+        body, _ = await self._body(request)
+        ids = [int(message_id) for message_id in body.get("messages", [])]
+        if not 2 <= len(ids) <= 100:
+            raise _ApiError(400, "Invalid Form Body", 50035)
+        messages = self.messages[int(channel["id"])]
+        for message_id in ids:
+            messages.pop(message_id, None)
+        return web.Response(status=204)
+
+    async def _create_channel(self, request: web.Request) -> web.Response:
+        guild_id = self._guild(request)
+        body, _ = await self._body(request)
+        parent = body.get("parent_id")
+        channel = self.add_channel(guild_id, body["name"], type=int(body.get("type", 0)), parent_id=int(parent) if parent else None)
+        channel["topic"] = body.get("topic")
+        channel["permission_overwrites"] = body.get("permission_overwrites") or []
+        self.dispatch("CHANNEL_CREATE", channel)
+        return _json(channel, status=201)
+
+    async def _get_member(self, request: web.Request) -> web.Response:
+        guild_id, user_id = self._member(request)
+        return _json(self.member_payload(guild_id, user_id))
+
+    async def _edit_member(self, request: web.Request) -> web.Response:
+        guild_id, user_id = self._member(request)
+        body, _ = await self._body(request)
+        member = self.members[guild_id][user_id]
+        if "roles" in body:
+            member["roles"] = [str(role_id) for role_id in body["roles"] if int(role_id) in self.roles[guild_id]]
+        if "communication_disabled_until" in body:
+            member["communication_disabled_until"] = body["communication_disabled_until"]
+        return _json(self._member_updated(guild_id, user_id))
+
+    async def _kick(self, request: web.Request) -> web.Response:
+        guild_id, user_id = self._member(request)
+        del self.members[guild_id][user_id]
+        self.dispatch("GUILD_MEMBER_REMOVE", {"guild_id": str(guild_id), "user": self.users[user_id]})
+        return web.Response(status=204)
+
+    def _role(self, request: web.Request, guild_id: int) -> str:
+        role_id = int(request.match_info["role_id"])
+        if role_id not in self.roles[guild_id]:
+            raise _ApiError(404, "Unknown Role", 10011)
+        return str(role_id)
+
+    async def _add_member_role(self, request: web.Request) -> web.Response:
+        guild_id, user_id = self._member(request)
+        role_id = self._role(request, guild_id)
+        roles = self.members[guild_id][user_id]["roles"]
+        if role_id not in roles:
+            roles.append(role_id)
+            self._member_updated(guild_id, user_id)
+        return web.Response(status=204)
+
+    async def _remove_member_role(self, request: web.Request) -> web.Response:
+        guild_id, user_id = self._member(request)
+        role_id = self._role(request, guild_id)
+        roles = self.members[guild_id][user_id]["roles"]
+        if role_id in roles:
+            roles.remove(role_id)
+            self._member_updated(guild_id, user_id)
+        return web.Response(status=204)
+
+    async def _ban(self, request: web.Request) -> web.Response:
+        guild_id = self._guild(request)
+        user_id = int(request.match_info["user_id"])
+        self.bans[guild_id].add(user_id)
+        if self.members[guild_id].pop(user_id, None) is not None:
+            self.dispatch("GUILD_MEMBER_REMOVE", {"guild_id": str(guild_id), "user": self.users[user_id]})
+        return web.Response(status=204)
+
+    async def _unban(self, request: web.Request) -> web.Response:
+        guild_id = self._guild(request)
+        user_id = int(request.match_info["user_id"])
+        if user_id not in self.bans[guild_id]:
+            raise _ApiError(404, "Unknown Ban", 10026)
+        self.bans[guild_id].discard(user_id)
+        return web.Response(status=204)
+
+
+def _json(data: Any, status: int = 200, headers: Optional[Dict[str, str]] = None) -> web.Response:
+    # Exactly "application/json": discord.py reads anything else, charset included, as text.
+    return web.Response(body=json.dumps(data).encode(), status=status, headers={**(headers or {}), "Content-Type": "application/json"})
+
+
+class _ApiError(Exception):
+    def __init__(self, status: int, message: str, code: int) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.code = code
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=0, help="Added to every request")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Random extra latency, up to this much")
+    parser.add_argument("--bucket-limit", type=int, default=0, help="Requests per bucket per window (0 = no rate-limit headers)")
+    parser.add_argument("--bucket-window", type=float, default=1.0, help="Bucket window in seconds")
+    parser.add_argument("--rate-limit-rate", type=float, default=0, help="Share of requests answered with a shared-scope 429")
+    parser.add_argument("--error-rate", type=float, default=0, help="Share of requests answered with a 500/502/504")
+    parser.add_argument("--retry-after", type=float, default=0.25, help="retry_after for injected 429s, in seconds")
+
+
+def faults_from_args(args: argparse.Namespace) -> Faults:
+    return Faults(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        bucket_limit=args.bucket_limit,
+        bucket_window=args.bucket_window,
+        rate_limit_rate=args.rate_limit_rate,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+    )
+
+
+async def serve(args: argparse.Namespace) -> None:
+    server = FakeDiscord(faults_from_args(args), seed=args.seed)
+    for index in range(args.guilds):
+        guild_id = 1_000 + index
+        server.add_guild(guild_id, f"fake-{index}", owner_id=BOT_USER_ID)
+        server.add_channel(guild_id, "general")
+        for number in range(args.members):
+            server.add_member(guild_id, 100_000 + number, f"member-{number}")
+    url = await server.start(args.host, args.port)
+    print(f"Fake Discord API listening on {url} (set DISCORD_API_BASE_URL to this)")
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve an in-memory stand-in for the Discord REST API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--guilds", type=int, default=1)
+    parser.add_argument("--members", type=int, default=50, help="Members per guild")
+    parser.add_argument("--seed", type=int, default=1)
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
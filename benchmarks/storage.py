@@ -0,0 +1,317 @@
+import argparse
+import datetime
+import gc
+import itertools
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.dataset import (
+    ANCHOR,
+    EMOJI,
+    FIRST_MODERATOR_ID,
+    PHRASES,
+    DatasetSpec,
+    generate,
+    load_spec,
+    open_database,
+    pick_user,
+    spec_path,
+)
+from benchmarks.query_plans import _public_methods
+from models.punishments import HistoryCursor, JailState, NoteRecord, PunishmentQuery, PunishmentRecord
+from services.cache import ConfigCache
+from services.database import Database, to_epoch_ms
+from services.exports import HistoryExporter
+from services.history import HistoryStore
+from services.reaction_roles import ReactionRoleStore
+from services.tickets import TicketService
+
+
+DEFAULT_BASELINE = Path(__file__).with_name("storage_baseline.json")
+# Small absolute changes are scheduler and fsync noise, not regressions: a
+# cached lookup going from 3µs to 5µs is a 40% drop in ops/sec.
+MEAN_SLACK_MS = 0.01
+P99_SLACK_MS = 0.5
+
+Op = Callable[[random.Random], Any]
+
+
+@dataclass
+class Case:
+    name: str
+    iterations: int
+    op: Op
+
+
+@dataclass
+class CaseResult:
+    name: str
+    iterations: int
+    ops_per_sec: float
+    p50_ms: float
+    p99_ms: float
+
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    return samples[int(round(fraction * (len(samples) - 1)))]
+
+
+def _measure(case: Case, rnd: random.Random, iterations: int) -> CaseResult:
+    samples = []
+    gc.disable()
+    try:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            case.op(rnd)
+            samples.append(time.perf_counter() - started)
+    finally:
+        gc.enable()
+    samples.sort()
+    total = sum(samples)
+    return CaseResult(
+        name=case.name,
+        iterations=iterations,
+        ops_per_sec=iterations / total if total else float("inf"),
+        p50_ms=_percentile(samples, 0.5) * 1000,
+        p99_ms=_percentile(samples, 0.99) * 1000,
+    )
+
+
+def run_case(case: Case, seed: int, iterations: int, rounds: int) -> CaseResult:
+    # Best of several rounds: noise (fsync stalls, other processes) only ever
+    # makes a round slower, so the fastest round is the most repeatable figure.
+    # Every round replays the same arguments, seeded per case so --filter does
+    # not change what a case runs.
+    case_seed = seed ^ zlib.crc32(case.name.encode())
+    warmup = random.Random(~case_seed)
+    for _ in range(min(3, iterations)):
+        case.op(warmup)
+    results = [_measure(case, random.Random(case_seed), iterations) for _ in range(max(1, rounds))]
+    return CaseResult(
+        name=case.name,
+        iterations=iterations,
+        ops_per_sec=max(r.ops_per_sec for r in results),
+        p50_ms=min(r.p50_ms for r in results),
+        p99_ms=min(r.p99_ms for r in results),
+    )
+
+
+def _cases(db: Database, spec: DatasetSpec) -> Tuple[List[Case], Dict[object, str]]:
+    cache = ConfigCache()
+    history = HistoryStore(db)
+    tickets = TicketService(db, cache)
+    reaction_roles = ReactionRoleStore(db, cache)
+    exporter = HistoryExporter(db, history)
+    now = datetime.datetime.utcnow()
+
+    def guild(rnd: random.Random) -> int:
+        return rnd.choice(spec.guild_ids)
+
+    def user(rnd: random.Random) -> int:
+        return pick_user(rnd, spec.users)
+
+    def moderator(rnd: random.Random) -> int:
+        return FIRST_MODERATOR_ID + rnd.randrange(5)
+
+    def ticket(rnd: random.Random) -> int:
+        return rnd.randint(1, max(1, spec.tickets))
+
+    def message(rnd: random.Random) -> int:
+        return 900_000 + rnd.randrange(max(1, spec.reaction_messages // spec.guilds))
+
+    def punishment(rnd: random.Random) -> PunishmentRecord:
+        return PunishmentRecord(
+            user_id=user(rnd), moderator_id=moderator(rnd), action="Warn",
+            reason=rnd.choice(PHRASES), created_at=now, expires_at=None,
+        )
+
+    def note(rnd: random.Random) -> NoteRecord:
+        return NoteRecord(user_id=user(rnd), moderator_id=moderator(rnd), text=rnd.choice(PHRASES), created_at=now)
+
+    def jail(rnd: random.Random) -> JailState:
+        return JailState(
+            guild_id=guild(rnd), user_id=user(rnd), role_id=4, reason=None,
+            created_at=now, expires_at=now + datetime.timedelta(hours=1),
+        )
+
+    def deep_page(rnd: random.Random) -> Any:
+        g = guild(rnd)
+        cursor = HistoryCursor(created_ms=to_epoch_ms(ANCHOR) - rnd.randrange(spec.days) * 86_400_000, id=0)
+        return history.get_punishment_page(g, limit=10, before=cursor)
+
+    def export(rnd: random.Random, query: Optional[PunishmentQuery], limit: Optional[int]) -> None:
+        result = exporter.export(guild(rnd), query, limit=limit)
+        result.fp.close()
+
+    def cold_mappings(rnd: random.Random) -> Any:
+        cache.clear()
+        return reaction_roles.get_mappings_for_message(guild(rnd), message(rnd))
+
+    # Whole-guild reads get few iterations: at millions of rows each one takes seconds.
+    cases = [
+        Case("HistoryStore.add_punishment", 300, lambda r: history.add_punishment(guild(r), punishment(r))),
+        Case("HistoryStore.add_note", 300, lambda r: history.add_note(guild(r), note(r))),
+        Case("HistoryStore.add_punishments", 20, lambda r: history.add_punishments(guild(r), [punishment(r) for _ in range(500)])),
+        Case("HistoryStore.add_notes", 20, lambda r: history.add_notes(guild(r), [note(r) for _ in range(500)])),
+        Case("HistoryStore.get_punishments", 3, lambda r: history.get_punishments(guild(r))),
+        Case("HistoryStore.get_notes", 5, lambda r: history.get_notes(guild(r))),
+        Case("HistoryStore.get_punishments_for_user", 300, lambda r: history.get_punishments_for_user(guild(r), user(r))),
+        Case("HistoryStore.get_notes_for_user", 300, lambda r: history.get_notes_for_user(guild(r), user(r))),
+        Case("HistoryStore.scan_punishments", 3, lambda r: sum(1 for _ in history.scan_punishments(guild(r)))),
+        Case("HistoryStore.scan_notes", 300, lambda r: sum(1 for _ in history.scan_notes(guild(r), user(r)))),
+        Case("HistoryStore.query_punishments", 200, lambda r: history.query_punishments(guild(r), PunishmentQuery(moderator_id=moderator(r)))),
+        Case("HistoryStore.query_notes", 200, lambda r: history.query_notes(guild(r), PunishmentQuery(user_id=user(r)))),
+        Case("HistoryStore.iter_punishments", 50, lambda r: sum(1 for _ in itertools.islice(history.iter_punishments(guild(r)), 2000))),
+        Case("HistoryStore.iter_notes", 50, lambda r: sum(1 for _ in itertools.islice(history.iter_notes(guild(r)), 2000))),
+        Case("HistoryStore.get_punishment_page", 300, lambda r: history.get_punishment_page(guild(r), PunishmentQuery(action="Ban"))),
+        Case("HistoryStore.get_infraction_summary", 500, lambda r: history.get_infraction_summary(guild(r), user(r))),
+        Case("HistoryStore.search", 200, lambda r: history.search(guild(r), f'"{r.choice(PHRASES)}"')),
+        Case("HistoryStore.get_archived_punishments_for_user", 300, lambda r: history.get_archived_punishments_for_user(guild(r), user(r))),
+        Case("HistoryStore.set_jail", 300, lambda r: history.set_jail(jail(r))),
+        Case("HistoryStore.get_jail", 500, lambda r: history.get_jail(guild(r), user(r))),
+        Case("HistoryStore.clear_jail", 300, lambda r: history.clear_jail(guild(r), user(r))),
+        Case("TicketService.set_category", 200, lambda r: tickets.set_category(guild(r), r.randrange(10**6))),
+        Case("TicketService.get_category", 1000, lambda r: tickets.get_category(guild(r))),
+        Case("TicketService.set_transcript_channel", 200, lambda r: tickets.set_transcript_channel(guild(r), r.randrange(10**6))),
+        Case("TicketService.get_transcript_channel", 1000, lambda r: tickets.get_transcript_channel(guild(r))),
+        Case("TicketService.create_ticket", 300, lambda r: tickets.create_ticket(user(r), "high")),
+        Case("TicketService.link_channel", 300, lambda r: tickets.link_channel(ticket(r), guild(r), 800_000 + r.randrange(10**6))),
+        Case("TicketService.get_channel_for_ticket", 500, lambda r: tickets.get_channel_for_ticket(ticket(r))),
+        Case("TicketService.get_ticket_by_channel", 500, lambda r: tickets.get_ticket_by_channel(guild(r), 800_000 + ticket(r))),
+        Case("TicketService.get_open_ticket_for_user", 500, lambda r: tickets.get_open_ticket_for_user(guild(r), user(r))),
+        Case("TicketService.escalate_ticket", 300, lambda r: tickets.escalate_ticket(ticket(r), "critical", moderator(r))),
+        Case("TicketService.close_ticket", 300, lambda r: tickets.close_ticket(ticket(r))),
+        Case("TicketService.get_ticket", 500, lambda r: tickets.get_ticket(ticket(r))),
+        Case("ReactionRoleStore.set_mapping", 200, lambda r: reaction_roles.set_mapping(guild(r), message(r), r.choice(EMOJI), 7)),
+        Case("ReactionRoleStore.get_mappings_for_message", 1000, lambda r: reaction_roles.get_mappings_for_message(guild(r), message(r))),
+        Case("ReactionRoleStore.get_mappings_for_message (cold)", 200, cold_mappings),
+        Case("ReactionRoleStore.clear_mapping", 200, lambda r: reaction_roles.clear_mapping(guild(r), message(r), r.choice(EMOJI))),
+        Case("ReactionRoleStore.clear_message", 50, lambda r: reaction_roles.clear_message(guild(r), message(r))),
+        Case("ReactionRoleStore.set_channel", 200, lambda r: reaction_roles.set_channel(guild(r), message(r), 700_000 + r.randrange(5))),
+        Case("ReactionRoleStore.get_panels", 200, lambda r: reaction_roles.get_panels(guild(r))),
+        Case("ReactionRoleStore.load", 5, lambda r: reaction_roles.load()),
+        Case("ReactionRoleStore.role_for_reaction", 5000, lambda r: reaction_roles.role_for_reaction(guild(r), message(r), r.choice(EMOJI))),
+        Case("ReactionRoleStore.role_for_reaction (other message)", 5000, lambda r: reaction_roles.role_for_reaction(guild(r), r.randrange(10**6), r.choice(EMOJI))),
+        # What the diagnostics commands run per invocation.
+        Case("/audit-history user page", 300, lambda r: history.get_punishment_page(guild(r), PunishmentQuery(user_id=user(r)))),
+        Case("/audit-history deep page", 300, deep_page),
+        Case("/history-search", 200, lambda r: history.search(guild(r), r.choice(PHRASES), user_id=user(r))),
+        Case("/member-info", 500, lambda r: history.get_infraction_summary(guild(r), user(r))),
+        Case("/logs-export user", 100, lambda r: export(r, PunishmentQuery(user_id=user(r)), None)),
+        Case("/logs-export 5000 rows", 10, lambda r: export(r, None, 5000)),
+        Case("/db-stats", 200, lambda r: db.metrics.snapshot().top(8)),
+    ]
+    stores = {history: "HistoryStore", tickets: "TicketService", reaction_roles: "ReactionRoleStore"}
+    return cases, stores
+
+
+def compare(
+    results: List[CaseResult],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float,
+    p99_tolerance: float,
+) -> List[str]:
+    regressions = []
+    for result in results:
+        saved = baseline.get(result.name)
+        if saved is None:
+            continue
+        mean_ms = 1000 / result.ops_per_sec
+        saved_mean_ms = 1000 / saved["ops_per_sec"]
+        if result.ops_per_sec < saved["ops_per_sec"] * (1 - tolerance) and mean_ms - saved_mean_ms > MEAN_SLACK_MS:
+            regressions.append(f"{result.name}: {saved['ops_per_sec']:.0f} -> {result.ops_per_sec:.0f} ops/sec")
+        limit = max(saved["p99_ms"] * (1 + p99_tolerance), saved["p99_ms"] + P99_SLACK_MS)
+        if result.p99_ms > limit:
+            regressions.append(f"{result.name}: p99 {saved['p99_ms']:.3f} -> {result.p99_ms:.3f} ms")
+    return regressions
+
+
+def _prepare(args: argparse.Namespace, workdir: Path) -> Tuple[Database, DatasetSpec]:
+    # Benchmarks write, so they always run against a copy of the dataset.
+    path = workdir / "bench.db"
+    shard_dir = workdir / "shards" if args.shards else None
+    if args.dataset is None:
+        spec = DatasetSpec()
+        db = open_database(path, shard_dir)
+        print("generating the default dataset...")
+        generate(db, spec)
+        return db, spec
+    spec = load_spec(args.dataset)
+    for suffix in ("", "-wal"):
+        source = Path(f"{args.dataset}{suffix}")
+        if source.exists():
+            shutil.copy2(source, Path(f"{path}{suffix}"))
+    if args.shards:
+        shutil.copytree(args.shards, shard_dir)
+    return open_database(path, shard_dir), spec
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the storage layer and compare against a saved baseline")
+    parser.add_argument("--dataset", type=Path, help="Database from `python -m benchmarks.dataset` (default: a small generated one)")
+    parser.add_argument("--shards", type=Path, help="Shard directory of a sharded dataset")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results to --baseline instead of comparing")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every case's iteration count")
+    parser.add_argument("--rounds", type=int, default=3, help="Run each case this often and keep the best round")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Allowed ops/sec drop (fraction)")
+    parser.add_argument("--p99-tolerance", type=float, default=1.0, help="Allowed p99 increase (fraction); p99 is noisier than ops/sec")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if args.dataset is not None and not spec_path(args.dataset).exists():
+        parser.error(f"{spec_path(args.dataset)} not found; create the dataset with python -m benchmarks.dataset")
+
+    saved: Dict[str, Any] = {}
+    if not args.save_baseline and args.baseline.exists():
+        saved = json.loads(args.baseline.read_text())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db, spec = _prepare(args, Path(tmp))
+        try:
+            if saved and saved.get("dataset") != asdict(spec):
+                print(f"warning: {args.baseline} was recorded on a different dataset; the comparison is not meaningful")
+            cases, stores = _cases(db, spec)
+            covered = {case.name for case in cases}
+            missing = [
+                f"{label}.{name}"
+                for store, label in stores.items()
+                for name in sorted(_public_methods(store))
+                if f"{label}.{name}" not in covered
+            ]
+            results = []
+            print(f"{'case':<50} {'iters':>6} {'ops/sec':>10} {'p50 ms':>9} {'p99 ms':>9}")
+            for case in cases:
+                if args.filter not in case.name:
+                    continue
+                result = run_case(case, args.seed, max(1, int(case.iterations * args.scale)), args.rounds)
+                results.append(result)
+                print(f"{result.name:<50} {result.iterations:>6} {result.ops_per_sec:>10.0f} {result.p50_ms:>9.3f} {result.p99_ms:>9.3f}")
+        finally:
+            db.close()
+
+    for name in missing:
+        print(f"not benchmarked: {name}")
+    if args.save_baseline:
+        payload = {"dataset": asdict(spec), "results": {r.name: asdict(r) for r in results}}
+        args.baseline.write_text(json.dumps(payload, indent=2) + "\n")
+        print(f"saved {len(results)} results to {args.baseline}")
+        return
+    regressions = compare(results, saved.get("results", {}), args.tolerance, args.p99_tolerance) if saved else []
+    for line in regressions:
+        print(f"regression: {line}")
+    print(f"{len(results)} cases, {len(regressions)} regression(s), {len(missing)} unbenchmarked method(s)")
+    if regressions or missing:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
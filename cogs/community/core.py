@@ -72,8 +72,8 @@ class AutoRoleManageView(discord.ui.View):
             await interaction.response.edit_message(content=self._render_content(), view=self)
             return
         for trigger in self.selected_triggers:
-            self.cog.bot.auto_roles.clear_trigger(self.guild.id, trigger)
-        self.mappings = self.cog.bot.auto_roles.all_triggers(self.guild.id)
+            await self.cog.bot.auto_roles.clear_trigger_async(self.guild.id, trigger)
+        self.mappings = await self.cog.bot.auto_roles.all_triggers_async(self.guild.id)
         self.selected_triggers = []
         # Rebuild the select with updated mappings
         for child in list(self.children):
@@ -129,7 +129,7 @@ class VerifyControlView(discord.ui.View):
             await interaction.response.edit_message(content="Member is no longer in the server.", view=None)
             return
         trigger = (self.selected_trigger or "verify").lower().strip()
-        role_id = self.cog.bot.auto_roles.get_role(guild.id, trigger)
+        role_id = await self.cog.bot.auto_roles.get_role_async(guild.id, trigger)
         if not role_id:
             await interaction.response.edit_message(
                 content=f"No auto-role is configured for trigger '{trigger}'.",
@@ -143,9 +143,8 @@ class VerifyControlView(discord.ui.View):
                 view=None,
             )
             return
-        try:
-            await member.add_roles(role, reason=f"Verified via {method_label} ('{trigger}')")
-        except discord.HTTPException:
+        result = await self.cog.bot.role_queue.add(member, role, reason=f"Verified via {method_label} ('{trigger}')")
+        if not result.ok:
             await interaction.response.edit_message(content="Failed to assign the verification role.", view=None)
             return
         await log_moderation_action(
@@ -248,24 +247,31 @@ class ReactionRoleManageView(discord.ui.View):
                 view=None,
             )
             return
+        # A large panel takes several seconds of paced calls; answer the click first.
+        await interaction.response.defer()
         try:
             message = await channel.fetch_message(self.message_id)
         except discord.NotFound:
-            await interaction.response.edit_message(
+            await interaction.edit_original_response(
                 content="Message not found; cannot sync reaction roles.",
                 view=None,
             )
             return
-        for emoji, _role_id in self.mappings.items():
-            if not any(str(reaction.emoji) == emoji for reaction in message.reactions):
-                try:
-                    await message.add_reaction(emoji)
-                except discord.HTTPException:
-                    continue
-        await interaction.response.edit_message(
-            content="Reaction roles synced for the message.",
-            view=self,
-        )
+        results = await self.cog.bot.reaction_sync.sync(message, self.mappings)
+        symbols = {"added": "+", "present": "=", "removed": "-", "failed": "!"}
+        lines = ["Reaction sync for message `{}`:".format(self.message_id)]
+        for result in results:
+            line = f"`{symbols[result.action]}` {result.emoji} {result.action}"
+            if result.error:
+                line += f" ({result.error})"
+            lines.append(line)
+        failed = sum(1 for result in results if result.action == "failed")
+        if failed:
+            lines.append(f"{failed} emoji could not be synced.")
+        content = "\n".join(lines)
+        if len(content) > 2000:
+            content = content[:1997] + "..."
+        await interaction.edit_original_response(content=content, view=self)
 
     @discord.ui.button(label="Sync now", style=discord.ButtonStyle.primary)
     async def sync_now(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:  # type: ignore[override]
@@ -280,8 +286,8 @@ class ReactionRoleManageView(discord.ui.View):
             await interaction.response.edit_message(content=self._render_content(), view=self)
             return
         for emoji in self.selected_emojis:
-            self.cog.bot.reaction_roles.clear_mapping(self.guild.id, self.message_id, emoji)
-        self.mappings = self.cog.bot.reaction_roles.get_mappings_for_message(self.guild.id, self.message_id)
+            await self.cog.bot.reaction_roles.clear_mapping_async(self.guild.id, self.message_id, emoji)
+        self.mappings = await self.cog.bot.reaction_roles.get_mappings_for_message_async(self.guild.id, self.message_id)
         self.selected_emojis = []
         # Rebuild select with updated mappings
         for child in list(self.children):
@@ -296,7 +302,7 @@ class ReactionRoleManageView(discord.ui.View):
         if not self.mappings:
             await interaction.response.edit_message(content=self._render_content(), view=self)
             return
-        self.cog.bot.reaction_roles.clear_message(self.guild.id, self.message_id)
+        await self.cog.bot.reaction_roles.clear_message_async(self.guild.id, self.message_id)
         self.mappings = {}
         self.selected_emojis = []
         # Remove select since there are no mappings left
@@ -464,6 +470,7 @@ class SpotlightControlView(discord.ui.View):
 class Community(commands.Cog, PermissionGuard):
     def __init__(self, bot: QuefBot) -> None:
         self.bot = bot
+        self._reconcile_started = False
 
     @app_commands.command(name="verify", description="Approve and auto-role a member")
     @is_staff()
@@ -481,7 +488,7 @@ class Community(commands.Cog, PermissionGuard):
         if guild is None or member.guild.id != guild.id:
             await interaction.response.send_message("You must select a member from this server.", ephemeral=True)
             return
-        trigger_roles = self.bot.auto_roles.all_triggers(guild.id)
+        trigger_roles = await self.bot.auto_roles.all_triggers_async(guild.id)
         if not trigger_roles:
             await interaction.response.send_message(
                 "No auto-roles are configured for this server.",
@@ -521,7 +528,7 @@ class Community(commands.Cog, PermissionGuard):
             await interaction.response.send_message("You must select a role from this server.", ephemeral=True)
             return
         trigger_name = (trigger or "verify").lower().strip()
-        self.bot.auto_roles.set_role(guild.id, trigger_name, role.id)
+        await self.bot.auto_roles.set_role_async(guild.id, trigger_name, role.id)
         await interaction.response.send_message(
             f"Auto-role set: trigger '{trigger_name}' -> {role.mention}.",
             ephemeral=True,
@@ -541,7 +548,7 @@ class Community(commands.Cog, PermissionGuard):
                 view=ResponseView(),
             )
             return
-        mappings = self.bot.auto_roles.all_triggers(guild.id)
+        mappings = await self.bot.auto_roles.all_triggers_async(guild.id)
         if not mappings:
             await interaction.response.send_message(
                 "No auto-roles configured for this server.",
@@ -583,7 +590,7 @@ class Community(commands.Cog, PermissionGuard):
             await interaction.response.send_message("Message not found.", ephemeral=True)
             return
         emoji_str = emoji
-        self.bot.reaction_roles.set_mapping(guild.id, message.id, emoji_str, role.id)
+        await self.bot.reaction_roles.set_mapping_async(guild.id, message.id, emoji_str, role.id, channel.id)
         try:
             await message.add_reaction(emoji_str)
         except discord.HTTPException:
@@ -612,7 +619,7 @@ class Community(commands.Cog, PermissionGuard):
         if guild is None or channel.guild.id != guild.id:
             await interaction.response.send_message("You must select a channel from this server.", ephemeral=True)
             return
-        existing = self.bot.reaction_roles.get_mappings_for_message(guild.id, message_id)
+        existing = await self.bot.reaction_roles.get_mappings_for_message_async(guild.id, message_id)
         if not existing:
             await interaction.response.send_message(
                 "No reaction-role mappings are configured for this message.",
@@ -620,6 +627,8 @@ class Community(commands.Cog, PermissionGuard):
                 view=ResponseView(),
             )
             return
+        # Panels stored before channels were recorded pick theirs up here.
+        await self.bot.reaction_roles.set_channel_async(guild.id, message_id, channel.id)
         view = ReactionRoleManageView(self, guild, channel, message_id, existing)
         content = view._render_content()
         await interaction.response.send_message(content, ephemeral=True, view=view)
@@ -642,7 +651,7 @@ class Community(commands.Cog, PermissionGuard):
         if guild is None or channel.guild.id != guild.id:
             await interaction.response.send_message("You must select a channel from this server.", ephemeral=True)
             return
-        mappings = self.bot.reaction_roles.get_mappings_for_message(guild.id, message_id)
+        mappings = await self.bot.reaction_roles.get_mappings_for_message_async(guild.id, message_id)
         if not mappings:
             await interaction.response.send_message(
                 "No reaction-role mappings are configured for this message.",
@@ -650,10 +659,47 @@ class Community(commands.Cog, PermissionGuard):
                 view=ResponseView(),
             )
             return
+        # Panels stored before channels were recorded pick theirs up here.
+        await self.bot.reaction_roles.set_channel_async(guild.id, message_id, channel.id)
         view = ReactionRoleManageView(self, guild, channel, message_id, mappings)
         content = view._render_content()
         await interaction.response.send_message(content, ephemeral=True, view=view)
 
+    @react_role_group.command(name="reconcile", description="Re-apply reaction roles from the reactions on every panel")
+    @is_staff()
+    @has_guild_permissions(manage_roles=True)
+    @bot_has_guild_permissions(manage_roles=True)
+    @app_commands.describe(remove="Also take panel roles from members who are not reacting (auto roles are kept)")
+    async def react_role_reconcile(self, interaction: discord.Interaction, remove: bool = False) -> None:
+        guild = interaction.guild
+        if guild is None:
+            await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+            return
+        reconciler = self.bot.reaction_reconciler
+        if reconciler.running:
+            await interaction.response.send_message(
+                "A reaction-role reconciliation is already running.", ephemeral=True, view=ResponseView()
+            )
+            return
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        report = await reconciler.run([guild], remove=remove)
+        if not report.panels:
+            content = "No reaction-role panels are configured in this server."
+        else:
+            content = (
+                f"Reconciled {report.scanned}/{report.panels} panel(s) in {report.seconds:.0f}s: "
+                f"{report.added} role(s) added, {report.removed} removed, {report.failed} failed."
+            )
+            if report.skipped:
+                content += (
+                    f" {report.skipped} panel(s) could not be read; run `/react-role sync` with their channel "
+                    "to record it."
+                )
+        try:
+            await interaction.followup.send(content, ephemeral=True, view=ResponseView())
+        except discord.HTTPException:
+            pass
+
     @app_commands.command(name="announce", description="Send or schedule an announcement")
     @is_staff()
     @has_guild_permissions(manage_messages=True)
@@ -765,16 +811,29 @@ class Community(commands.Cog, PermissionGuard):
             reason=reason,
         )
 
+    @commands.Cog.listener()
+    async def on_ready(self) -> None:
+        # on_ready fires again after every full reconnect; reconcile once per process.
+        if self._reconcile_started or not self.bot.config.reaction_reconcile:
+            return
+        self._reconcile_started = True
+        try:
+            report = await self.bot.reaction_reconciler.run()
+        except Exception as exc:
+            print(f"Reaction-role reconciliation failed: {exc}")
+            return
+        if report.panels:
+            print(
+                f"Reaction-role reconciliation: {report.scanned}/{report.panels} panel(s), "
+                f"+{report.added}/-{report.removed} role(s), {report.failed} failed, {report.seconds:.1f}s"
+            )
+
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent) -> None:
         if payload.guild_id is None or payload.user_id == getattr(self.bot.user, "id", None):
             return
         guild_id = payload.guild_id
-        mappings = self.bot.reaction_roles.get_mappings_for_message(guild_id, payload.message_id)
-        if not mappings:
-            return
-        emoji_str = str(payload.emoji)
-        role_id = mappings.get(emoji_str)
+        role_id = self.bot.reaction_roles.role_for_reaction(guild_id, payload.message_id, payload.emoji)
         if not role_id:
             return
         guild = self.bot.get_guild(guild_id)
@@ -786,21 +845,14 @@ class Community(commands.Cog, PermissionGuard):
         member = payload.member or guild.get_member(payload.user_id)
         if member is None:
             return
-        try:
-            await member.add_roles(role, reason="Reaction role opt-in")
-        except discord.HTTPException:
-            return
+        await self.bot.role_queue.add(member, role, reason="Reaction role opt-in")
 
     @commands.Cog.listener()
     async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent) -> None:
         if payload.guild_id is None or payload.user_id == getattr(self.bot.user, "id", None):
             return
         guild_id = payload.guild_id
-        mappings = self.bot.reaction_roles.get_mappings_for_message(guild_id, payload.message_id)
-        if not mappings:
-            return
-        emoji_str = str(payload.emoji)
-        role_id = mappings.get(emoji_str)
+        role_id = self.bot.reaction_roles.role_for_reaction(guild_id, payload.message_id, payload.emoji)
         if not role_id:
             return
         guild = self.bot.get_guild(guild_id)
@@ -812,10 +864,7 @@ class Community(commands.Cog, PermissionGuard):
         member = guild.get_member(payload.user_id)
         if member is None:
             return
-        try:
-            await member.remove_roles(role, reason="Reaction role removal")
-        except discord.HTTPException:
-            return
+        await self.bot.role_queue.remove(member, role, reason="Reaction role removal")
 
 
 async def setup(bot: commands.Bot) -> None:
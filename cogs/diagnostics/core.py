@@ -1,7 +1,6 @@
-import csv
-import io
+import datetime
 import time
-from typing import Optional
+from typing import List, Optional
 
 import discord
 from discord import app_commands
@@ -9,9 +8,236 @@ from discord.ext import commands
 
 from core.bot import QuefBot
 from core.views import ResponseView
+from models.punishments import HistoryCursor, NoteRecord, PunishmentPage, PunishmentQuery, SearchPage
 from services.permissions import is_staff
 
 
+ACTION_CHOICES = [
+    app_commands.Choice(name=action, value=action)
+    for action in ("Warn", "Timeout", "Mute", "Kick", "Ban", "Softban", "Jail", "Pardon")
+]
+
+FORMAT_CHOICES = [
+    app_commands.Choice(name="CSV", value="csv"),
+    app_commands.Choice(name="NDJSON (one JSON object per line)", value="ndjson"),
+]
+
+# Discord rejects embeds whose title, description, fields and footer add up to more.
+EMBED_MAX_CHARS = 6000
+DB_STATS_SORT_CHOICES = [
+    app_commands.Choice(name="Total time", value="total"),
+    app_commands.Choice(name="Calls", value="calls"),
+    app_commands.Choice(name="p95 latency", value="p95"),
+    app_commands.Choice(name="Lock wait", value="lock"),
+    app_commands.Choice(name="Rows", value="rows"),
+]
+
+
+def _build_history_query(
+    user: Optional[discord.User],
+    moderator: Optional[discord.User],
+    action: Optional[app_commands.Choice[str]],
+    days: Optional[int],
+    reason: Optional[str],
+    active_only: bool,
+) -> PunishmentQuery:
+    since = None
+    if days is not None and days > 0:
+        since = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+    return PunishmentQuery(
+        user_id=user.id if user is not None else None,
+        moderator_id=moderator.id if moderator is not None else None,
+        action=action.value if action is not None else None,
+        since=since,
+        reason_contains=reason or None,
+        active_only=active_only,
+    )
+
+
+def _describe_history_filters(
+    user: Optional[discord.User],
+    moderator: Optional[discord.User],
+    action: Optional[app_commands.Choice[str]],
+    days: Optional[int],
+    reason: Optional[str],
+    active_only: bool,
+) -> str:
+    parts: List[str] = []
+    parts.append(f"User: {user} ({user.id})" if user is not None else "All users")
+    if moderator is not None:
+        parts.append(f"Moderator: {moderator}")
+    if action is not None:
+        parts.append(f"Action: {action.value}")
+    if days is not None and days > 0:
+        parts.append(f"Last {days} day(s)")
+    if reason:
+        parts.append(f"Reason contains '{reason}'")
+    if active_only:
+        parts.append("Active only")
+    return " | ".join(parts)
+
+
+class AuditHistoryView(discord.ui.View):
+    def __init__(
+        self,
+        cog: "Diagnostics",
+        guild: discord.Guild,
+        query: PunishmentQuery,
+        filter_label: str,
+        limit: int,
+        page: PunishmentPage,
+    ) -> None:
+        super().__init__(timeout=180)
+        self.cog = cog
+        self.guild = guild
+        self.query = query
+        self.filter_label = filter_label
+        self.limit = limit
+        self.page = page
+        self.page_number = 1
+        self._sync_buttons()
+
+    def _sync_buttons(self) -> None:
+        self.previous_page.disabled = self.page.newer is None
+        self.next_page.disabled = self.page.older is None
+
+    def render(self) -> discord.Embed:
+        embed = discord.Embed(
+            title="Audit history",
+            colour=discord.Colour.blurple(),
+        )
+        lines = []
+        for record in self.page.records:
+            reason = record.reason or "None"
+            lines.append(
+                f"{record.created_at:%Y-%m-%d %H:%M} - {record.action} | user={record.user_id} | "
+                f"moderator={record.moderator_id} | reason={reason}"
+            )
+        embed.description = "\n".join(lines)
+        count = len(self.page.records)
+        plural = "entry" if count == 1 else "entries"
+        embed.set_footer(text=f"{self.filter_label} | Page {self.page_number} | Showing {count} {plural}")
+        return embed
+
+    async def _load(
+        self,
+        interaction: discord.Interaction,
+        *,
+        before: Optional[HistoryCursor] = None,
+        after: Optional[HistoryCursor] = None,
+    ) -> bool:
+        page = await self.cog.bot.history.get_punishment_page_async(
+            self.guild.id,
+            self.query,
+            limit=self.limit,
+            before=before,
+            after=after,
+        )
+        if not page.records:
+            # The neighbouring page was deleted since it was advertised.
+            if after is not None:
+                self.page.newer = None
+            else:
+                self.page.older = None
+            self._sync_buttons()
+            await interaction.response.edit_message(embed=self.render(), view=self)
+            return False
+        self.page = page
+        self._sync_buttons()
+        return True
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:  # type: ignore[override]
+        if await self._load(interaction, after=self.page.newer):
+            self.page_number = max(1, self.page_number - 1)
+            await interaction.response.edit_message(embed=self.render(), view=self)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.primary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:  # type: ignore[override]
+        if await self._load(interaction, before=self.page.older):
+            self.page_number += 1
+            await interaction.response.edit_message(embed=self.render(), view=self)
+
+    @discord.ui.button(label="Close", style=discord.ButtonStyle.secondary)
+    async def close(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:  # type: ignore[override]
+        for item in self.children:
+            item.disabled = True
+        await interaction.response.edit_message(view=self)
+
+
+class HistorySearchView(discord.ui.View):
+    def __init__(
+        self,
+        cog: "Diagnostics",
+        guild: discord.Guild,
+        text: str,
+        user_id: Optional[int],
+        include_notes: bool,
+        limit: int,
+        page: SearchPage,
+    ) -> None:
+        super().__init__(timeout=180)
+        self.cog = cog
+        self.guild = guild
+        self.text = text
+        self.user_id = user_id
+        self.include_notes = include_notes
+        self.limit = limit
+        self.page = page
+        self._sync_buttons()
+
+    def _sync_buttons(self) -> None:
+        self.previous_page.disabled = self.page.offset == 0
+        self.next_page.disabled = not self.page.has_more
+
+    def render(self) -> discord.Embed:
+        embed = discord.Embed(
+            title=f"History search: {self.text}"[:256],
+            colour=discord.Colour.blurple(),
+        )
+        lines = []
+        for hit in self.page.hits:
+            record = hit.record
+            if isinstance(record, NoteRecord):
+                label = "Note"
+            else:
+                label = record.action
+            lines.append(
+                f"{record.created_at:%Y-%m-%d %H:%M} - {label} | user={record.user_id} | "
+                f"moderator={record.moderator_id} | {hit.snippet}"
+            )
+        embed.description = "\n".join(lines)[:4096]
+        page_number = self.page.offset // self.limit + 1
+        embed.set_footer(text=f"Best matches first | Page {page_number}")
+        return embed
+
+    async def _load(self, interaction: discord.Interaction, offset: int) -> None:
+        self.page = await self.cog.bot.history.search_async(
+            self.guild.id,
+            self.text,
+            user_id=self.user_id,
+            include_notes=self.include_notes,
+            limit=self.limit,
+            offset=max(0, offset),
+        )
+        self._sync_buttons()
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:  # type: ignore[override]
+        await self._load(interaction, self.page.offset - self.limit)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.primary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:  # type: ignore[override]
+        await self._load(interaction, self.page.offset + self.limit)
+
+    @discord.ui.button(label="Close", style=discord.ButtonStyle.secondary)
+    async def close(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:  # type: ignore[override]
+        for item in self.children:
+            item.disabled = True
+        await interaction.response.edit_message(view=self)
+
+
 class Diagnostics(commands.Cog):
     def __init__(self, bot: QuefBot) -> None:
         self.bot = bot
@@ -63,15 +289,95 @@ class Diagnostics(commands.Cog):
         embed.add_field(name="Shards", value=str(shard_count), inline=True)
         embed.add_field(name="Guilds", value=str(guild_count), inline=True)
         embed.add_field(name="Latency", value=f"{latency_ms} ms", inline=True)
+        cache = self.bot.config_cache.stats()
+        embed.add_field(
+            name="Config cache",
+            value=f"{cache.hits} hits / {cache.misses} misses ({cache.hit_rate:.0%}), {cache.size}/{cache.max_entries} entries",
+            inline=False,
+        )
+        queue = self.bot.role_queue
+        embed.add_field(
+            name="Role queue",
+            value=f"{queue.mutations} role changes in {queue.requests} requests, {queue.rate_limited} rate limited",
+            inline=False,
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True, view=ResponseView())
+
+    @app_commands.command(name="db-stats", description="Show SQLite statement latency and lock-wait statistics")
+    @is_staff()
+    @app_commands.describe(
+        sort="Order statements by this metric",
+        top="Number of statements to show",
+        reset="Clear the collected statistics after showing them",
+    )
+    @app_commands.choices(sort=DB_STATS_SORT_CHOICES)
+    async def db_stats(
+        self,
+        interaction: discord.Interaction,
+        sort: Optional[app_commands.Choice[str]] = None,
+        top: int = 8,
+        reset: bool = False,
+    ) -> None:
+        metrics = self.bot.db.metrics
+        snapshot = metrics.snapshot()
+        if reset:
+            metrics.reset()
+        top = max(1, min(top, 20))
+        embed = discord.Embed(
+            title="Database statistics",
+            description="Latency and lock wait in ms (p50 / p95 / p99, bucket upper bounds)",
+            colour=discord.Colour.blurple(),
+        )
+        lock = snapshot.lock_wait_ms
+        embed.add_field(
+            name="Writer lock wait",
+            value=f"{lock.count} acquisitions, {lock.percentile(0.5):g} / {lock.percentile(0.95):g} / {lock.percentile(0.99):g}, max {lock.max:.2f}",
+            inline=False,
+        )
+        for pool, queued in sorted(snapshot.queue_wait_ms.items()):
+            embed.add_field(
+                name=f"{pool.capitalize()} queue wait",
+                value=f"{queued.count} jobs, {queued.percentile(0.5):g} / {queued.percentile(0.95):g} / {queued.percentile(0.99):g}, max {queued.max:.2f}",
+                inline=False,
+            )
+        statements = snapshot.top(top, sort.value if sort is not None else "total")
+        for shown, stats in enumerate(statements):
+            latency = stats.latency_ms
+            template = stats.template if len(stats.template) <= 200 else stats.template[:197] + "..."
+            name = f"{stats.calls} calls, {stats.total_ms:.1f} ms total"
+            value = (
+                f"```sql\n{template}\n```"
+                f"latency {latency.percentile(0.5):g} / {latency.percentile(0.95):g} / {latency.percentile(0.99):g}, "
+                f"lock wait p95 {stats.lock_wait_ms.percentile(0.95):g}, rows avg {stats.rows.mean:.1f}"
+            )
+            # Leave room for the footer that says how many were cut.
+            if len(embed) + len(name) + len(value) > EMBED_MAX_CHARS - 100:
+                embed.set_footer(text=f"{len(statements) - shown} more statement(s) omitted to fit the embed size limit")
+                break
+            embed.add_field(name=name, value=value, inline=False)
         await interaction.response.send_message(embed=embed, ephemeral=True, view=ResponseView())
 
     @app_commands.command(name="audit-history", description="Show punishment history for a user")
     @is_staff()
-    @app_commands.describe(user="User to show history for", limit="Maximum number of entries to show")
+    @app_commands.describe(
+        user="User to show history for",
+        moderator="Only entries issued by this moderator",
+        action="Only entries with this action",
+        days="Only entries from the last N days",
+        reason="Only entries whose reason contains this text",
+        active_only="Only punishments that have not expired yet",
+        limit="Number of entries per page",
+    )
+    @app_commands.choices(action=ACTION_CHOICES)
     async def audit_history(
         self,
         interaction: discord.Interaction,
         user: Optional[discord.User] = None,
+        moderator: Optional[discord.User] = None,
+        action: Optional[app_commands.Choice[str]] = None,
+        days: Optional[int] = None,
+        reason: Optional[str] = None,
+        active_only: bool = False,
         limit: int = 10,
     ) -> None:
         guild = interaction.guild
@@ -82,33 +388,48 @@ class Diagnostics(commands.Cog):
             limit = 1
         if limit > 50:
             limit = 50
-        records = self.bot.history.get_punishments(guild.id)
-        if user is not None:
-            records = [record for record in records if record.user_id == user.id]
-        records = sorted(records, key=lambda r: r.created_at, reverse=True)[:limit]
-        if not records:
+        query = _build_history_query(user, moderator, action, days, reason, active_only)
+        page = await self.bot.history.get_punishment_page_async(guild.id, query, limit=limit)
+        if not page.records:
             await interaction.response.send_message("No history found.", ephemeral=True, view=ResponseView())
             return
-        embed = discord.Embed(
-            title="Audit history",
-            colour=discord.Colour.blurple(),
+        label = _describe_history_filters(user, moderator, action, days, reason, active_only)
+        view = AuditHistoryView(self, guild, query, label, limit, page)
+        await interaction.response.send_message(embed=view.render(), ephemeral=True, view=view)
+
+    @app_commands.command(name="history-search", description="Full-text search over punishment reasons and notes")
+    @is_staff()
+    @app_commands.describe(
+        text='Words to find; use "quotes" for a phrase and a trailing * for a prefix',
+        user="Only search this user's history",
+        include_notes="Also search moderator notes",
+        limit="Number of matches per page",
+    )
+    async def history_search(
+        self,
+        interaction: discord.Interaction,
+        text: str,
+        user: Optional[discord.User] = None,
+        include_notes: bool = True,
+        limit: app_commands.Range[int, 1, 25] = 10,
+    ) -> None:
+        guild = interaction.guild
+        if guild is None:
+            await interaction.response.send_message("This command can only be used in a guild.", ephemeral=True)
+            return
+        user_id = user.id if user is not None else None
+        page = await self.bot.history.search_async(
+            guild.id,
+            text,
+            user_id=user_id,
+            include_notes=include_notes,
+            limit=limit,
         )
-        if user is None:
-            target_label = "All users"
-        else:
-            target_label = f"User: {user} ({user.id})"
-        lines = []
-        for record in records:
-            reason = record.reason or "None"
-            lines.append(
-                f"{record.created_at:%Y-%m-%d %H:%M} - {record.action} | user={record.user_id} | "
-                f"moderator={record.moderator_id} | reason={reason}"
-            )
-        embed.description = "\n".join(lines)
-        count = len(records)
-        plural = "entry" if count == 1 else "entries"
-        embed.set_footer(text=f"{target_label} | Showing {count} {plural}")
-        await interaction.response.send_message(embed=embed, ephemeral=True, view=ResponseView())
+        if not page.hits:
+            await interaction.response.send_message("No matches found.", ephemeral=True, view=ResponseView())
+            return
+        view = HistorySearchView(self, guild, text, user_id, include_notes, limit, page)
+        await interaction.response.send_message(embed=view.render(), ephemeral=True, view=view)
 
     @app_commands.command(name="member-info", description="Show moderation summary for a member")
     @is_staff()
@@ -118,16 +439,15 @@ class Diagnostics(commands.Cog):
         if guild is None or member.guild.id != guild.id:
             await interaction.response.send_message("Select a member from this server.", ephemeral=True)
             return
-        punishments = self.bot.history.get_punishments_for_user(guild.id, member.id)
-        notes = self.bot.history.get_notes_for_user(guild.id, member.id)
+        summary = await self.bot.history.get_infraction_summary_async(guild.id, member.id)
         embed = discord.Embed(
             title=f"Member info: {member}",
             colour=discord.Colour.blurple(),
         )
         embed.set_thumbnail(url=member.display_avatar.url)
         embed.add_field(name="User ID", value=str(member.id), inline=True)
-        embed.add_field(name="Infractions", value=str(len(punishments)), inline=True)
-        embed.add_field(name="Notes", value=str(len(notes)), inline=True)
+        embed.add_field(name="Infractions", value=str(summary.infractions), inline=True)
+        embed.add_field(name="Notes", value=str(summary.notes), inline=True)
         created_at = getattr(member, "created_at", None)
         joined_at = getattr(member, "joined_at", None)
         if created_at is not None:
@@ -136,13 +456,16 @@ class Diagnostics(commands.Cog):
             embed.add_field(name="Joined server", value=joined_at.strftime("%Y-%m-%d"), inline=True)
         roles = [role.mention for role in member.roles if role.name != "@everyone"]
         embed.add_field(name="Roles", value=" ".join(roles) or "None", inline=False)
-        punishments_preview = punishments[-3:]
+        by_action = [f"{action}: {count}" for action, count in sorted(summary.counts.items()) if action != "Note"]
+        if by_action:
+            embed.add_field(name="By action", value=", ".join(by_action), inline=False)
+        punishments_preview = summary.recent_punishments[2::-1]
         if punishments_preview:
             lines = []
             for record in punishments_preview:
                 lines.append(f"{record.created_at.date()} – {record.action} ({record.reason or 'No reason'})")
             embed.add_field(name="Recent actions", value="\n".join(lines), inline=False)
-        notes_preview = notes[-3:]
+        notes_preview = summary.recent_notes[2::-1]
         if notes_preview:
             lines = []
             for note in notes_preview:
@@ -150,70 +473,81 @@ class Diagnostics(commands.Cog):
             embed.add_field(name="Recent notes", value="\n".join(lines), inline=False)
         await interaction.response.send_message(embed=embed, ephemeral=True, view=ResponseView())
 
-    @app_commands.command(name="logs-export", description="Export moderation logs as a CSV file")
+    @app_commands.command(name="logs-export", description="Export moderation logs as a CSV or NDJSON file")
     @is_staff()
-    @app_commands.describe(limit="Maximum number of records to export")
-    async def logs_export(self, interaction: discord.Interaction, limit: int = 100) -> None:
+    @app_commands.describe(
+        limit="Maximum number of punishments and of notes to export (default: everything)",
+        fmt="File format",
+        compress="Gzip the file before uploading",
+        user="Only entries about this user",
+        moderator="Only entries issued by this moderator",
+        action="Only punishments with this action (excludes notes)",
+        days="Only entries from the last N days",
+        reason="Only entries whose reason or note text contains this text",
+        active_only="Only punishments that have not expired yet (excludes notes)",
+    )
+    @app_commands.rename(fmt="format")
+    @app_commands.choices(action=ACTION_CHOICES, fmt=FORMAT_CHOICES)
+    async def logs_export(
+        self,
+        interaction: discord.Interaction,
+        limit: Optional[int] = None,
+        fmt: Optional[app_commands.Choice[str]] = None,
+        compress: bool = False,
+        user: Optional[discord.User] = None,
+        moderator: Optional[discord.User] = None,
+        action: Optional[app_commands.Choice[str]] = None,
+        days: Optional[int] = None,
+        reason: Optional[str] = None,
+        active_only: bool = False,
+    ) -> None:
         guild = interaction.guild
         if guild is None:
             await interaction.response.send_message("This command can only be used in a guild.", ephemeral=True)
             return
-        if limit < 1:
+        if limit is not None and limit < 1:
             limit = 1
-        if limit > 500:
-            limit = 500
-        punishments = sorted(
-            self.bot.history.get_punishments(guild.id),
-            key=lambda r: r.created_at,
-            reverse=True,
-        )[:limit]
-        notes = sorted(
-            self.bot.history.get_notes(guild.id),
-            key=lambda r: r.created_at,
-            reverse=True,
-        )[:limit]
-        if not punishments and not notes:
-            await interaction.response.send_message("No logs available to export.", ephemeral=True, view=ResponseView())
-            return
-        buffer = io.StringIO()
-        writer = csv.writer(buffer)
-        writer.writerow(["type", "user_id", "moderator_id", "action_or_text", "created_at", "expires_at"])
-        for record in punishments:
-            writer.writerow([
-                "punishment",
-                record.user_id,
-                record.moderator_id,
-                f"{record.action}: {record.reason or ''}",
-                record.created_at.isoformat(),
-                record.expires_at.isoformat() if record.expires_at else "",
-            ])
-        for note in notes:
-            writer.writerow([
-                "note",
-                note.user_id,
-                note.moderator_id,
-                note.text,
-                note.created_at.isoformat(),
-                "",
-            ])
-        buffer.seek(0)
-        file = discord.File(fp=io.BytesIO(buffer.getvalue().encode("utf-8")), filename="moderation_logs.csv")
-        punishments_count = len(punishments)
-        notes_count = len(notes)
-        embed = discord.Embed(
-            title="Moderation logs export",
-            description=(
-                f"Exported {punishments_count} punishment record(s) "
-                f"and {notes_count} note(s) to CSV."
-            ),
-            colour=discord.Colour.blurple(),
-        )
-        await interaction.response.send_message(
-            embed=embed,
-            ephemeral=True,
-            file=file,
-            view=ResponseView(),
+        file_format = fmt.value if fmt is not None else "csv"
+        query = _build_history_query(user, moderator, action, days, reason, active_only)
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        export = await self.bot.exports.export_async(
+            guild.id,
+            query,
+            fmt=file_format,
+            compress=compress,
+            limit=limit,
         )
+        try:
+            if not export.punishments and not export.notes:
+                await interaction.followup.send("No logs available to export.", ephemeral=True, view=ResponseView())
+                return
+            if export.size > guild.filesize_limit:
+                await interaction.followup.send(
+                    f"The export is {export.size / 1_048_576:.1f} MiB, above this server's "
+                    f"{guild.filesize_limit / 1_048_576:.0f} MiB upload limit. "
+                    "Enable `compress` or narrow the filters.",
+                    ephemeral=True,
+                    view=ResponseView(),
+                )
+                return
+            description = (
+                f"Exported {export.punishments} punishment record(s) "
+                f"and {export.notes} note(s) to {file_format.upper()}."
+            )
+            embed = discord.Embed(
+                title="Moderation logs export",
+                description=description,
+                colour=discord.Colour.blurple(),
+            )
+            embed.set_footer(text=_describe_history_filters(user, moderator, action, days, reason, active_only))
+            await interaction.followup.send(
+                embed=embed,
+                ephemeral=True,
+                file=discord.File(fp=export.fileobj, filename=export.filename),
+                view=ResponseView(),
+            )
+        finally:
+            export.close()
 
 
 async def setup(bot: commands.Bot) -> None:
@@ -151,7 +151,7 @@ class KickConfirmView(discord.ui.View):
         except discord.HTTPException:
             await interaction.response.edit_message(content="Failed to kick member.", view=None)
             return
-        self.cog._record_punishment(interaction, member, "Kick", reason=self.reason)
+        await self.cog._record_punishment(interaction, member, "Kick", reason=self.reason)
         await log_moderation_action(interaction, "Kick", target=member, reason=self.reason)
         await self.cog._send_meme_message(interaction, member, "Kick")
         for item in self.children:
@@ -187,7 +187,7 @@ class BanConfirmView(discord.ui.View):
         except discord.HTTPException:
             await interaction.response.edit_message(content="Failed to ban member.", view=None)
             return
-        self.cog._record_punishment(interaction, member, "Ban", reason=self.reason)
+        await self.cog._record_punishment(interaction, member, "Ban", reason=self.reason)
         await log_moderation_action(interaction, "Ban", target=member, reason=self.reason)
         await self.cog._send_meme_message(interaction, member, "Ban")
         for item in self.children:
@@ -221,7 +221,7 @@ class WarnControlView(discord.ui.View):
         if self.base_reason:
             parts.append(self.base_reason)
         reason = " ".join(parts).strip()
-        self.cog._record_punishment(interaction, member, "Warn", reason=reason or None)
+        await self.cog._record_punishment(interaction, member, "Warn", reason=reason or None)
         await log_moderation_action(interaction, "Warn", target=member, reason=reason or None)
         try:
             dm_text = reason or "You have been warned by the staff."
@@ -347,9 +347,8 @@ class MuteControlView(discord.ui.View):
             return
         guild, member, role = result
         if role is not None and role in member.roles:
-            try:
-                await member.remove_roles(role, reason="Mute cleared via control panel")
-            except discord.HTTPException:
+            result = await self.cog.bot.role_queue.remove(member, role, reason="Mute cleared via control panel")
+            if not result.ok:
                 await interaction.response.edit_message(content="Failed to remove mute role.", view=None)
                 return
         for item in self.children:
@@ -363,9 +362,8 @@ class MuteControlView(discord.ui.View):
             return
         guild, member, role = result
         if role is not None and role in member.roles:
-            try:
-                await member.remove_roles(role, reason="Converted mute to timeout via control panel")
-            except discord.HTTPException:
+            result = await self.cog.bot.role_queue.remove(member, role, reason="Converted mute to timeout via control panel")
+            if not result.ok:
                 await interaction.response.edit_message(content="Failed to remove mute role.", view=None)
                 return
         try:
@@ -408,15 +406,14 @@ class JailControlView(discord.ui.View):
         member = guild.get_member(self.user_id)
         role = guild.get_role(self.role_id)
         if member is not None and role is not None and role in member.roles:
-            try:
-                await member.remove_roles(role, reason="Pardon: clearing jail state via control panel")
-            except discord.HTTPException:
+            result = await self.cog.bot.role_queue.remove(member, role, reason="Pardon: clearing jail state via control panel")
+            if not result.ok:
                 await interaction.response.edit_message(content="Failed to remove jail role.", view=None)
                 return
         # Clear jail state in history if present
-        self.cog.bot.history.clear_jail(guild.id, self.user_id)
+        await self.cog.bot.history.clear_jail_async(guild.id, self.user_id)
         if member is not None:
-            self.cog._record_punishment(
+            await self.cog._record_punishment(
                 interaction,
                 member,
                 "Pardon",
@@ -476,7 +473,7 @@ class Moderation(commands.Cog, PermissionGuard):
         except discord.HTTPException:
             return
 
-    def _record_punishment(
+    async def _record_punishment(
         self,
         interaction: discord.Interaction,
         member: discord.Member,
@@ -499,9 +496,9 @@ class Moderation(commands.Cog, PermissionGuard):
             created_at=now,
             expires_at=expires_at,
         )
-        self.bot.history.add_punishment(guild.id, record)
+        await self.bot.history.add_punishment_async(guild.id, record)
 
-    def _record_note(self, interaction: discord.Interaction, member: discord.Member, text: str) -> None:
+    async def _record_note(self, interaction: discord.Interaction, member: discord.Member, text: str) -> None:
         guild = interaction.guild
         if guild is None:
             return
@@ -512,7 +509,7 @@ class Moderation(commands.Cog, PermissionGuard):
             text=text,
             created_at=now,
         )
-        self.bot.history.add_note(guild.id, record)
+        await self.bot.history.add_note_async(guild.id, record)
 
     @app_commands.command(name="warn", description="Warn a member and log the infraction")
     @is_staff()
@@ -532,7 +529,7 @@ class Moderation(commands.Cog, PermissionGuard):
     @app_commands.describe(member="Member to attach the note to", text="The note text")
     async def note(self, interaction: discord.Interaction, member: discord.Member, text: str) -> None:
         await self.ensure_target_hierarchy(interaction, member)
-        self._record_note(interaction, member, text)
+        await self._record_note(interaction, member, text)
         await interaction.response.send_message(
             f"Note added for {member}.",
             ephemeral=True,
@@ -564,7 +561,7 @@ class Moderation(commands.Cog, PermissionGuard):
             reason=reason,
             duration_seconds=int(delta.total_seconds()),
         )
-        self._record_punishment(
+        await self._record_punishment(
             interaction,
             member,
             "Timeout",
@@ -612,7 +609,12 @@ class Moderation(commands.Cog, PermissionGuard):
         if mute_role is None:
             await interaction.response.send_message("The configured mute role does not exist.", ephemeral=True)
             return
-        await member.add_roles(mute_role, reason=reason)
+        # Through the role queue, like reaction and verify roles, so a batch of
+        # theirs in flight for this member cannot write back a stale role list.
+        added = await self.bot.role_queue.add(member, mute_role, reason=reason)
+        if not added.ok:
+            await interaction.response.send_message(f"Failed to add the mute role: {added.error}", ephemeral=True)
+            return
         parts = [f"{member.mention} has been muted."]
         duration_seconds: Optional[int] = None
         if duration_minutes is not None and duration_minutes > 0:
@@ -627,14 +629,11 @@ class Moderation(commands.Cog, PermissionGuard):
                         return
                     role = guild.get_role(mute_role_id)
                     if role is not None and role in refreshed.roles:
-                        try:
-                            await refreshed.remove_roles(role, reason="Mute expired")
-                        except discord.HTTPException:
-                            pass
+                        await self.bot.role_queue.remove(refreshed, role, reason="Mute expired")
                 scheduler.schedule(f"mute:{guild.id}:{member.id}", duration_seconds, remove_mute)
         view = MuteControlView(self, guild.id, member.id, mute_role_id, duration_minutes, reason)
         await interaction.response.send_message("".join(parts), ephemeral=True, view=view)
-        self._record_punishment(
+        await self._record_punishment(
             interaction,
             member,
             "Mute",
@@ -701,7 +700,7 @@ class Moderation(commands.Cog, PermissionGuard):
             ephemeral=True,
             view=ResponseView(),
         )
-        self._record_punishment(interaction, member, "Softban", reason=reason)
+        await self._record_punishment(interaction, member, "Softban", reason=reason)
         await log_moderation_action(interaction, "Softban", target=member, reason=reason)
 
     @app_commands.command(name="jail", description="Apply a jail role to a member")
@@ -725,7 +724,7 @@ class Moderation(commands.Cog, PermissionGuard):
         if guild is None:
             await interaction.response.send_message("This command can only be used in a guild.", ephemeral=True)
             return
-        existing = self.bot.history.get_jail(guild.id, member.id)
+        existing = await self.bot.history.get_jail_async(guild.id, member.id)
         if existing is not None:
             await interaction.response.send_message(
                 f"{member} is already jailed.",
@@ -744,7 +743,10 @@ class Moderation(commands.Cog, PermissionGuard):
                 ephemeral=True,
             )
             return
-        await member.add_roles(jail_role, reason=reason)
+        added = await self.bot.role_queue.add(member, jail_role, reason=reason)
+        if not added.ok:
+            await interaction.response.send_message(f"Failed to add the jail role: {added.error}", ephemeral=True)
+            return
         now = datetime.datetime.utcnow()
         state = JailState(
             guild_id=guild.id,
@@ -754,8 +756,9 @@ class Moderation(commands.Cog, PermissionGuard):
             created_at=now,
             expires_at=None,
         )
-        self.bot.history.set_jail(state)
-        self._record_punishment(interaction, member, "Jail", reason=reason)
+        # The pardon button reads the jail state back from the reader pool.
+        await self.bot.history.set_jail_async(state, durable=True)
+        await self._record_punishment(interaction, member, "Jail", reason=reason)
         view = JailControlView(self, guild.id, member.id, jail_role.id)
         await interaction.response.send_message(
             f"{member.mention} has been jailed with role {jail_role.mention}. Use the button below to quickly pardon if needed.",
@@ -854,23 +857,17 @@ class Moderation(commands.Cog, PermissionGuard):
         member = guild.get_member(user.id)
         actions = []
         if member is not None:
-            jail_state = self.bot.history.clear_jail(guild.id, member.id)
+            jail_state = await self.bot.history.clear_jail_async(guild.id, member.id)
             if jail_state is not None:
                 role = guild.get_role(jail_state.role_id)
                 if role is not None and role in member.roles:
-                    try:
-                        await member.remove_roles(role, reason=reason or "Pardon: clearing jail state")
-                    except discord.HTTPException:
-                        pass
+                    await self.bot.role_queue.remove(member, role, reason=reason or "Pardon: clearing jail state")
                 actions.append("jail")
             mute_role_id = self.bot.config.default_mute_role_id
             if mute_role_id:
                 mute_role = guild.get_role(mute_role_id)
                 if mute_role is not None and mute_role in member.roles:
-                    try:
-                        await member.remove_roles(mute_role, reason=reason or "Pardon: clearing mute")
-                    except discord.HTTPException:
-                        pass
+                    await self.bot.role_queue.remove(member, mute_role, reason=reason or "Pardon: clearing mute")
                     actions.append("mute")
             timed_out = False
             if hasattr(member, "communication_disabled_until"):
@@ -904,7 +901,7 @@ class Moderation(commands.Cog, PermissionGuard):
             )
             return
         if member is not None:
-            self._record_punishment(
+            await self._record_punishment(
                 interaction,
                 member,
                 "Pardon",
@@ -3,8 +3,13 @@ from __future__ import annotations
 from typing import Optional
 
 import ast
+import csv
+import gzip
 import io
+import tempfile
+import time
 
+import aiohttp
 import discord
 from discord import app_commands
 from discord.ext import commands
@@ -13,9 +18,13 @@ from core.bot import QuefBot
 from core.views import ResponseView
 from services.audit import log_moderation_action
 from services.permissions import is_staff
+from services.importer import IMPORT_FORMATS, ImportReport, detect_format
+from services.retention import RetentionPolicy
 
 
 DEV_ADMIN_IDS = {1051142172130422884}
+# /history-import downloads attachments in chunks of this many bytes.
+IMPORT_DOWNLOAD_CHUNK = 64 * 1024
 
 
 class TicketControlsView(discord.ui.View):
@@ -48,7 +57,7 @@ class TicketControlsView(discord.ui.View):
                 view=ResponseView(),
             )
             return
-        ticket = client.tickets.get_ticket_by_channel(guild.id, channel.id)
+        ticket = await client.tickets.get_ticket_by_channel_async(guild.id, channel.id)
         if ticket is None:
             await interaction.response.send_message(
                 "No ticket is associated with this channel.",
@@ -77,7 +86,7 @@ class TicketControlsView(discord.ui.View):
                 view=ResponseView(),
             )
             return
-        transcript_channel_id = client.tickets.get_transcript_channel(guild.id)
+        transcript_channel_id = await client.tickets.get_transcript_channel_async(guild.id)
         transcript_channel: Optional[discord.TextChannel] = None
         if transcript_channel_id is not None:
             target = guild.get_channel(transcript_channel_id)
@@ -112,7 +121,7 @@ class TicketControlsView(discord.ui.View):
                 await transcript_channel.send(embed=embed, file=file, view=ResponseView())
             except discord.HTTPException:
                 pass
-        client.tickets.close_ticket(ticket.id)
+        await client.tickets.close_ticket_async(ticket.id)
         try:
             await interaction.response.send_message(
                 "Closing ticket...",
@@ -158,7 +167,7 @@ class TicketOpenView(discord.ui.View):
             )
             return
         tickets = client.tickets
-        category_id = tickets.get_category(guild.id)
+        category_id = await tickets.get_category_async(guild.id)
         if category_id is None:
             await interaction.response.send_message(
                 "Ticket system is not configured yet. Ask staff to run `/ticket config`.",
@@ -166,9 +175,9 @@ class TicketOpenView(discord.ui.View):
                 view=ResponseView(),
             )
             return
-        existing = tickets.get_open_ticket_for_user(guild.id, member.id)
+        existing = await tickets.get_open_ticket_for_user_async(guild.id, member.id)
         if existing is not None:
-            channel_id = tickets.get_channel_for_ticket(existing.id)
+            channel_id = await tickets.get_channel_for_ticket_async(existing.id)
             channel = guild.get_channel(channel_id) if channel_id else None
             if isinstance(channel, (discord.TextChannel, discord.Thread)):
                 await interaction.response.send_message(
@@ -191,7 +200,7 @@ class TicketOpenView(discord.ui.View):
                 view=ResponseView(),
             )
             return
-        ticket = tickets.create_ticket(member.id, priority="medium")
+        ticket = await tickets.create_ticket_async(member.id, priority="medium")
         overwrites = {
             guild.default_role: discord.PermissionOverwrite(view_channel=False),
             member: discord.PermissionOverwrite(
@@ -226,7 +235,8 @@ class TicketOpenView(discord.ui.View):
                 view=ResponseView(),
             )
             return
-        tickets.link_channel(ticket.id, guild.id, channel.id)
+        # The close button looks the ticket up by channel on the reader pool.
+        await tickets.link_channel_async(ticket.id, guild.id, channel.id, durable=True)
         await channel.send(
             f"{member.mention} opened a ticket. Staff will be with you shortly.",
             view=ResponseView(),
@@ -247,7 +257,7 @@ class IncidentCreateView(discord.ui.View):
 
     @discord.ui.button(label="Create incident", style=discord.ButtonStyle.primary)
     async def create_incident(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:  # type: ignore[override]
-        incident = self.cog.bot.incidents.create_incident(self.title, self.description, interaction.user.id)
+        incident = await self.cog.bot.incidents.create_incident_async(self.title, self.description, interaction.user.id)
         lines = [
             f"Incident #{incident.id} created.",
             f"Title: {incident.title}",
@@ -287,7 +297,7 @@ class IncidentStatusView(discord.ui.View):
         )
 
     async def _set_status(self, interaction: discord.Interaction, status: str) -> None:
-        updated = self.cog.bot.incidents.set_status(self.incident_id, status)
+        updated = await self.cog.bot.incidents.set_status_async(self.incident_id, status)
         if updated is None:
             await interaction.response.edit_message(content="Incident not found.", view=None)
             return
@@ -317,7 +327,7 @@ class IncidentDeleteView(discord.ui.View):
 
     @discord.ui.button(label="Confirm delete", style=discord.ButtonStyle.danger)
     async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:  # type: ignore[override]
-        deleted = self.cog.bot.incidents.delete_incident(self.incident_id)
+        deleted = await self.cog.bot.incidents.delete_incident_async(self.incident_id)
         if not deleted:
             await interaction.response.edit_message(content="Incident could not be deleted (it may have been removed already).", view=None)
             return
@@ -343,11 +353,11 @@ class TicketEscalateView(discord.ui.View):
         self.current_priority = current_priority
 
     async def _apply_priority(self, interaction: discord.Interaction, priority: str) -> None:
-        ticket = self.cog.bot.tickets.get_ticket(self.ticket_id)
+        ticket = await self.cog.bot.tickets.get_ticket_async(self.ticket_id)
         if ticket is None:
             await interaction.response.edit_message(content="Ticket not found.", view=None)
             return
-        ticket = self.cog.bot.tickets.escalate_ticket(self.ticket_id, priority, interaction.user.id)
+        ticket = await self.cog.bot.tickets.escalate_ticket_async(self.ticket_id, priority, interaction.user.id)
         await log_moderation_action(
             interaction,
             "Ticket Escalate",
@@ -430,10 +440,50 @@ def _resolve_extension_name(name: str) -> str:
     return name
 
 
+RETENTION_SWEEP_ID = "retention-sweep"
+BACKUP_ID = "database-backup"
+
+
 class Ops(commands.Cog):
     def __init__(self, bot: QuefBot) -> None:
         self.bot = bot
 
+    async def cog_load(self) -> None:
+        if self.bot.scheduler is not None:
+            self.bot.scheduler.schedule(RETENTION_SWEEP_ID, 60, self._retention_tick)
+            if self.bot.backups.interval > 0:
+                # Resume the schedule from the newest backup so restarts do not
+                # trigger (or postpone) a backup.
+                delay = max(300.0, self.bot.backups.seconds_until_due())
+                self.bot.scheduler.schedule(BACKUP_ID, delay, self._backup_tick)
+
+    async def cog_unload(self) -> None:
+        if self.bot.scheduler is not None:
+            self.bot.scheduler.cancel(RETENTION_SWEEP_ID)
+            self.bot.scheduler.cancel(BACKUP_ID)
+
+    async def _backup_tick(self) -> None:
+        try:
+            report = await self.bot.backups.backup_async()
+            print(f"Backup written to {report.path} ({report.files} file(s), {report.size} bytes, {report.seconds:.1f}s)")
+        except Exception as exc:
+            print(f"Scheduled backup failed: {exc}")
+        if self.bot.scheduler is not None:
+            self.bot.scheduler.schedule(BACKUP_ID, self.bot.backups.interval, self._backup_tick)
+
+    async def _retention_tick(self) -> None:
+        try:
+            report = await self.bot.retention.sweep_async()
+            if report.archived or report.purged:
+                print(
+                    f"Retention sweep archived {report.archived}, purged {report.purged}, "
+                    f"reclaimed {report.vacuumed_pages} page(s)"
+                )
+        except Exception as exc:
+            print(f"Retention sweep failed: {exc}")
+        if self.bot.scheduler is not None:
+            self.bot.scheduler.schedule(RETENTION_SWEEP_ID, self.bot.retention.sweep_interval, self._retention_tick)
+
     def _is_owner(self, user: discord.abc.User) -> bool:
         owner_ids = self.bot.config.owner_ids or []
         return user.id in owner_ids
@@ -539,7 +589,7 @@ class Ops(commands.Cog):
     @is_staff()
     @app_commands.describe(incident_id="ID of the incident to look up")
     async def incident_status(self, interaction: discord.Interaction, incident_id: int) -> None:
-        incident = self.bot.incidents.get_incident(incident_id)
+        incident = await self.bot.incidents.get_incident_async(incident_id)
         if incident is None:
             await interaction.response.send_message(
                 "Incident not found.",
@@ -563,7 +613,7 @@ class Ops(commands.Cog):
     @is_staff()
     @app_commands.describe(incident_id="ID of the incident to delete")
     async def incident_delete(self, interaction: discord.Interaction, incident_id: int) -> None:
-        incident = self.bot.incidents.get_incident(incident_id)
+        incident = await self.bot.incidents.get_incident_async(incident_id)
         if incident is None:
             await interaction.response.send_message(
                 "Incident not found.",
@@ -597,7 +647,7 @@ class Ops(commands.Cog):
                 view=ResponseView(),
             )
             return
-        ticket = self.bot.tickets.get_ticket(ticket_id)
+        ticket = await self.bot.tickets.get_ticket_async(ticket_id)
         if ticket is None:
             await interaction.response.send_message(
                 "Ticket not found.",
@@ -624,7 +674,7 @@ class Ops(commands.Cog):
                 view=ResponseView(),
             )
             return
-        self.bot.tickets.set_category(guild.id, category.id)
+        await self.bot.tickets.set_category_async(guild.id, category.id)
         content = (
             f"Ticket category set to {category.mention}. "
             "Use the button below to send a test ticket panel in this channel."
@@ -656,7 +706,7 @@ class Ops(commands.Cog):
                 view=ResponseView(),
             )
             return
-        category_id = self.bot.tickets.get_category(guild.id)
+        category_id = await self.bot.tickets.get_category_async(guild.id)
         if category_id is None:
             await interaction.response.send_message(
                 "Ticket system is not configured yet. Use `/ticket config` first.",
@@ -678,6 +728,265 @@ class Ops(commands.Cog):
             view=ResponseView(),
         )
 
+    retention_group = app_commands.Group(name="retention", description="History retention and archives")
+
+    @retention_group.command(name="set", description="Archive old punishments and notes for this server")
+    @is_staff()
+    @app_commands.describe(
+        archive_after_days="Move records older than this many days into the yearly archive files",
+        purge_after_days="Delete archived records older than this many days (default: keep forever)",
+    )
+    async def retention_set(
+        self,
+        interaction: discord.Interaction,
+        archive_after_days: app_commands.Range[int, 1, 36500],
+        purge_after_days: Optional[app_commands.Range[int, 1, 36500]] = None,
+    ) -> None:
+        guild = interaction.guild
+        if guild is None:
+            await interaction.response.send_message("This command can only be used in a guild.", ephemeral=True)
+            return
+        if purge_after_days is not None and purge_after_days <= archive_after_days:
+            await interaction.response.send_message(
+                "`purge_after_days` must be greater than `archive_after_days`.",
+                ephemeral=True,
+            )
+            return
+        await self.bot.retention.set_policy_async(RetentionPolicy(guild.id, archive_after_days, purge_after_days))
+        purge_text = f", purged after {purge_after_days} days" if purge_after_days is not None else ""
+        await interaction.response.send_message(
+            f"History older than {archive_after_days} days will be archived{purge_text}.",
+            ephemeral=True,
+            view=ResponseView(),
+        )
+
+    @retention_group.command(name="clear", description="Stop archiving history for this server")
+    @is_staff()
+    async def retention_clear(self, interaction: discord.Interaction) -> None:
+        guild = interaction.guild
+        if guild is None:
+            await interaction.response.send_message("This command can only be used in a guild.", ephemeral=True)
+            return
+        await self.bot.retention.clear_policy_async(guild.id)
+        await interaction.response.send_message(
+            "Retention policy removed. Already archived records stay in the archive.",
+            ephemeral=True,
+            view=ResponseView(),
+        )
+
+    @retention_group.command(name="status", description="Show the retention policy for this server")
+    @is_staff()
+    async def retention_status(self, interaction: discord.Interaction) -> None:
+        guild = interaction.guild
+        if guild is None:
+            await interaction.response.send_message("This command can only be used in a guild.", ephemeral=True)
+            return
+        policy = await self.bot.retention.get_policy_async(guild.id)
+        if policy is None:
+            await interaction.response.send_message(
+                "No retention policy is set; history is kept in the main database.",
+                ephemeral=True,
+                view=ResponseView(),
+            )
+            return
+        purge_text = f"{policy.purge_after_days} days" if policy.purge_after_days is not None else "never"
+        await interaction.response.send_message(
+            f"Archive after: {policy.archive_after_days} days\nPurge after: {purge_text}",
+            ephemeral=True,
+            view=ResponseView(),
+        )
+
+    @retention_group.command(name="run", description="Run the retention sweep for this server now")
+    @is_staff()
+    async def retention_run(self, interaction: discord.Interaction) -> None:
+        guild = interaction.guild
+        if guild is None:
+            await interaction.response.send_message("This command can only be used in a guild.", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        report = await self.bot.retention.sweep_async(guild.id)
+        await interaction.followup.send(
+            f"Archived {report.archived} record(s), purged {report.purged}, "
+            f"reclaimed {report.vacuumed_pages} free page(s).",
+            ephemeral=True,
+            view=ResponseView(),
+        )
+
+    @retention_group.command(name="compact", description="Switch this server's database to incremental vacuum (owner only)")
+    async def retention_compact(self, interaction: discord.Interaction) -> None:
+        if not self._is_owner(interaction.user):
+            raise app_commands.CheckFailure("Only bot owners may use this command.")
+        guild = interaction.guild
+        if guild is None:
+            await interaction.response.send_message("This command can only be used in a guild.", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        db = self.bot.db.for_guild(guild.id)
+        started = time.monotonic()
+        # A full VACUUM: writes to this database wait until it finishes.
+        converted = await db.run(db.enable_incremental_vacuum)
+        if not converted:
+            await interaction.followup.send(
+                "This server's database already uses incremental vacuum; the retention sweep reclaims free pages.",
+                ephemeral=True,
+                view=ResponseView(),
+            )
+            return
+        await interaction.followup.send(
+            f"Rebuilt the database with incremental vacuum in {time.monotonic() - started:.1f}s. "
+            "Retention sweeps now reclaim free pages.",
+            ephemeral=True,
+            view=ResponseView(),
+        )
+
+    @retention_group.command(name="archived", description="Show archived punishments for a user")
+    @is_staff()
+    @app_commands.describe(user="User to look up", limit="Maximum number of entries to show")
+    async def retention_archived(
+        self,
+        interaction: discord.Interaction,
+        user: discord.User,
+        limit: app_commands.Range[int, 1, 50] = 10,
+    ) -> None:
+        guild = interaction.guild
+        if guild is None:
+            await interaction.response.send_message("This command can only be used in a guild.", ephemeral=True)
+            return
+        records = await self.bot.history.get_archived_punishments_for_user_async(guild.id, user.id, limit=limit)
+        if not records:
+            await interaction.response.send_message("No archived history found.", ephemeral=True, view=ResponseView())
+            return
+        lines = []
+        for record in records:
+            lines.append(
+                f"{record.created_at:%Y-%m-%d %H:%M} - {record.action} | "
+                f"moderator={record.moderator_id} | reason={record.reason or 'None'}"
+            )
+        embed = discord.Embed(
+            title=f"Archived history: {user}",
+            description="\n".join(lines),
+            colour=discord.Colour.blurple(),
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True, view=ResponseView())
+
+    backup_group = app_commands.Group(name="backup", description="Database backups")
+
+    @backup_group.command(name="run", description="Take an online backup of the bot database now (owner only)")
+    async def backup_run(self, interaction: discord.Interaction) -> None:
+        # Backups cover every guild's data, so no single guild's staff may start one.
+        if not self._is_owner(interaction.user):
+            raise app_commands.CheckFailure("Only bot owners may use this command.")
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            report = await self.bot.backups.backup_async()
+        except Exception as exc:
+            await interaction.followup.send(f"Backup failed: {exc}", ephemeral=True, view=ResponseView())
+            return
+        await interaction.followup.send(
+            f"Backup `{report.path.name}` written: {report.files} file(s), {report.pages} page(s), "
+            f"{report.size / 1024 / 1024:.1f} MiB in {report.seconds:.1f}s. Rotated out {report.removed} old backup(s).",
+            ephemeral=True,
+            view=ResponseView(),
+        )
+        await log_moderation_action(
+            interaction,
+            "Database Backup",
+            target=None,
+            reason=f"Wrote {report.path.name}",
+        )
+
+    @backup_group.command(name="list", description="List stored database backups (owner only)")
+    async def backup_list(self, interaction: discord.Interaction) -> None:
+        if not self._is_owner(interaction.user):
+            raise app_commands.CheckFailure("Only bot owners may use this command.")
+        backups = self.bot.backups.list_backups()
+        if not backups:
+            await interaction.response.send_message("No backups have been taken yet.", ephemeral=True, view=ResponseView())
+            return
+        lines = [f"{taken:%Y-%m-%d %H:%M:%S} UTC - `{path.name}`" for taken, path in backups]
+        embed = discord.Embed(
+            title="Database backups",
+            description="\n".join(lines),
+            colour=discord.Colour.blurple(),
+        )
+        interval_hours = self.bot.backups.interval / 3600
+        schedule = f"every {interval_hours:g} h" if interval_hours > 0 else "disabled"
+        embed.set_footer(text=f"Schedule: {schedule}, keeping {self.bot.backups.keep}")
+        await interaction.response.send_message(embed=embed, ephemeral=True, view=ResponseView())
+
+    @app_commands.command(name="history-import", description="Bulk-import punishment and note history (owner only)")
+    @app_commands.describe(
+        file="CSV or JSONL file, optionally gzip-compressed",
+        fmt="Input format (default: from the file name)",
+    )
+    @app_commands.rename(fmt="format")
+    @app_commands.choices(fmt=[app_commands.Choice(name=name.upper(), value=name) for name in IMPORT_FORMATS])
+    async def history_import(
+        self,
+        interaction: discord.Interaction,
+        file: discord.Attachment,
+        fmt: Optional[app_commands.Choice[str]] = None,
+    ) -> None:
+        if not self._is_owner(interaction.user):
+            raise app_commands.CheckFailure("Only bot owners may use this command.")
+        guild = interaction.guild
+        if guild is None:
+            await interaction.response.send_message("This command can only be used in a guild.", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        input_format = fmt.value if fmt is not None else detect_format(file.filename)
+        # Downloaded in chunks to a temporary file (Attachment.read/save would hold
+        # the whole upload in memory), then parsed from disk.
+        spool = tempfile.TemporaryFile()
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(file.url) as response:
+                    response.raise_for_status()
+                    async for chunk in response.content.iter_chunked(IMPORT_DOWNLOAD_CHUNK):
+                        spool.write(chunk)
+        except aiohttp.ClientError as exc:
+            spool.close()
+            await interaction.edit_original_response(content=f"Could not download {file.filename}: {exc}")
+            return
+        spool.seek(0)
+        raw: io.BufferedIOBase = spool
+        if file.filename.lower().endswith(".gz"):
+            raw = gzip.GzipFile(fileobj=spool)
+        last_update = time.monotonic()
+
+        async def progress(report: ImportReport) -> None:
+            nonlocal last_update
+            if time.monotonic() - last_update < 2:
+                return
+            last_update = time.monotonic()
+            await interaction.edit_original_response(
+                content=f"Importing... {report.imported} row(s) so far, {report.skipped} skipped."
+            )
+
+        # A truncated or corrupt .gz raises EOFError or BadGzipFile (an OSError)
+        # mid-stream, and a malformed CSV raises csv.Error; all of them end the
+        # import with a reply.
+        try:
+            with spool, io.TextIOWrapper(raw, encoding="utf-8-sig", newline="") as fp:
+                report = await self.bot.importer.import_file_async(guild.id, fp, input_format, progress=progress)
+        except (OSError, EOFError, UnicodeDecodeError, ValueError, csv.Error) as exc:
+            await interaction.edit_original_response(content=f"Import failed: {str(exc) or type(exc).__name__}")
+            return
+        lines = [
+            f"Imported {report.punishments} punishment(s) and {report.notes} note(s) "
+            f"in {report.seconds:.1f}s ({report.rows_per_second:,.0f} rows/s).",
+        ]
+        if report.skipped:
+            lines.append(f"Skipped {report.skipped} invalid row(s):")
+            lines.extend(f"- {error}" for error in report.errors[:10])
+        await interaction.edit_original_response(content="\n".join(lines)[:2000], view=ResponseView())
+        await log_moderation_action(
+            interaction,
+            "History Import",
+            target=None,
+            reason=f"Imported {report.imported} row(s) from {file.filename}",
+        )
+
     @app_commands.command(name="debug-eval", description="Owner-only emergency evaluation tool")
     @app_commands.describe(expression="Python expression to evaluate (owner only)")
     async def debug_eval(self, interaction: discord.Interaction, expression: str) -> None:
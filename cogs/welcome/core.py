@@ -59,14 +59,11 @@ class Welcome(commands.Cog):
             await channel.send(embed=embed, view=ResponseView())
         auto_roles = getattr(self.bot, "auto_roles", None)
         if auto_roles is not None:
-            role_id = auto_roles.get_role(guild.id, "join")
+            role_id = await auto_roles.get_role_async(guild.id, "join")
             if role_id:
                 role = guild.get_role(role_id)
                 if role is not None:
-                    try:
-                        await member.add_roles(role, reason="Auto-role on join (trigger 'join')")
-                    except discord.HTTPException:
-                        pass
+                    await self.bot.role_queue.add(member, role, reason="Auto-role on join (trigger 'join')")
 
     group = app_commands.Group(name="welcome", description="Onboarding and welcome configuration")
 
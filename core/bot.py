@@ -8,11 +8,21 @@ from discord.ext import commands
 
 from core.config import BotConfig
 from services.auto_roles import AutoRoleStore
+from services.backup import BackupService
+from services.cache import ConfigCache
 from services.database import Database
+from services.exports import HistoryExporter
 from services.history import HistoryStore
+from services.importer import HistoryImporter
 from services.incidents import IncidentStore
+from services.reaction_reconcile import ReactionRoleReconciler
 from services.reaction_roles import ReactionRoleStore
+from services.reaction_sync import ReactionSyncEngine
+from services.retention import RetentionService
+from services.role_queue import RoleMutationQueue
 from services.scheduler import Scheduler
+from services.sharding import ShardedDatabase
+from services.staff import StaffWhitelistStore
 from services.tickets import TicketService
 from services.webhook_manager import WebhookManager
 
@@ -27,7 +37,7 @@ COG_EXTENSIONS = [
 
 
 class QuefBot(commands.Bot):
-    def __init__(self, config: BotConfig) -> None:
+    def __init__(self, config: BotConfig, data_dir: Optional[Path] = None) -> None:
         intents = discord.Intents.default()
         intents.members = True
         intents.guilds = True
@@ -37,21 +47,64 @@ class QuefBot(commands.Bot):
             intents=intents,
         )
         self.config = config
-        base_dir = Path(__file__).resolve().parents[1]
-        self.db = Database(base_dir / "bot.db")
+        if config.api_base_url:
+            # Process-wide: every REST call, including interaction responses, uses this base.
+            discord.http.Route.BASE = config.api_base_url.rstrip("/")
+        # Databases, shards, archives and backups live here; the repository root by default.
+        base_dir = data_dir or Path(__file__).resolve().parents[1]
+        group_commit_window = (config.db_group_commit_ms or 0) / 1000
+        group_commit_max = config.db_group_commit_max or 100
+        if config.db_sharding:
+            self.db: Database = ShardedDatabase(
+                base_dir / "bot.db",
+                base_dir / "shards",
+                group_commit_window=group_commit_window,
+                group_commit_max=group_commit_max,
+                max_open_shards=config.db_max_open_shards or 256,
+            )
+        else:
+            self.db = Database(
+                base_dir / "bot.db",
+                group_commit_window=group_commit_window,
+                group_commit_max=group_commit_max,
+            )
         self.scheduler: Optional[Scheduler] = Scheduler(self)
-        self.auto_roles = AutoRoleStore(self.db)
-        self.history = HistoryStore(self.db)
+        self.config_cache = ConfigCache(config.config_cache_size or 2048)
+        self.auto_roles = AutoRoleStore(self.db, self.config_cache)
+        backup_hours = config.backup_interval_hours if config.backup_interval_hours is not None else 24
+        self.backups = BackupService(
+            self.db,
+            base_dir / "backups",
+            keep=config.backup_keep or 7,
+            interval=backup_hours * 3600,
+        )
+        self.history = HistoryStore(self.db, base_dir / "archive")
+        self.exports = HistoryExporter(self.db, self.history)
+        self.importer = HistoryImporter(self.db, self.history)
         self.incidents = IncidentStore(self.db)
-        self.reaction_roles = ReactionRoleStore(self.db)
-        self.tickets = TicketService(self.db)
+        self.reaction_roles = ReactionRoleStore(self.db, self.config_cache)
+        reconcile_rate = config.reaction_reconcile_rate if config.reaction_reconcile_rate is not None else 5.0
+        self.reaction_reconciler = ReactionRoleReconciler(self, rate=reconcile_rate)
+        self.reaction_sync = ReactionSyncEngine()
+        self.retention = RetentionService(self.db, base_dir / "archive")
+        role_window_ms = config.role_queue_window_ms if config.role_queue_window_ms is not None else 250
+        self.role_queue = RoleMutationQueue(window=role_window_ms / 1000)
+        self.staff_whitelist = StaffWhitelistStore(self.db, self.config_cache)
+        self.tickets = TicketService(self.db, self.config_cache)
         self.webhook_manager = WebhookManager(self)
 
     async def setup_hook(self) -> None:
+        # Reactions are answered from memory, so the index must be ready before events arrive.
+        await self.reaction_roles.load_async()
         for ext in COG_EXTENSIONS:
             await self.load_extension(ext)
         await self.tree.sync()
 
+    async def close(self) -> None:
+        await super().close()
+        self.backups.close()
+        self.db.close()
+
     async def on_ready(self) -> None:
         if self.user is None:
             return
@@ -15,6 +15,17 @@ class BotConfig:
     welcome_webhook_url: Optional[str]
     default_mute_role_id: Optional[int]
     staff_role_ids: Optional[List[int]]
+    db_group_commit_ms: Optional[int] = None
+    db_group_commit_max: Optional[int] = None
+    db_sharding: bool = False
+    db_max_open_shards: Optional[int] = None
+    config_cache_size: Optional[int] = None
+    backup_interval_hours: Optional[float] = None
+    backup_keep: Optional[int] = None
+    api_base_url: Optional[str] = None
+    role_queue_window_ms: Optional[int] = None
+    reaction_reconcile: bool = True
+    reaction_reconcile_rate: Optional[float] = None
 
     def sanitize(self) -> Dict[str, Any]:
         data = asdict(self)
@@ -87,6 +98,40 @@ def load_config() -> BotConfig:
     else:
         staff_role_ids = _normalize_list(file_data.get("staff_role_ids"))
 
+    group_commit_ms_raw = os.getenv("DISCORD_DB_GROUP_COMMIT_MS") or file_data.get("db_group_commit_ms")
+    db_group_commit_ms = int(group_commit_ms_raw) if group_commit_ms_raw else None
+
+    group_commit_max_raw = os.getenv("DISCORD_DB_GROUP_COMMIT_MAX") or file_data.get("db_group_commit_max")
+    db_group_commit_max = int(group_commit_max_raw) if group_commit_max_raw else None
+
+    sharding_raw = os.getenv("DISCORD_DB_SHARDING") or file_data.get("db_sharding")
+    db_sharding = str(sharding_raw).strip().lower() in ("1", "true", "yes", "on") if sharding_raw else False
+
+    open_shards_raw = os.getenv("DISCORD_DB_MAX_OPEN_SHARDS") or file_data.get("db_max_open_shards")
+    db_max_open_shards = int(open_shards_raw) if open_shards_raw else None
+
+    cache_size_raw = os.getenv("DISCORD_CONFIG_CACHE_SIZE") or file_data.get("config_cache_size")
+    config_cache_size = int(cache_size_raw) if cache_size_raw else None
+
+    backup_interval_raw = os.getenv("DISCORD_BACKUP_INTERVAL_HOURS") or file_data.get("backup_interval_hours")
+    backup_interval_hours = float(backup_interval_raw) if backup_interval_raw not in (None, "") else None
+
+    backup_keep_raw = os.getenv("DISCORD_BACKUP_KEEP") or file_data.get("backup_keep")
+    backup_keep = int(backup_keep_raw) if backup_keep_raw else None
+
+    api_base_url = os.getenv("DISCORD_API_BASE_URL") or file_data.get("api_base_url") or None
+
+    role_window_raw = os.getenv("DISCORD_ROLE_QUEUE_WINDOW_MS") or file_data.get("role_queue_window_ms")
+    role_queue_window_ms = int(role_window_raw) if role_window_raw not in (None, "") else None
+
+    reconcile_raw = os.getenv("DISCORD_REACTION_RECONCILE")
+    if reconcile_raw is None:
+        reconcile_raw = file_data.get("reaction_reconcile")
+    reaction_reconcile = str(reconcile_raw).strip().lower() not in ("0", "false", "no", "off") if reconcile_raw is not None else True
+
+    reconcile_rate_raw = os.getenv("DISCORD_REACTION_RECONCILE_RATE") or file_data.get("reaction_reconcile_rate")
+    reaction_reconcile_rate = float(reconcile_rate_raw) if reconcile_rate_raw not in (None, "") else None
+
     return BotConfig(
         token=token,
         guild_ids=guild_ids,
@@ -96,4 +141,15 @@ def load_config() -> BotConfig:
         welcome_webhook_url=welcome_webhook_url,
         default_mute_role_id=default_mute_role_id,
         staff_role_ids=staff_role_ids,
+        db_group_commit_ms=db_group_commit_ms,
+        db_group_commit_max=db_group_commit_max,
+        db_sharding=db_sharding,
+        db_max_open_shards=db_max_open_shards,
+        config_cache_size=config_cache_size,
+        backup_interval_hours=backup_interval_hours,
+        backup_keep=backup_keep,
+        api_base_url=api_base_url,
+        role_queue_window_ms=role_queue_window_ms,
+        reaction_reconcile=reaction_reconcile,
+        reaction_reconcile_rate=reaction_reconcile_rate,
     )
@@ -0,0 +1,57 @@
+import argparse
+import gzip
+import io
+import sys
+from pathlib import Path
+
+from services.database import Database
+from services.history import HistoryStore
+from services.importer import IMPORT_FORMATS, HistoryImporter, ImportReport, detect_format
+from services.sharding import ShardedDatabase
+
+
+def main() -> None:
+    base_dir = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(description="Bulk-import punishment and note history into a guild")
+    parser.add_argument("path", type=Path, help="CSV or JSONL file to import (optionally .gz)")
+    parser.add_argument("--guild", type=int, required=True, help="Guild ID the history belongs to")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="Input format (default: from the file extension)")
+    parser.add_argument("--db", type=Path, default=base_dir / "bot.db", help="Database file (default: bot.db)")
+    parser.add_argument("--shards", type=Path, help="Shard directory, when the bot runs with db_sharding")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per transaction")
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path.name)
+    if args.shards is not None:
+        db: Database = ShardedDatabase(args.db, args.shards)
+    else:
+        db = Database(args.db)
+    importer = HistoryImporter(db, HistoryStore(db))
+    importer.chunk_size = max(1, args.chunk_size)
+
+    def progress(report: ImportReport) -> None:
+        print(
+            f"\r{report.imported} imported, {report.skipped} skipped ({report.rows_per_second:,.0f} rows/s)",
+            end="",
+            file=sys.stderr,
+        )
+
+    raw = gzip.open(args.path, "rb") if args.path.name.endswith(".gz") else args.path.open("rb")
+    try:
+        with io.TextIOWrapper(raw, encoding="utf-8-sig", newline="") as fp:
+            report = importer.import_file(args.guild, fp, fmt, progress=progress)
+    finally:
+        db.close()
+    print(file=sys.stderr)
+    for error in report.errors:
+        print(f"skipped {error}", file=sys.stderr)
+    print(
+        f"Imported {report.punishments} punishment(s) and {report.notes} note(s) in {report.seconds:.1f}s "
+        f"({report.rows_per_second:,.0f} rows/s); skipped {report.skipped} invalid row(s)."
+    )
+    if report.skipped:
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,200 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 import datetime
 
+from services.database import RawTime, decode_time, time_ms
+
+
+class _LazyTime:
+    # Keeps the raw column value in a slot and decodes it into a datetime on
+    # first access, so listing or counting records never builds datetimes.
+    def __init__(self, slot: str) -> None:
+        self.slot = slot
+
+    def __get__(self, instance: Any, owner: type) -> Any:
+        if instance is None:
+            return self
+        value = getattr(instance, self.slot)
+        if value is None or isinstance(value, datetime.datetime):
+            return value
+        decoded = decode_time(value)
+        setattr(instance, self.slot, decoded)
+        return decoded
+
+    def __set__(self, instance: Any, value: RawTime) -> None:
+        setattr(instance, self.slot, value)
+
+
+class _Record:
+    # Slotted replacement for a dataclass: same keyword constructor, equality
+    # and repr, but no per-instance __dict__.
+    __slots__ = ()
+    _fields: Tuple[str, ...] = ()
+
+    def _values(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, name) for name in self._fields)
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._values() == other._values()
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        args = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields)
+        return f"{self.__class__.__name__}({args})"
+
+
+class PunishmentRecord(_Record):
+    __slots__ = ("user_id", "moderator_id", "action", "reason", "_created", "_expires", "id")
+    _fields = ("user_id", "moderator_id", "action", "reason", "created_at", "expires_at", "id")
+
+    created_at = _LazyTime("_created")
+    expires_at = _LazyTime("_expires")
+
+    def __init__(
+        self,
+        user_id: int,
+        moderator_id: int,
+        action: str,
+        reason: Optional[str],
+        created_at: RawTime,
+        expires_at: RawTime,
+        id: Optional[int] = None,
+    ) -> None:
+        self.user_id = user_id
+        self.moderator_id = moderator_id
+        self.action = action
+        self.reason = reason
+        self._created = created_at
+        self._expires = expires_at
+        self.id = id
+
+    @property
+    def created_ms(self) -> int:
+        return time_ms(self._created)
+
+    @property
+    def expires_ms(self) -> Optional[int]:
+        return time_ms(self._expires)
+
+
+class NoteRecord(_Record):
+    __slots__ = ("user_id", "moderator_id", "text", "_created", "id")
+    _fields = ("user_id", "moderator_id", "text", "created_at", "id")
+
+    created_at = _LazyTime("_created")
+
+    def __init__(
+        self,
+        user_id: int,
+        moderator_id: int,
+        text: str,
+        created_at: RawTime,
+        id: Optional[int] = None,
+    ) -> None:
+        self.user_id = user_id
+        self.moderator_id = moderator_id
+        self.text = text
+        self._created = created_at
+        self.id = id
+
+    @property
+    def created_ms(self) -> int:
+        return time_ms(self._created)
+
+
+class JailState(_Record):
+    __slots__ = ("guild_id", "user_id", "role_id", "reason", "_created", "_expires")
+    _fields = ("guild_id", "user_id", "role_id", "reason", "created_at", "expires_at")
+
+    created_at = _LazyTime("_created")
+    expires_at = _LazyTime("_expires")
+
+    def __init__(
+        self,
+        guild_id: int,
+        user_id: int,
+        role_id: int,
+        reason: Optional[str],
+        created_at: RawTime,
+        expires_at: RawTime,
+    ) -> None:
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.role_id = role_id
+        self.reason = reason
+        self._created = created_at
+        self._expires = expires_at
+
+    @property
+    def created_ms(self) -> int:
+        return time_ms(self._created)
+
+    @property
+    def expires_ms(self) -> Optional[int]:
+        return time_ms(self._expires)
+
+
+@dataclass
+class PunishmentQuery:
+    user_id: Optional[int] = None
+    moderator_id: Optional[int] = None
+    action: Optional[str] = None
+    since: Optional[datetime.datetime] = None
+    until: Optional[datetime.datetime] = None
+    reason_contains: Optional[str] = None
+    active_only: bool = False
+
+    @property
+    def matches_notes(self) -> bool:
+        # Notes have no action or expiry, so those filters exclude them entirely.
+        return self.action is None and not self.active_only
+
+
+@dataclass
+class HistoryCursor:
+    created_ms: int
+    id: int
+
 
 @dataclass
-class PunishmentRecord:
-    user_id: int
-    moderator_id: int
-    action: str
-    reason: Optional[str]
-    created_at: datetime.datetime
-    expires_at: Optional[datetime.datetime]
+class PunishmentPage:
+    records: List[PunishmentRecord]
+    # Pass `older` as `before` to fetch the next page, `newer` as `after` for the previous one.
+    older: Optional[HistoryCursor]
+    newer: Optional[HistoryCursor]
 
 
 @dataclass
-class NoteRecord:
-    user_id: int
-    moderator_id: int
-    text: str
-    created_at: datetime.datetime
+class SearchHit:
+    record: Union[PunishmentRecord, NoteRecord]
+    # Matched text with the hits wrapped in ** for Discord markdown.
+    snippet: str
+    rank: float
 
 
 @dataclass
-class JailState:
-    guild_id: int
-    user_id: int
-    role_id: int
-    reason: Optional[str]
-    created_at: datetime.datetime
-    expires_at: Optional[datetime.datetime]
+class SearchPage:
+    hits: List[SearchHit]
+    offset: int
+    has_more: bool
+
+
+@dataclass
+class InfractionSummary:
+    # Totals and last timestamps per action; notes are counted under "Note".
+    counts: Dict[str, int]
+    last_at: Dict[str, datetime.datetime]
+    # Newest first, at most RECENT_RING_SIZE each; reasons and texts are cut to 200 characters.
+    recent_punishments: List[PunishmentRecord]
+    recent_notes: List[NoteRecord]
+
+    @property
+    def infractions(self) -> int:
+        return sum(count for action, count in self.counts.items() if action != "Note")
+
+    @property
+    def notes(self) -> int:
+        return self.counts.get("Note", 0)
@@ -1,17 +1,41 @@
 from typing import Dict, Optional
 
+from services.cache import ConfigCache
 from services.database import Database
 
 
 class AutoRoleStore:
-    def __init__(self, db: Database) -> None:
+    def __init__(self, db: Database, cache: Optional[ConfigCache] = None) -> None:
         self._db = db
+        self._cache = cache or ConfigCache()
+
+    def _load_triggers(self, guild_id: int) -> Dict[str, int]:
+        rows = self._db.for_guild(guild_id).query_all(
+            "SELECT trigger, role_id FROM auto_roles WHERE guild_id = ?",
+            (guild_id,),
+        )
+        return {str(row["trigger"]): int(row["role_id"]) for row in rows}
+
+    def _triggers(self, guild_id: int) -> Dict[str, int]:
+        return self._cache.get(("auto_roles", guild_id), lambda: self._load_triggers(guild_id))
+
+    async def _triggers_async(self, guild_id: int) -> Dict[str, int]:
+        return await self._cache.get_async(
+            ("auto_roles", guild_id),
+            lambda: self._load_triggers(guild_id),
+            self._db.for_guild(guild_id),
+        )
+
+    def _written(self, guild_id: int) -> None:
+        # Commit before dropping the entry so the next load cannot read the old row.
+        self._db.for_guild(guild_id).flush()
+        self._cache.invalidate(("auto_roles", guild_id))
 
     def set_role(self, guild_id: int, trigger: str, role_id: int) -> None:
         trigger = trigger.lower().strip()
         if not trigger:
             return
-        self._db.execute(
+        self._db.for_guild(guild_id).execute(
             """
             INSERT INTO auto_roles (guild_id, trigger, role_id)
             VALUES (?, ?, ?)
@@ -19,29 +43,33 @@ class AutoRoleStore:
             """,
             (guild_id, trigger, role_id),
         )
+        self._written(guild_id)
 
     def get_role(self, guild_id: int, trigger: str) -> Optional[int]:
-        trigger = trigger.lower().strip()
-        row = self._db.query_one(
-            "SELECT role_id FROM auto_roles WHERE guild_id = ? AND trigger = ?",
-            (guild_id, trigger),
-        )
-        if row is None:
-            return None
-        return int(row["role_id"])
+        return self._triggers(guild_id).get(trigger.lower().strip())
 
     def all_triggers(self, guild_id: int) -> Dict[str, int]:
-        rows = self._db.query_all(
-            "SELECT trigger, role_id FROM auto_roles WHERE guild_id = ?",
-            (guild_id,),
-        )
-        return {str(row["trigger"]): int(row["role_id"]) for row in rows}
+        return dict(self._triggers(guild_id))
 
     def clear_trigger(self, guild_id: int, trigger: str) -> None:
         trigger = trigger.lower().strip()
         if not trigger:
             return
-        self._db.execute(
+        self._db.for_guild(guild_id).execute(
             "DELETE FROM auto_roles WHERE guild_id = ? AND trigger = ?",
             (guild_id, trigger),
         )
+        self._written(guild_id)
+
+    async def set_role_async(self, guild_id: int, trigger: str, role_id: int) -> None:
+        await self._db.for_guild(guild_id).run(self.set_role, guild_id, trigger, role_id)
+
+    async def get_role_async(self, guild_id: int, trigger: str) -> Optional[int]:
+        triggers = await self._triggers_async(guild_id)
+        return triggers.get(trigger.lower().strip())
+
+    async def all_triggers_async(self, guild_id: int) -> Dict[str, int]:
+        return dict(await self._triggers_async(guild_id))
+
+    async def clear_trigger_async(self, guild_id: int, trigger: str) -> None:
+        await self._db.for_guild(guild_id).run(self.clear_trigger, guild_id, trigger)
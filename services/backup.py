@@ -0,0 +1,143 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Tuple
+import asyncio
+import datetime
+import shutil
+import sqlite3
+import threading
+import time
+
+from services.database import Database
+
+
+BACKUP_PREFIX = "backup-"
+BACKUP_STAMP = "%Y%m%d-%H%M%S"
+
+
+@dataclass
+class BackupReport:
+    path: Path
+    files: int
+    pages: int
+    size: int
+    seconds: float
+    removed: int
+
+
+def backup_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+class BackupService:
+    def __init__(
+        self,
+        db: Database,
+        backup_dir: Path,
+        *,
+        keep: int = 7,
+        interval: float = 24 * 3600,
+        step_pages: int = 256,
+        step_sleep: float = 0.02,
+    ) -> None:
+        self._db = db
+        self.backup_dir = backup_dir
+        self.keep = max(1, keep)
+        self.interval = interval
+        self.step_pages = step_pages
+        self.step_sleep = step_sleep
+        self._running = threading.Lock()
+        # Backups get their own thread so they never occupy the database executors.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="quefbot-backup")
+
+    def list_backups(self) -> List[Tuple[datetime.datetime, Path]]:
+        if not self.backup_dir.is_dir():
+            return []
+        found = []
+        for path in self.backup_dir.iterdir():
+            if not path.is_dir() or not path.name.startswith(BACKUP_PREFIX):
+                continue
+            try:
+                taken = datetime.datetime.strptime(path.name[len(BACKUP_PREFIX):], BACKUP_STAMP)
+            except ValueError:
+                continue
+            found.append((taken, path))
+        return sorted(found, reverse=True)
+
+    def seconds_until_due(self) -> float:
+        backups = self.list_backups()
+        if not backups:
+            return 0.0
+        age = (datetime.datetime.utcnow() - backups[0][0]).total_seconds()
+        return max(0.0, self.interval - age)
+
+    def _copy(self, source: Path, target: Path) -> int:
+        # A separate read-only connection, not the Database writer: the copy never
+        # takes Database._lock. Holding one read transaction pins a WAL snapshot,
+        # so writes made meanwhile neither tear the copy nor restart it.
+        src = sqlite3.connect(f"{source.resolve().as_uri()}?mode=ro", uri=True)
+        dst = sqlite3.connect(target)
+        pages = 0
+
+        def progress(status: int, remaining: int, total: int) -> None:
+            nonlocal pages
+            pages = total
+
+        try:
+            src.execute("BEGIN")
+            src.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            src.backup(dst, pages=self.step_pages, progress=progress, sleep=self.step_sleep)
+            src.execute("COMMIT")
+        finally:
+            dst.close()
+            src.close()
+        return pages
+
+    def rotate(self) -> int:
+        removed = 0
+        for _, path in self.list_backups()[self.keep:]:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+        return removed
+
+    def backup(self) -> BackupReport:
+        if not self._running.acquire(blocking=False):
+            raise RuntimeError("A backup is already running")
+        try:
+            started = time.perf_counter()
+            name = BACKUP_PREFIX + datetime.datetime.utcnow().strftime(BACKUP_STAMP)
+            final = self.backup_dir / name
+            # Written under a temporary name and renamed when complete, so a crash
+            # never leaves a half-written backup that rotation would count.
+            partial = self.backup_dir / f".{name}.partial"
+            shutil.rmtree(partial, ignore_errors=True)
+            pages = 0
+            files = self._db.storage_files()
+            try:
+                for relative, source in files:
+                    target = partial / relative
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    pages += self._copy(source, target)
+                partial.rename(final)
+            except BaseException:
+                shutil.rmtree(partial, ignore_errors=True)
+                raise
+            removed = self.rotate()
+            return BackupReport(
+                path=final,
+                files=len(files),
+                pages=pages,
+                size=backup_size(final),
+                seconds=time.perf_counter() - started,
+                removed=removed,
+            )
+        finally:
+            self._running.release()
+
+    async def backup_async(self) -> BackupReport:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.backup)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,92 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, TypeVar
+import threading
+
+from services.database import Database
+
+
+T = TypeVar("T")
+
+_MISSING = object()
+
+
+@dataclass
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    max_entries: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ConfigCache:
+    # Read-through LRU for small, rarely written tables. Keys are
+    # (table, guild_id) or similar tuples; values are whatever the loader
+    # returns and must be treated as read-only by callers.
+    def __init__(self, max_entries: int = 2048) -> None:
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation; a load that started before one is not stored.
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key: Hashable) -> Any:
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is not _MISSING:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def get(self, key: Hashable, loader: Callable[[], T]) -> T:
+        value = self._lookup(key)
+        if value is not _MISSING:
+            return value
+        with self._lock:
+            self.misses += 1
+            version = self._version
+        value = loader()
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    async def get_async(self, key: Hashable, loader: Callable[[], T], db: Database) -> T:
+        # Hits are answered on the event loop; only misses go to a reader thread.
+        value = self._lookup(key)
+        if value is not _MISSING:
+            return value
+        return await db.run_read(self.get, key, loader)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._version += 1
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                size=len(self._entries),
+                max_entries=self.max_entries,
+            )
@@ -1,128 +1,506 @@
+import asyncio
+import contextlib
 import sqlite3
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Iterable, List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple, TypeVar, Union
+import datetime
 import threading
+import time
+
+from services.metrics import DatabaseMetrics
+from services.migrations import Migration, apply_migrations, pending_backfills, run_backfill_chunk
+
+
+T = TypeVar("T")
+
+# A failed backfill chunk is retried after 1, 2, 4 ... seconds, at most this long.
+BACKFILL_RETRY_MAX = 300.0
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def to_epoch_ms(value: datetime.datetime) -> int:
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    delta = value - _EPOCH
+    return delta.days * 86_400_000 + delta.seconds * 1000 + delta.microseconds // 1000
+
+
+def from_epoch_ms(value: int) -> datetime.datetime:
+    return _EPOCH + datetime.timedelta(milliseconds=value)
+
+
+# A timestamp as stored: epoch milliseconds, an ISO string from rows the
+# epoch-ms backfill has not reached yet, a decoded datetime, or None.
+RawTime = Union[int, str, datetime.datetime, None]
+
+
+def decode_time(value: RawTime) -> Optional[datetime.datetime]:
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, str):
+        return datetime.datetime.fromisoformat(value)
+    return from_epoch_ms(value)
+
+
+def time_ms(value: RawTime) -> Optional[int]:
+    if value is None or isinstance(value, int):
+        return value
+    return to_epoch_ms(decode_time(value))
+
+
+def row_raw_time(row: Mapping[str, Any], prefix: str) -> RawTime:
+    millis = row[f"{prefix}_ms"]
+    if millis is not None:
+        return millis
+    # Rows written before the epoch-ms migration until the backfill reaches them.
+    return row[f"{prefix}_at"] or None
+
+
+def row_datetime(row: Mapping[str, Any], prefix: str) -> Optional[datetime.datetime]:
+    return decode_time(row_raw_time(row, prefix))
+
+
+class Transaction:
+    def __init__(self, conn: sqlite3.Connection, metrics: Optional[DatabaseMetrics] = None) -> None:
+        self._conn = conn
+        self._metrics = metrics
+
+    def execute(self, sql: str, params: Iterable[Any] = ()) -> sqlite3.Cursor:
+        started = time.perf_counter()
+        cur = self._conn.execute(sql, tuple(params))
+        if self._metrics is not None:
+            self._metrics.record_statement(sql, time.perf_counter() - started, cur.rowcount)
+        return cur
+
+    def executemany(self, sql: str, seq_of_params: Iterable[Iterable[Any]]) -> sqlite3.Cursor:
+        started = time.perf_counter()
+        cur = self._conn.executemany(sql, seq_of_params)
+        if self._metrics is not None:
+            self._metrics.record_statement(sql, time.perf_counter() - started, cur.rowcount)
+        return cur
+
+    def query_all(self, sql: str, params: Iterable[Any] = ()) -> List[sqlite3.Row]:
+        started = time.perf_counter()
+        rows = self._conn.execute(sql, tuple(params)).fetchall()
+        if self._metrics is not None:
+            self._metrics.record_statement(sql, time.perf_counter() - started, len(rows))
+        return rows
+
+    def query_one(self, sql: str, params: Iterable[Any] = ()) -> Optional[sqlite3.Row]:
+        started = time.perf_counter()
+        cur = self._conn.execute(sql, tuple(params))
+        row = cur.fetchone()
+        # Finish the statement so a RETURNING clause never leaves it pending at commit.
+        cur.close()
+        if self._metrics is not None:
+            self._metrics.record_statement(sql, time.perf_counter() - started, int(row is not None))
+        return row
 
 
 class Database:
-    def __init__(self, path: Path) -> None:
+    def __init__(
+        self,
+        path: Path,
+        *,
+        group_commit_window: float = 0.0,
+        group_commit_max: int = 100,
+        read_pool_size: int = 4,
+        metrics: Optional[DatabaseMetrics] = None,
+    ) -> None:
         self.path = path
+        self.metrics = metrics or DatabaseMetrics()
+        # Set on per-guild shards (see services.sharding); None for a single file.
+        self.guild_id: Optional[int] = None
+        self.group_commit_window = max(0.0, group_commit_window)
+        self.group_commit_max = max(1, group_commit_max)
+        self.backfill_chunk_size = 5000
         self._lock = threading.Lock()
         self._conn = sqlite3.connect(self.path, check_same_thread=False)
         self._conn.row_factory = sqlite3.Row
-        self._ensure_schema()
-
-    def _ensure_schema(self) -> None:
-        with self._lock:
-            cur = self._conn.cursor()
-            cur.executescript(
-                """
-                PRAGMA journal_mode=WAL;
-
-                CREATE TABLE IF NOT EXISTS punishments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    guild_id INTEGER NOT NULL,
-                    user_id INTEGER NOT NULL,
-                    moderator_id INTEGER NOT NULL,
-                    action TEXT NOT NULL,
-                    reason TEXT,
-                    created_at TEXT NOT NULL,
-                    expires_at TEXT
-                );
-
-                CREATE TABLE IF NOT EXISTS notes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    guild_id INTEGER NOT NULL,
-                    user_id INTEGER NOT NULL,
-                    moderator_id INTEGER NOT NULL,
-                    text TEXT NOT NULL,
-                    created_at TEXT NOT NULL
-                );
-
-                CREATE TABLE IF NOT EXISTS jails (
-                    guild_id INTEGER NOT NULL,
-                    user_id INTEGER NOT NULL,
-                    role_id INTEGER NOT NULL,
-                    reason TEXT,
-                    created_at TEXT NOT NULL,
-                    expires_at TEXT,
-                    PRIMARY KEY (guild_id, user_id)
-                );
-
-                CREATE TABLE IF NOT EXISTS incidents (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    description TEXT NOT NULL,
-                    status TEXT NOT NULL,
-                    created_by INTEGER NOT NULL,
-                    created_at TEXT NOT NULL,
-                    updated_at TEXT NOT NULL
-                );
-
-                CREATE TABLE IF NOT EXISTS tickets (
-                    id INTEGER PRIMARY KEY,
-                    priority TEXT NOT NULL,
-                    status TEXT NOT NULL,
-                    reporter_id INTEGER,
-                    escalated_by INTEGER,
-                    updated_at TEXT NOT NULL
-                );
-
-                CREATE TABLE IF NOT EXISTS auto_roles (
-                    guild_id INTEGER NOT NULL,
-                    trigger TEXT NOT NULL,
-                    role_id INTEGER NOT NULL,
-                    PRIMARY KEY (guild_id, trigger)
-                );
-
-                CREATE TABLE IF NOT EXISTS reaction_roles (
-                    guild_id INTEGER NOT NULL,
-                    message_id INTEGER NOT NULL,
-                    emoji TEXT NOT NULL,
-                    role_id INTEGER NOT NULL,
-                    PRIMARY KEY (guild_id, message_id, emoji)
-                );
-
-                CREATE TABLE IF NOT EXISTS ticket_config (
-                    guild_id INTEGER PRIMARY KEY,
-                    category_id INTEGER NOT NULL
-                );
-
-                CREATE TABLE IF NOT EXISTS ticket_channels (
-                    ticket_id INTEGER PRIMARY KEY,
-                    guild_id INTEGER NOT NULL,
-                    channel_id INTEGER NOT NULL
-                );
-
-                CREATE TABLE IF NOT EXISTS staff_whitelist (
-                    user_id INTEGER PRIMARY KEY,
-                    level TEXT NOT NULL
-                );
-
-                CREATE TABLE IF NOT EXISTS ticket_transcripts (
-                    guild_id INTEGER PRIMARY KEY,
-                    channel_id INTEGER NOT NULL
-                );
-
-                CREATE INDEX IF NOT EXISTS idx_punishments_guild ON punishments (guild_id);
-                CREATE INDEX IF NOT EXISTS idx_punishments_guild_user ON punishments (guild_id, user_id);
-                CREATE INDEX IF NOT EXISTS idx_notes_guild_user ON notes (guild_id, user_id);
-                """
-            )
-            self._conn.commit()
+        # All awaitable calls are funnelled through one dedicated thread so a slow
+        # commit or fsync never runs on the event loop.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="quefbot-db")
+        # Under WAL readers do not block the writer, so reads get their own pool
+        # of read-only connections, one per executor thread. The executors start
+        # threads (and so open reader connections) only when jobs arrive.
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._read_executor = ThreadPoolExecutor(
+            max_workers=max(1, read_pool_size),
+            thread_name_prefix="quefbot-db-read",
+            initializer=self._open_reader,
+        )
+        # Group-commit state: writes executed since the last commit share one
+        # future that resolves once their transaction is durable.
+        self._batch: Optional[Future] = None
+        self._batch_size = 0
+        self._flush_timer: Optional[threading.Timer] = None
+        self._backfill_timers: Dict[int, threading.Timer] = {}
+        # Versions whose backfill has not finished; see backfilling.
+        self._backfilling: Set[int] = set()
+        self._closed = False
+        # Jobs submitted through run/run_read that have not finished, and when the
+        # database was last handed out (see ShardedDatabase.for_guild).
+        self._active = 0
+        self._active_lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self._migrate()
+
+    @property
+    def group_commit(self) -> bool:
+        return self.group_commit_window > 0
+
+    @property
+    def busy(self) -> bool:
+        return self._active > 0
+
+    @property
+    def backfilling(self) -> bool:
+        # While True some *_ms columns may still be NULL (see migrations.epoch_ms_sql).
+        return bool(self._backfilling)
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[float]:
+        # Yields how long the caller waited for the writer lock, in seconds.
+        started = time.perf_counter()
+        self._lock.acquire()
+        waited = time.perf_counter() - started
+        self.metrics.record_lock_wait(waited)
+        try:
+            yield waited
+        finally:
+            self._lock.release()
+
+    def storage_files(self) -> List[Tuple[str, Path]]:
+        # (path relative to a backup directory, file) for every database file.
+        return [(self.path.name, self.path)]
+
+    def for_guild(self, guild_id: int) -> "Database":
+        # A single-file database holds every guild; ShardedDatabase overrides this.
+        return self
+
+    def guild_databases(self) -> Iterator["Database"]:
+        # Every database holding guild rows, for whole-bot passes such as startup loads.
+        return iter([self])
+
+    def _migrate(self) -> None:
+        with self._locked():
+            if self._conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone() is None:
+                # Only takes effect before the first table exists; older files are
+                # converted on request (see enable_incremental_vacuum).
+                self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            apply_migrations(self._conn)
+            backfills = pending_backfills(self._conn)
+            self._backfilling.update(migration.version for migration in backfills)
+        # Backfills run in small chunks on the writer thread, interleaved with
+        # regular writes, so startup never waits on a large bot.db.
+        for migration in backfills:
+            self._executor.submit(self._run_backfill, migration)
+
+    def _run_backfill(self, migration: Migration, attempt: int = 0) -> None:
+        try:
+            with self.transaction() as tx:
+                more = run_backfill_chunk(tx, migration, self.backfill_chunk_size)
+        except sqlite3.Error as exc:
+            # Progress is committed per chunk, so the retry resumes where this one stopped.
+            delay = min(BACKFILL_RETRY_MAX, 2.0 ** attempt)
+            print(f"Backfill for migration {migration.version} failed: {exc}; retrying in {delay:.0f}s")
+            self._retry_backfill(migration, attempt + 1, delay)
+            return
+        if more:
+            self._submit_backfill(migration)
+        else:
+            self._backfilling.discard(migration.version)
+
+    def _submit_backfill(self, migration: Migration, attempt: int = 0) -> None:
+        self._backfill_timers.pop(migration.version, None)
+        if self._closed:
+            return
+        try:
+            self._executor.submit(self._run_backfill, migration, attempt)
+        except RuntimeError:
+            return
+
+    def _retry_backfill(self, migration: Migration, attempt: int, delay: float) -> None:
+        if self._closed:
+            return
+        timer = threading.Timer(delay, self._submit_backfill, (migration, attempt))
+        timer.daemon = True
+        self._backfill_timers[migration.version] = timer
+        timer.start()
 
     def execute(self, sql: str, params: Iterable[Any] = ()) -> sqlite3.Cursor:
-        with self._lock:
-            cur = self._conn.execute(sql, tuple(params))
-            self._conn.commit()
+        with self._locked() as waited:
+            started = time.perf_counter()
+            try:
+                cur = self._conn.execute(sql, tuple(params))
+            except sqlite3.Error:
+                # Outside a batch nothing else shares the implicit transaction the
+                # failed statement may have opened; leaving it open would make every
+                # later BEGIN IMMEDIATE fail.
+                if self._batch is None and self._conn.in_transaction:
+                    self._conn.rollback()
+                raise
+            self.metrics.record_statement(sql, time.perf_counter() - started, cur.rowcount, waited)
+            if not self.group_commit:
+                try:
+                    self._commit()
+                except sqlite3.Error:
+                    self._conn.rollback()
+                    raise
+                return cur
+            if self._batch is None:
+                self._batch = Future()
+            # Inside run_durable: remember every batch this job's writes joined.
+            joined: Optional[List[Future]] = getattr(self._local, "joined", None)
+            if joined is not None and (not joined or joined[-1] is not self._batch):
+                joined.append(self._batch)
+            self._batch_size += 1
+            if self._batch_size >= self.group_commit_max:
+                self._commit_locked()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.group_commit_window, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
             return cur
 
+    def _commit(self) -> None:
+        started = time.perf_counter()
+        self._conn.commit()
+        self.metrics.record_statement("COMMIT", time.perf_counter() - started, 0)
+
+    def _commit_locked(self) -> None:
+        batch = self._batch
+        self._batch = None
+        self._batch_size = 0
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        try:
+            self._commit()
+        except sqlite3.Error as exc:
+            self._conn.rollback()
+            print(f"Group commit failed: {exc}")
+            if batch is not None:
+                batch.set_exception(exc)
+            return
+        if batch is not None:
+            batch.set_result(None)
+
+    def flush(self) -> None:
+        with self._locked():
+            if self._batch is not None:
+                self._commit_locked()
+
+
+    def _open_reader(self) -> None:
+        conn = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only=ON")
+        self._local.reader = conn
+        with self._readers_lock:
+            self._readers.append(conn)
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[Transaction]:
+        with self._locked() as waited:
+            if self._batch is not None:
+                # Commit grouped writes first so a rollback below cannot discard them.
+                self._commit_locked()
+            if self._conn.in_transaction:
+                # Left over from a statement that failed; it holds no committed work.
+                self._conn.rollback()
+            started = time.perf_counter()
+            self._conn.execute("BEGIN IMMEDIATE")
+            self.metrics.record_statement("BEGIN IMMEDIATE", time.perf_counter() - started, 0, waited)
+            try:
+                yield Transaction(self._conn, self.metrics)
+            except BaseException:
+                self._conn.rollback()
+                raise
+            try:
+                self._commit()
+            except sqlite3.Error:
+                self._conn.rollback()
+                raise
+
+    @contextlib.contextmanager
+    def attached(self, path: Path, alias: str) -> Iterator[None]:
+        # On a reader thread the file is attached read-only to that thread's
+        # connection; anywhere else it is attached (and created) on the writer.
+        reader: Optional[sqlite3.Connection] = getattr(self._local, "reader", None)
+        if reader is not None:
+            reader.execute(f"ATTACH DATABASE ? AS {alias}", (f"{path.resolve().as_uri()}?mode=ro",))
+            try:
+                yield
+            finally:
+                reader.execute(f"DETACH DATABASE {alias}")
+            return
+        with self._locked():
+            if self._batch is not None:
+                self._commit_locked()
+            self._conn.execute(f"ATTACH DATABASE ? AS {alias}", (str(path),))
+        try:
+            yield
+        finally:
+            with self._locked():
+                if self._batch is not None:
+                    self._commit_locked()
+                self._conn.execute(f"DETACH DATABASE {alias}")
+
+    def enable_incremental_vacuum(self) -> bool:
+        with self._locked():
+            if self._batch is not None:
+                self._commit_locked()
+            if self._conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                return False
+            # Switching an existing file needs one full VACUUM to rebuild it, which
+            # holds the writer lock throughout; only run it when an owner asks.
+            self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self._conn.execute("VACUUM")
+            return True
+
+    def incremental_vacuum(self, pages: int) -> int:
+        with self._locked():
+            if self._batch is not None:
+                self._commit_locked()
+            if self._conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                return 0
+            before = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+            self._conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+            after = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+            return int(before - after)
+
     def query_all(self, sql: str, params: Iterable[Any] = ()) -> List[sqlite3.Row]:
-        with self._lock:
-            cur = self._conn.execute(sql, tuple(params))
-            return cur.fetchall()
+        reader: Optional[sqlite3.Connection] = getattr(self._local, "reader", None)
+        if reader is not None:
+            started = time.perf_counter()
+            rows = reader.execute(sql, tuple(params)).fetchall()
+            self.metrics.record_statement(sql, time.perf_counter() - started, len(rows))
+            return rows
+        with self._locked() as waited:
+            started = time.perf_counter()
+            rows = self._conn.execute(sql, tuple(params)).fetchall()
+            self.metrics.record_statement(sql, time.perf_counter() - started, len(rows), waited)
+            return rows
 
     def query_one(self, sql: str, params: Iterable[Any] = ()) -> Optional[sqlite3.Row]:
-        with self._lock:
-            cur = self._conn.execute(sql, tuple(params))
-            return cur.fetchone()
+        reader: Optional[sqlite3.Connection] = getattr(self._local, "reader", None)
+        if reader is not None:
+            started = time.perf_counter()
+            row = reader.execute(sql, tuple(params)).fetchone()
+            self.metrics.record_statement(sql, time.perf_counter() - started, int(row is not None))
+            return row
+        with self._locked() as waited:
+            started = time.perf_counter()
+            row = self._conn.execute(sql, tuple(params)).fetchone()
+            self.metrics.record_statement(sql, time.perf_counter() - started, int(row is not None), waited)
+            return row
+
+    def query_iter(self, sql: str, params: Iterable[Any] = (), *, chunk_size: int = 500) -> Iterator[sqlite3.Row]:
+        reader: Optional[sqlite3.Connection] = getattr(self._local, "reader", None)
+        if reader is None:
+            # The writer lock cannot be held across yields, so off the reader
+            # pool this reads everything first, like query_all.
+            yield from self.query_all(sql, params)
+            return
+        # On a reader thread the cursor streams chunk_size rows at a time from
+        # one read snapshot. Only the fetches count towards the statement latency.
+        started = time.perf_counter()
+        cur = reader.execute(sql, tuple(params))
+        elapsed = time.perf_counter() - started
+        count = 0
+        try:
+            while True:
+                started = time.perf_counter()
+                rows = cur.fetchmany(chunk_size)
+                elapsed += time.perf_counter() - started
+                if not rows:
+                    break
+                count += len(rows)
+                yield from rows
+        finally:
+            cur.close()
+            self.metrics.record_statement(sql, elapsed, count)
+
+    def _queued(self, pool: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> Callable[[], T]:
+        # Measures how long a job sat in the executor queue before a thread picked it up.
+        submitted = time.perf_counter()
+        with self._active_lock:
+            self._active += 1
+
+        def job() -> T:
+            self.metrics.record_queue_wait(pool, time.perf_counter() - submitted)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._active_lock:
+                    self._active -= 1
+
+        return job
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._queued("writer", func, *args, **kwargs))
+
+    async def run_read(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._read_executor, self._queued("reader", func, *args, **kwargs))
+
+    async def run_durable(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        # Like run, but returns only once the group commits holding func's writes
+        # are durable, and raises if one was rolled back. The batches are collected
+        # on the writer thread as the writes join them, so a flush in between
+        # cannot hide them and a later batch is never waited on instead.
+        def job() -> Tuple[T, List[Future]]:
+            self._local.joined = []
+            try:
+                return func(*args, **kwargs), self._local.joined
+            finally:
+                self._local.joined = None
+
+        result, batches = await self.run(job)
+        for batch in batches:
+            await asyncio.wrap_future(batch)
+        return result
+
+    async def execute_async(self, sql: str, params: Iterable[Any] = (), *, durable: bool = False) -> sqlite3.Cursor:
+        if durable:
+            return await self.run_durable(self.execute, sql, params)
+        return await self.run(self.execute, sql, params)
+
+    async def wait_durable(self) -> None:
+        # Waits for the group commit holding every write that has already run. The
+        # batch is read on the writer thread, after those writes, not on the loop.
+        batch = await self.run(lambda: self._batch)
+        if batch is not None:
+            await asyncio.wrap_future(batch)
+
+    async def query_all_async(self, sql: str, params: Iterable[Any] = ()) -> List[sqlite3.Row]:
+        return await self.run_read(self.query_all, sql, params)
+
+    async def query_one_async(self, sql: str, params: Iterable[Any] = ()) -> Optional[sqlite3.Row]:
+        return await self.run_read(self.query_one, sql, params)
+
+    def close(self) -> None:
+        self._closed = True
+        for timer in list(self._backfill_timers.values()):
+            timer.cancel()
+        self._backfill_timers.clear()
+        self._read_executor.shutdown(wait=True)
+        with self._readers_lock:
+            for reader in self._readers:
+                reader.close()
+            self._readers.clear()
+        self._executor.shutdown(wait=True)
+        self.flush()
+        with self._locked():
+            # A timer that already fired finds no batch; one that has not must not fire.
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            self._conn.close()
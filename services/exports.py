@@ -0,0 +1,166 @@
+import csv
+import gzip
+import io
+import itertools
+import json
+import tempfile
+from dataclasses import dataclass
+from typing import IO, Any, Dict, Iterable, List, Optional
+
+from models.punishments import NoteRecord, PunishmentQuery, PunishmentRecord
+from services.database import Database
+from services.history import HistoryStore
+
+
+EXPORT_FORMATS = ("csv", "ndjson")
+CSV_HEADER = ["type", "user_id", "moderator_id", "action_or_text", "created_at", "expires_at"]
+# Exports stay in memory up to this size and spill to a temporary file beyond it.
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+
+@dataclass
+class HistoryExport:
+    fp: IO[bytes]
+    filename: str
+    size: int
+    punishments: int
+    notes: int
+
+    @property
+    def fileobj(self) -> IO[bytes]:
+        # SpooledTemporaryFile only subclasses io.IOBase from Python 3.11; on
+        # 3.10 hand out the underlying BytesIO/temporary file so discord.File
+        # treats it as a stream instead of a path.
+        if isinstance(self.fp, io.IOBase):
+            return self.fp
+        return getattr(self.fp, "_file", self.fp)
+
+    def close(self) -> None:
+        self.fp.close()
+
+
+def _punishment_fields(record: PunishmentRecord) -> Dict[str, Any]:
+    return {
+        "type": "punishment",
+        "id": record.id,
+        "user_id": record.user_id,
+        "moderator_id": record.moderator_id,
+        "action": record.action,
+        "reason": record.reason,
+        "created_at": record.created_at.isoformat() if record.created_at else None,
+        "expires_at": record.expires_at.isoformat() if record.expires_at else None,
+    }
+
+
+def _note_fields(record: NoteRecord) -> Dict[str, Any]:
+    return {
+        "type": "note",
+        "id": record.id,
+        "user_id": record.user_id,
+        "moderator_id": record.moderator_id,
+        "text": record.text,
+        "created_at": record.created_at.isoformat() if record.created_at else None,
+    }
+
+
+def _csv_row(fields: Dict[str, Any]) -> List[Any]:
+    if fields["type"] == "punishment":
+        summary = f"{fields['action']}: {fields['reason'] or ''}"
+    else:
+        summary = fields["text"]
+    return [
+        fields["type"],
+        fields["user_id"],
+        fields["moderator_id"],
+        summary,
+        fields["created_at"] or "",
+        fields.get("expires_at") or "",
+    ]
+
+
+class HistoryExporter:
+    def __init__(self, db: Database, history: HistoryStore) -> None:
+        self._db = db
+        self._history = history
+        self.chunk_size = 1000
+
+    def export(
+        self,
+        guild_id: int,
+        query: Optional[PunishmentQuery] = None,
+        *,
+        fmt: str = "csv",
+        compress: bool = False,
+        limit: Optional[int] = None,
+    ) -> HistoryExport:
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        sink: IO[bytes] = gzip.GzipFile(fileobj=spool, mode="wb") if compress else spool
+        # Rows are rendered into a small text buffer and flushed to the sink once
+        # per chunk, so only one chunk is ever held as Python strings.
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt == "csv":
+            writer.writerow(CSV_HEADER)
+        counts = {"punishment": 0, "note": 0}
+
+        def drain() -> None:
+            sink.write(buffer.getvalue().encode("utf-8"))
+            buffer.seek(0)
+            buffer.truncate()
+
+        def emit(records: Iterable[Dict[str, Any]]) -> None:
+            pending = 0
+            for fields in records:
+                if fmt == "csv":
+                    writer.writerow(_csv_row(fields))
+                else:
+                    buffer.write(json.dumps(fields, ensure_ascii=False))
+                    buffer.write("\n")
+                counts[fields["type"]] += 1
+                pending += 1
+                if pending >= self.chunk_size:
+                    drain()
+                    pending = 0
+            drain()
+
+        try:
+            chunk_size = min(self.chunk_size, limit) if limit else self.chunk_size
+            punishments = self._history.iter_punishments(guild_id, query, chunk_size=chunk_size)
+            emit(_punishment_fields(r) for r in itertools.islice(punishments, limit))
+            notes = self._history.iter_notes(guild_id, query, chunk_size=chunk_size)
+            emit(_note_fields(r) for r in itertools.islice(notes, limit))
+            if compress:
+                sink.close()
+        except BaseException:
+            spool.close()
+            raise
+        size = spool.tell()
+        spool.seek(0)
+        filename = f"moderation_logs.{fmt}" + (".gz" if compress else "")
+        return HistoryExport(
+            fp=spool,
+            filename=filename,
+            size=size,
+            punishments=counts["punishment"],
+            notes=counts["note"],
+        )
+
+    async def export_async(
+        self,
+        guild_id: int,
+        query: Optional[PunishmentQuery] = None,
+        *,
+        fmt: str = "csv",
+        compress: bool = False,
+        limit: Optional[int] = None,
+    ) -> HistoryExport:
+        return await self._db.for_guild(guild_id).run_read(
+            self.export,
+            guild_id,
+            query,
+            fmt=fmt,
+            compress=compress,
+            limit=limit,
+        )
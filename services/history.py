@@ -1,121 +1,456 @@
-from typing import List, Optional
-
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
 import datetime
+import re
+
+from models.punishments import (
+    HistoryCursor,
+    InfractionSummary,
+    JailState,
+    NoteRecord,
+    PunishmentPage,
+    PunishmentQuery,
+    PunishmentRecord,
+    SearchHit,
+    SearchPage,
+)
+from services.database import Database, from_epoch_ms, row_raw_time, to_epoch_ms
+from services.migrations import time_sql
+from services.retention import ARCHIVE_ALIAS, guild_archive_files
+
+
+INSERT_PUNISHMENT_SQL = """
+INSERT INTO punishments (
+    guild_id, user_id, moderator_id, action, reason,
+    created_at, expires_at, created_ms, expires_ms
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+INSERT_NOTE_SQL = """
+INSERT INTO notes (
+    guild_id, user_id, moderator_id, text, created_at, created_ms
+) VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+def _punishment_params(guild_id: int, record: PunishmentRecord) -> Tuple[Any, ...]:
+    return (
+        guild_id,
+        record.user_id,
+        record.moderator_id,
+        record.action,
+        record.reason,
+        record.created_at.isoformat(),
+        record.expires_at.isoformat() if record.expires_at else None,
+        record.created_ms,
+        record.expires_ms,
+    )
 
-from models.punishments import JailState, NoteRecord, PunishmentRecord
-from services.database import Database
+
+def _note_params(guild_id: int, record: NoteRecord) -> Tuple[Any, ...]:
+    return (
+        guild_id,
+        record.user_id,
+        record.moderator_id,
+        record.text,
+        record.created_at.isoformat(),
+        record.created_ms,
+    )
+
+
+_SEARCH_TERM = re.compile(r'"([^"]+)"|(\S+)')
+
+
+def fts_query(text: str) -> Optional[str]:
+    # Turns free text into an FTS5 expression that cannot be a syntax error:
+    # every word or "quoted phrase" becomes a quoted string (ANDed together),
+    # and a trailing * on a word keeps its prefix-match meaning.
+    terms = []
+    for phrase, word in _SEARCH_TERM.findall(text):
+        term = phrase or word
+        prefix = not phrase and term.endswith("*")
+        term = term.rstrip("*") if prefix else term
+        if not term.strip():
+            continue
+        quoted = '"' + term.replace('"', '""') + '"'
+        terms.append(quoted + ("*" if prefix else ""))
+    if not terms:
+        return None
+    return " ".join(terms)
 
 
 class HistoryStore:
-    def __init__(self, db: Database) -> None:
+    def __init__(self, db: Database, archive_dir: Optional[Path] = None) -> None:
         self._db = db
+        self.archive_dir = archive_dir
 
     def add_punishment(self, guild_id: int, record: PunishmentRecord) -> None:
-        self._db.execute(
-            """
-            INSERT INTO punishments (
-                guild_id, user_id, moderator_id, action, reason, created_at, expires_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                guild_id,
-                record.user_id,
-                record.moderator_id,
-                record.action,
-                record.reason,
-                record.created_at.isoformat(),
-                record.expires_at.isoformat() if record.expires_at else None,
-            ),
-        )
+        self._db.for_guild(guild_id).execute(INSERT_PUNISHMENT_SQL, _punishment_params(guild_id, record))
 
     def add_note(self, guild_id: int, record: NoteRecord) -> None:
-        self._db.execute(
-            """
-            INSERT INTO notes (
-                guild_id, user_id, moderator_id, text, created_at
-            ) VALUES (?, ?, ?, ?, ?)
-            """,
-            (
-                guild_id,
-                record.user_id,
-                record.moderator_id,
-                record.text,
-                record.created_at.isoformat(),
-            ),
-        )
+        self._db.for_guild(guild_id).execute(INSERT_NOTE_SQL, _note_params(guild_id, record))
+
+    def add_punishments(self, guild_id: int, records: Iterable[PunishmentRecord]) -> int:
+        # One executemany in one transaction; meant for bulk loads (see services.importer).
+        with self._db.for_guild(guild_id).transaction() as tx:
+            cur = tx.executemany(INSERT_PUNISHMENT_SQL, (_punishment_params(guild_id, r) for r in records))
+        return max(cur.rowcount, 0)
+
+    def add_notes(self, guild_id: int, records: Iterable[NoteRecord]) -> int:
+        with self._db.for_guild(guild_id).transaction() as tx:
+            cur = tx.executemany(INSERT_NOTE_SQL, (_note_params(guild_id, r) for r in records))
+        return max(cur.rowcount, 0)
 
     def _row_to_punishment(self, row) -> PunishmentRecord:
-        created_at = datetime.datetime.fromisoformat(row["created_at"])
-        expires_at = (
-            datetime.datetime.fromisoformat(row["expires_at"])
-            if row["expires_at"]
-            else None
-        )
         return PunishmentRecord(
             user_id=row["user_id"],
             moderator_id=row["moderator_id"],
             action=row["action"],
             reason=row["reason"],
-            created_at=created_at,
-            expires_at=expires_at,
+            created_at=row_raw_time(row, "created"),
+            expires_at=row_raw_time(row, "expires"),
+            id=row["id"],
         )
 
     def _row_to_note(self, row) -> NoteRecord:
-        created_at = datetime.datetime.fromisoformat(row["created_at"])
         return NoteRecord(
             user_id=row["user_id"],
             moderator_id=row["moderator_id"],
             text=row["text"],
-            created_at=created_at,
+            created_at=row_raw_time(row, "created"),
+            id=row["id"],
+        )
+
+    def _scan(self, table: str, guild_id: int, user_id: Optional[int]) -> Iterator[Any]:
+        clauses = "guild_id = ?"
+        params: List[Any] = [guild_id]
+        if user_id is not None:
+            clauses += " AND user_id = ?"
+            params.append(user_id)
+        db = self._db.for_guild(guild_id)
+        return db.query_iter(
+            f"SELECT * FROM {table} WHERE {clauses} ORDER BY {time_sql(db, 'created')} ASC, id ASC",
+            params,
         )
 
+    def scan_punishments(self, guild_id: int, user_id: Optional[int] = None) -> Iterator[PunishmentRecord]:
+        # Oldest first without building a list; streams when run on a reader
+        # thread (inside run_read), see Database.query_iter.
+        return map(self._row_to_punishment, self._scan("punishments", guild_id, user_id))
+
+    def scan_notes(self, guild_id: int, user_id: Optional[int] = None) -> Iterator[NoteRecord]:
+        return map(self._row_to_note, self._scan("notes", guild_id, user_id))
+
     def get_punishments(self, guild_id: int) -> List[PunishmentRecord]:
-        rows = self._db.query_all(
-            "SELECT * FROM punishments WHERE guild_id = ? ORDER BY created_at ASC",
-            (guild_id,),
+        return list(self.scan_punishments(guild_id))
+
+    def get_notes(self, guild_id: int) -> List[NoteRecord]:
+        return list(self.scan_notes(guild_id))
+
+    def get_punishments_for_user(self, guild_id: int, user_id: int) -> List[PunishmentRecord]:
+        return list(self.scan_punishments(guild_id, user_id))
+
+    def get_notes_for_user(self, guild_id: int, user_id: int) -> List[NoteRecord]:
+        return list(self.scan_notes(guild_id, user_id))
+
+    def _filter(
+        self, db: Database, guild_id: int, query: Optional[PunishmentQuery], text_column: str
+    ) -> Tuple[List[str], List[Any]]:
+        clauses = ["guild_id = ?"]
+        params: List[Any] = [guild_id]
+        if query is None:
+            return clauses, params
+        if query.user_id is not None:
+            clauses.append("user_id = ?")
+            params.append(query.user_id)
+        if query.moderator_id is not None:
+            clauses.append("moderator_id = ?")
+            params.append(query.moderator_id)
+        if query.action is not None:
+            clauses.append("action = ?")
+            params.append(query.action)
+        if query.since is not None:
+            clauses.append(f"{time_sql(db, 'created')} >= ?")
+            params.append(to_epoch_ms(query.since))
+        if query.until is not None:
+            clauses.append(f"{time_sql(db, 'created')} < ?")
+            params.append(to_epoch_ms(query.until))
+        if query.reason_contains:
+            escaped = query.reason_contains.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append(f"{text_column} LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        if query.active_only:
+            clauses.append(f"{time_sql(db, 'expires')} > ?")
+            params.append(to_epoch_ms(datetime.datetime.utcnow()))
+        return clauses, params
+
+    def query_punishments(self, guild_id: int, query: Optional[PunishmentQuery] = None, *, limit: int = 100) -> List[PunishmentRecord]:
+        db = self._db.for_guild(guild_id)
+        clauses, params = self._filter(db, guild_id, query, "reason")
+        params.append(limit)
+        rows = db.query_all(
+            f"""
+            SELECT * FROM punishments
+            WHERE {" AND ".join(clauses)}
+            ORDER BY {time_sql(db, 'created')} DESC, id DESC
+            LIMIT ?
+            """,
+            params,
         )
         return [self._row_to_punishment(row) for row in rows]
 
-    def get_notes(self, guild_id: int) -> List[NoteRecord]:
-        rows = self._db.query_all(
-            "SELECT * FROM notes WHERE guild_id = ? ORDER BY created_at ASC",
-            (guild_id,),
+    def query_notes(self, guild_id: int, query: Optional[PunishmentQuery] = None, *, limit: int = 100) -> List[NoteRecord]:
+        if query is not None and not query.matches_notes:
+            return []
+        db = self._db.for_guild(guild_id)
+        clauses, params = self._filter(db, guild_id, query, "text")
+        params.append(limit)
+        rows = db.query_all(
+            f"""
+            SELECT * FROM notes
+            WHERE {" AND ".join(clauses)}
+            ORDER BY {time_sql(db, 'created')} DESC, id DESC
+            LIMIT ?
+            """,
+            params,
         )
         return [self._row_to_note(row) for row in rows]
 
-    def get_punishments_for_user(self, guild_id: int, user_id: int) -> List[PunishmentRecord]:
-        rows = self._db.query_all(
+    def _iter_rows(
+        self,
+        table: str,
+        text_column: str,
+        guild_id: int,
+        query: Optional[PunishmentQuery],
+        chunk_size: int,
+    ) -> Iterator[Any]:
+        # Newest first, one keyset-bounded chunk per query, so memory use stays
+        # at chunk_size rows however large the guild history is.
+        db = self._db.for_guild(guild_id)
+        cursor: Optional[Tuple[int, int]] = None
+        while True:
+            created = time_sql(db, "created")
+            clauses, params = self._filter(db, guild_id, query, text_column)
+            if cursor is not None:
+                clauses.append(f"({created}, id) < (?, ?)")
+                params.extend(cursor)
+            params.append(chunk_size)
+            rows = db.query_all(
+                f"""
+                SELECT *, {created} AS sort_ms FROM {table}
+                WHERE {" AND ".join(clauses)}
+                ORDER BY sort_ms DESC, id DESC
+                LIMIT ?
+                """,
+                params,
+            )
+            yield from rows
+            if len(rows) < chunk_size:
+                return
+            cursor = (rows[-1]["sort_ms"], rows[-1]["id"])
+
+    def iter_punishments(
+        self,
+        guild_id: int,
+        query: Optional[PunishmentQuery] = None,
+        *,
+        chunk_size: int = 1000,
+    ) -> Iterator[PunishmentRecord]:
+        for row in self._iter_rows("punishments", "reason", guild_id, query, chunk_size):
+            yield self._row_to_punishment(row)
+
+    def iter_notes(
+        self,
+        guild_id: int,
+        query: Optional[PunishmentQuery] = None,
+        *,
+        chunk_size: int = 1000,
+    ) -> Iterator[NoteRecord]:
+        if query is not None and not query.matches_notes:
+            return
+        for row in self._iter_rows("notes", "text", guild_id, query, chunk_size):
+            yield self._row_to_note(row)
+
+    def get_punishment_page(
+        self,
+        guild_id: int,
+        query: Optional[PunishmentQuery] = None,
+        *,
+        limit: int = 10,
+        before: Optional[HistoryCursor] = None,
+        after: Optional[HistoryCursor] = None,
+    ) -> PunishmentPage:
+        # Newest first. Each page is one index range scan that starts at the
+        # cursor, so its cost does not depend on how deep the page is.
+        db = self._db.for_guild(guild_id)
+        created = time_sql(db, "created")
+        clauses, params = self._filter(db, guild_id, query, "reason")
+        if after is not None:
+            clauses.append(f"({created}, id) > (?, ?)")
+            params.extend((after.created_ms, after.id))
+            order = "ASC"
+        else:
+            if before is not None:
+                clauses.append(f"({created}, id) < (?, ?)")
+                params.extend((before.created_ms, before.id))
+            order = "DESC"
+        params.append(limit + 1)
+        rows = db.query_all(
+            f"""
+            SELECT *, {created} AS sort_ms FROM punishments
+            WHERE {" AND ".join(clauses)}
+            ORDER BY sort_ms {order}, id {order}
+            LIMIT ?
+            """,
+            params,
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if after is not None:
+            rows.reverse()
+        if not rows:
+            return PunishmentPage(records=[], older=None, newer=None)
+        has_older = has_more if after is None else True
+        has_newer = has_more if after is not None else before is not None
+        first, last = rows[0], rows[-1]
+        return PunishmentPage(
+            records=[self._row_to_punishment(row) for row in rows],
+            older=HistoryCursor(last["sort_ms"], last["id"]) if has_older else None,
+            newer=HistoryCursor(first["sort_ms"], first["id"]) if has_newer else None,
+        )
+
+    def get_infraction_summary(self, guild_id: int, user_id: int) -> InfractionSummary:
+        # Reads only the trigger-maintained counters (migration 7), never the history tables.
+        db = self._db.for_guild(guild_id)
+        counters = db.query_all(
+            "SELECT action, total, last_ms FROM infraction_counters WHERE guild_id = ? AND user_id = ?",
+            (guild_id, user_id),
+        )
+        recent = db.query_all(
             """
-            SELECT * FROM punishments
+            SELECT * FROM infraction_recent
             WHERE guild_id = ? AND user_id = ?
-            ORDER BY created_at ASC
+            ORDER BY kind DESC, created_ms DESC, record_id DESC
             """,
             (guild_id, user_id),
         )
-        return [self._row_to_punishment(row) for row in rows]
+        punishments: List[PunishmentRecord] = []
+        notes: List[NoteRecord] = []
+        for row in recent:
+            if row["kind"] == "note":
+                notes.append(
+                    NoteRecord(
+                        user_id=user_id,
+                        moderator_id=row["moderator_id"],
+                        text=row["detail"] or "",
+                        created_at=row["created_ms"],
+                        id=row["record_id"],
+                    )
+                )
+            else:
+                punishments.append(
+                    PunishmentRecord(
+                        user_id=user_id,
+                        moderator_id=row["moderator_id"],
+                        action=row["action"],
+                        reason=row["detail"],
+                        created_at=row["created_ms"],
+                        expires_at=row["expires_ms"],
+                        id=row["record_id"],
+                    )
+                )
+        return InfractionSummary(
+            counts={row["action"]: int(row["total"]) for row in counters},
+            last_at={row["action"]: from_epoch_ms(row["last_ms"]) for row in counters if row["last_ms"] is not None},
+            recent_punishments=punishments,
+            recent_notes=notes,
+        )
 
-    def get_notes_for_user(self, guild_id: int, user_id: int) -> List[NoteRecord]:
-        rows = self._db.query_all(
+    def search(
+        self,
+        guild_id: int,
+        text: str,
+        *,
+        user_id: Optional[int] = None,
+        include_notes: bool = True,
+        limit: int = 10,
+        offset: int = 0,
+    ) -> SearchPage:
+        # bm25-ranked matches over punishment reasons and note texts. Pages use
+        # OFFSET because rank order has no stable keyset; searches are short.
+        expression = fts_query(text)
+        if expression is None:
+            return SearchPage(hits=[], offset=offset, has_more=False)
+        scope = f'guild_id : "{guild_id}"'
+        if user_id is not None:
+            scope += f' AND user_id : "{user_id}"'
+        parts = [
             """
-            SELECT * FROM notes
-            WHERE guild_id = ? AND user_id = ?
-            ORDER BY created_at ASC
+            SELECT 'punishment' AS kind, p.id, p.user_id, p.moderator_id, p.action, p.reason,
+                NULL AS text, p.created_at, p.expires_at, p.created_ms, p.expires_ms,
+                bm25(punishments_fts) AS rank,
+                snippet(punishments_fts, 0, '**', '**', '…', 16) AS snippet
+            FROM punishments_fts JOIN punishments p ON p.id = punishments_fts.rowid
+            WHERE punishments_fts MATCH ?
             """,
-            (guild_id, user_id),
+        ]
+        params: List[Any] = [f"{scope} AND reason : ({expression})"]
+        if include_notes:
+            parts.append(
+                """
+                SELECT 'note' AS kind, n.id, n.user_id, n.moderator_id, NULL, NULL,
+                    n.text, n.created_at, NULL, n.created_ms, NULL,
+                    bm25(notes_fts),
+                    snippet(notes_fts, 0, '**', '**', '…', 16)
+                FROM notes_fts JOIN notes n ON n.id = notes_fts.rowid
+                WHERE notes_fts MATCH ?
+                """
+            )
+            params.append(f"{scope} AND text : ({expression})")
+        rows = self._db.for_guild(guild_id).query_all(
+            " UNION ALL ".join(parts) + " ORDER BY rank, created_ms DESC LIMIT ? OFFSET ?",
+            (*params, limit + 1, offset),
         )
-        return [self._row_to_note(row) for row in rows]
+        hits = []
+        for row in rows[:limit]:
+            record = self._row_to_punishment(row) if row["kind"] == "punishment" else self._row_to_note(row)
+            hits.append(SearchHit(record=record, snippet=row["snippet"] or "", rank=row["rank"]))
+        return SearchPage(hits=hits, offset=offset, has_more=len(rows) > limit)
+
+    def get_archived_punishments_for_user(self, guild_id: int, user_id: int, *, limit: int = 25) -> List[PunishmentRecord]:
+        # Archives are per-year files; walk them newest first until the limit is met.
+        if self.archive_dir is None:
+            return []
+        db = self._db.for_guild(guild_id)
+        records: List[PunishmentRecord] = []
+        for _, path in guild_archive_files(self.archive_dir, db):
+            if len(records) >= limit:
+                break
+            with db.attached(path, ARCHIVE_ALIAS):
+                rows = db.query_all(
+                    f"""
+                    SELECT * FROM {ARCHIVE_ALIAS}.punishments
+                    WHERE guild_id = ? AND user_id = ?
+                    ORDER BY created_ms DESC, id DESC
+                    LIMIT ?
+                    """,
+                    (guild_id, user_id, limit - len(records)),
+                )
+            records.extend(self._row_to_punishment(row) for row in rows)
+        return records
 
     def set_jail(self, state: JailState) -> None:
-        self._db.execute(
+        self._db.for_guild(state.guild_id).execute(
             """
             INSERT INTO jails (
-                guild_id, user_id, role_id, reason, created_at, expires_at
-            ) VALUES (?, ?, ?, ?, ?, ?)
+                guild_id, user_id, role_id, reason, created_at, expires_at, created_ms, expires_ms
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             ON CONFLICT(guild_id, user_id) DO UPDATE SET
                 role_id = excluded.role_id,
                 reason = excluded.reason,
                 created_at = excluded.created_at,
-                expires_at = excluded.expires_at
+                expires_at = excluded.expires_at,
+                created_ms = excluded.created_ms,
+                expires_ms = excluded.expires_ms
             """,
             (
                 state.guild_id,
@@ -124,37 +459,143 @@ class HistoryStore:
                 state.reason,
                 state.created_at.isoformat(),
                 state.expires_at.isoformat() if state.expires_at else None,
+                state.created_ms,
+                state.expires_ms,
             ),
         )
 
-    def get_jail(self, guild_id: int, user_id: int) -> Optional[JailState]:
-        row = self._db.query_one(
-            "SELECT * FROM jails WHERE guild_id = ? AND user_id = ?",
-            (guild_id, user_id),
-        )
-        if row is None:
-            return None
-        created_at = datetime.datetime.fromisoformat(row["created_at"])
-        expires_at = (
-            datetime.datetime.fromisoformat(row["expires_at"])
-            if row["expires_at"]
-            else None
-        )
+    def _row_to_jail(self, row) -> JailState:
         return JailState(
             guild_id=row["guild_id"],
             user_id=row["user_id"],
             role_id=row["role_id"],
             reason=row["reason"],
-            created_at=created_at,
-            expires_at=expires_at,
+            created_at=row_raw_time(row, "created"),
+            expires_at=row_raw_time(row, "expires"),
+        )
+
+    def get_jail(self, guild_id: int, user_id: int) -> Optional[JailState]:
+        row = self._db.for_guild(guild_id).query_one(
+            "SELECT * FROM jails WHERE guild_id = ? AND user_id = ?",
+            (guild_id, user_id),
         )
+        if row is None:
+            return None
+        return self._row_to_jail(row)
 
     def clear_jail(self, guild_id: int, user_id: int) -> Optional[JailState]:
-        state = self.get_jail(guild_id, user_id)
-        if state is None:
+        with self._db.for_guild(guild_id).transaction() as tx:
+            row = tx.query_one(
+                "DELETE FROM jails WHERE guild_id = ? AND user_id = ? RETURNING *",
+                (guild_id, user_id),
+            )
+        if row is None:
             return None
-        self._db.execute(
-            "DELETE FROM jails WHERE guild_id = ? AND user_id = ?",
-            (guild_id, user_id),
+        return self._row_to_jail(row)
+
+    async def add_punishment_async(self, guild_id: int, record: PunishmentRecord, *, durable: bool = False) -> None:
+        db = self._db.for_guild(guild_id)
+        if durable:
+            await db.run_durable(self.add_punishment, guild_id, record)
+        else:
+            await db.run(self.add_punishment, guild_id, record)
+
+    async def add_note_async(self, guild_id: int, record: NoteRecord, *, durable: bool = False) -> None:
+        db = self._db.for_guild(guild_id)
+        if durable:
+            await db.run_durable(self.add_note, guild_id, record)
+        else:
+            await db.run(self.add_note, guild_id, record)
+
+    async def get_punishments_async(self, guild_id: int) -> List[PunishmentRecord]:
+        return await self._db.for_guild(guild_id).run_read(self.get_punishments, guild_id)
+
+    async def get_notes_async(self, guild_id: int) -> List[NoteRecord]:
+        return await self._db.for_guild(guild_id).run_read(self.get_notes, guild_id)
+
+    async def get_punishments_for_user_async(self, guild_id: int, user_id: int) -> List[PunishmentRecord]:
+        return await self._db.for_guild(guild_id).run_read(self.get_punishments_for_user, guild_id, user_id)
+
+    async def get_notes_for_user_async(self, guild_id: int, user_id: int) -> List[NoteRecord]:
+        return await self._db.for_guild(guild_id).run_read(self.get_notes_for_user, guild_id, user_id)
+
+    async def query_punishments_async(
+        self,
+        guild_id: int,
+        query: Optional[PunishmentQuery] = None,
+        *,
+        limit: int = 100,
+    ) -> List[PunishmentRecord]:
+        return await self._db.for_guild(guild_id).run_read(self.query_punishments, guild_id, query, limit=limit)
+
+    async def query_notes_async(
+        self,
+        guild_id: int,
+        query: Optional[PunishmentQuery] = None,
+        *,
+        limit: int = 100,
+    ) -> List[NoteRecord]:
+        return await self._db.for_guild(guild_id).run_read(self.query_notes, guild_id, query, limit=limit)
+
+    async def get_punishment_page_async(
+        self,
+        guild_id: int,
+        query: Optional[PunishmentQuery] = None,
+        *,
+        limit: int = 10,
+        before: Optional[HistoryCursor] = None,
+        after: Optional[HistoryCursor] = None,
+    ) -> PunishmentPage:
+        return await self._db.for_guild(guild_id).run_read(
+            self.get_punishment_page,
+            guild_id,
+            query,
+            limit=limit,
+            before=before,
+            after=after,
         )
-        return state
+
+    async def get_infraction_summary_async(self, guild_id: int, user_id: int) -> InfractionSummary:
+        return await self._db.for_guild(guild_id).run_read(self.get_infraction_summary, guild_id, user_id)
+
+    async def search_async(
+        self,
+        guild_id: int,
+        text: str,
+        *,
+        user_id: Optional[int] = None,
+        include_notes: bool = True,
+        limit: int = 10,
+        offset: int = 0,
+    ) -> SearchPage:
+        return await self._db.for_guild(guild_id).run_read(
+            self.search,
+            guild_id,
+            text,
+            user_id=user_id,
+            include_notes=include_notes,
+            limit=limit,
+            offset=offset,
+        )
+
+    async def get_archived_punishments_for_user_async(
+        self,
+        guild_id: int,
+        user_id: int,
+        *,
+        limit: int = 25,
+    ) -> List[PunishmentRecord]:
+        return await self._db.for_guild(guild_id).run_read(self.get_archived_punishments_for_user, guild_id, user_id, limit=limit)
+
+    async def set_jail_async(self, state: JailState, *, durable: bool = False) -> None:
+        db = self._db.for_guild(state.guild_id)
+        if durable:
+            await db.run_durable(self.set_jail, state)
+        else:
+            await db.run(self.set_jail, state)
+
+    async def get_jail_async(self, guild_id: int, user_id: int) -> Optional[JailState]:
+        return await self._db.for_guild(guild_id).run_read(self.get_jail, guild_id, user_id)
+
+    async def clear_jail_async(self, guild_id: int, user_id: int) -> Optional[JailState]:
+        return await self._db.for_guild(guild_id).run(self.clear_jail, guild_id, user_id)
@@ -0,0 +1,213 @@
+import csv
+import datetime
+import json
+import time
+from dataclasses import dataclass, field
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from models.punishments import NoteRecord, PunishmentRecord
+from services.database import Database
+from services.history import HistoryStore
+
+
+IMPORT_FORMATS = ("csv", "ndjson")
+# Only the first few problems are kept for the report; the rest are counted.
+MAX_REPORTED_ERRORS = 20
+
+ImportItem = Union[PunishmentRecord, NoteRecord]
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+@dataclass
+class ImportReport:
+    punishments: int = 0
+    notes: int = 0
+    skipped: int = 0
+    errors: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def imported(self) -> int:
+        return self.punishments + self.notes
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.imported / self.seconds if self.seconds else 0.0
+
+
+def detect_format(filename: str) -> str:
+    name = filename.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    if name.endswith((".jsonl", ".ndjson", ".json")):
+        return "ndjson"
+    return "csv"
+
+
+def _parse_datetime(value: Any, field_name: str, required: bool) -> Optional[datetime.datetime]:
+    if value is None or value == "":
+        if required:
+            raise ImportRowError(f"missing {field_name}")
+        return None
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.isdigit()):
+        # Epoch seconds; values too large to be seconds (past 2286) are milliseconds.
+        number = float(value)
+        if number > 1e10:
+            number /= 1000
+        return datetime.datetime.utcfromtimestamp(number)
+    try:
+        parsed = datetime.datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise ImportRowError(f"invalid {field_name}: {value!r}") from None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _parse_id(value: Any, field_name: str) -> int:
+    try:
+        parsed = int(value)
+    except (TypeError, ValueError):
+        raise ImportRowError(f"invalid {field_name}: {value!r}") from None
+    if parsed <= 0:
+        raise ImportRowError(f"invalid {field_name}: {value!r}")
+    return parsed
+
+
+def parse_item(fields: Dict[str, Any]) -> ImportItem:
+    kind = str(fields.get("type") or "punishment").strip().lower()
+    user_id = _parse_id(fields.get("user_id"), "user_id")
+    moderator_id = _parse_id(fields.get("moderator_id"), "moderator_id")
+    created_at = _parse_datetime(fields.get("created_at"), "created_at", required=True)
+    # Our own CSV export folds action/reason or the note text into one column.
+    combined = fields.get("action_or_text")
+    if kind == "note":
+        text = fields.get("text") or combined
+        if not text:
+            raise ImportRowError("missing text")
+        return NoteRecord(user_id=user_id, moderator_id=moderator_id, text=str(text), created_at=created_at)
+    if kind != "punishment":
+        raise ImportRowError(f"unknown type: {kind!r}")
+    action = fields.get("action")
+    reason = fields.get("reason")
+    if not action and combined:
+        action, _, rest = str(combined).partition(":")
+        reason = rest.strip() or None
+    if not action:
+        raise ImportRowError("missing action")
+    return PunishmentRecord(
+        user_id=user_id,
+        moderator_id=moderator_id,
+        action=str(action).strip(),
+        reason=str(reason) if reason else None,
+        created_at=created_at,
+        expires_at=_parse_datetime(fields.get("expires_at"), "expires_at", required=False),
+    )
+
+
+def iter_rows(fp: IO[str], fmt: str) -> Iterator[Tuple[int, Union[Dict[str, Any], ImportRowError]]]:
+    # Yields (line number, fields) or (line number, error) so one bad line never
+    # aborts the whole import.
+    if fmt == "csv":
+        reader = csv.DictReader(fp)
+        for fields in reader:
+            yield reader.line_num, fields
+        return
+    if fmt != "ndjson":
+        raise ValueError(f"Unsupported import format: {fmt}")
+    for line_number, line in enumerate(fp, start=1):
+        if not line.strip():
+            continue
+        try:
+            fields = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield line_number, ImportRowError(f"invalid JSON: {exc.msg}")
+            continue
+        if not isinstance(fields, dict):
+            yield line_number, ImportRowError("expected a JSON object")
+            continue
+        yield line_number, fields
+
+
+class HistoryImporter:
+    def __init__(self, db: Database, history: HistoryStore) -> None:
+        self._db = db
+        self._history = history
+        self.chunk_size = 5000
+
+    def _import_chunk(
+        self,
+        guild_id: int,
+        rows: Iterator[Tuple[int, Union[Dict[str, Any], ImportRowError]]],
+        report: ImportReport,
+    ) -> bool:
+        # Reads and validates up to chunk_size rows, then writes them with one
+        # executemany per table. Returns False once the input is exhausted.
+        punishments: List[PunishmentRecord] = []
+        notes: List[NoteRecord] = []
+        exhausted = True
+        for line_number, fields in rows:
+            try:
+                if isinstance(fields, ImportRowError):
+                    raise fields
+                item = parse_item(fields)
+            except ImportRowError as exc:
+                report.skipped += 1
+                if len(report.errors) < MAX_REPORTED_ERRORS:
+                    report.errors.append(f"line {line_number}: {exc}")
+                continue
+            if isinstance(item, NoteRecord):
+                notes.append(item)
+            else:
+                punishments.append(item)
+            if len(punishments) + len(notes) >= self.chunk_size:
+                exhausted = False
+                break
+        if punishments:
+            report.punishments += self._history.add_punishments(guild_id, punishments)
+        if notes:
+            report.notes += self._history.add_notes(guild_id, notes)
+        return not exhausted
+
+    def import_file(
+        self,
+        guild_id: int,
+        fp: IO[str],
+        fmt: str,
+        *,
+        progress: Optional[Callable[[ImportReport], None]] = None,
+    ) -> ImportReport:
+        report = ImportReport()
+        started = time.perf_counter()
+        rows = iter_rows(fp, fmt)
+        while self._import_chunk(guild_id, rows, report):
+            report.seconds = time.perf_counter() - started
+            if progress is not None:
+                progress(report)
+        report.seconds = time.perf_counter() - started
+        return report
+
+    async def import_file_async(
+        self,
+        guild_id: int,
+        fp: IO[str],
+        fmt: str,
+        *,
+        progress: Optional[Callable[[ImportReport], Any]] = None,
+    ) -> ImportReport:
+        # One writer job per chunk, like the retention sweep, so moderation
+        # writes interleave with a long import. The input is only ever read
+        # from the writer thread.
+        db = self._db.for_guild(guild_id)
+        report = ImportReport()
+        started = time.perf_counter()
+        rows = iter_rows(fp, fmt)
+        while await db.run(self._import_chunk, guild_id, rows, report):
+            report.seconds = time.perf_counter() - started
+            if progress is not None:
+                await progress(report)
+        report.seconds = time.perf_counter() - started
+        return report
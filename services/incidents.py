@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from typing import Optional
 import datetime
 
-from services.database import Database
+from services.database import Database, row_datetime, to_epoch_ms
 
 
 @dataclass
@@ -20,17 +20,32 @@ class IncidentStore:
     def __init__(self, db: Database) -> None:
         self._db = db
 
-    def create_incident(self, title: str, description: str, created_by: int) -> Incident:
-        now = datetime.datetime.utcnow().isoformat()
-        cur = self._db.execute(
-            """
-            INSERT INTO incidents (title, description, status, created_by, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (title, description, "open", created_by, now, now),
+    def _row_to_incident(self, row) -> Incident:
+        return Incident(
+            id=row["id"],
+            title=row["title"],
+            description=row["description"],
+            status=row["status"],
+            created_by=row["created_by"],
+            created_at=row_datetime(row, "created"),
+            updated_at=row_datetime(row, "updated"),
         )
-        incident_id = int(cur.lastrowid)
-        return self.get_incident(incident_id)  # type: ignore[return-value]
+
+    def create_incident(self, title: str, description: str, created_by: int) -> Incident:
+        now = datetime.datetime.utcnow()
+        now_ms = to_epoch_ms(now)
+        with self._db.transaction() as tx:
+            row = tx.query_one(
+                """
+                INSERT INTO incidents (
+                    title, description, status, created_by, created_at, updated_at, created_ms, updated_ms
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                RETURNING *
+                """,
+                (title, description, "open", created_by, now.isoformat(), now.isoformat(), now_ms, now_ms),
+            )
+        assert row is not None
+        return self._row_to_incident(row)
 
     def get_incident(self, incident_id: int) -> Optional[Incident]:
         row = self._db.query_one(
@@ -39,25 +54,18 @@ class IncidentStore:
         )
         if row is None:
             return None
-        created_at = datetime.datetime.fromisoformat(row["created_at"])
-        updated_at = datetime.datetime.fromisoformat(row["updated_at"])
-        return Incident(
-            id=row["id"],
-            title=row["title"],
-            description=row["description"],
-            status=row["status"],
-            created_by=row["created_by"],
-            created_at=created_at,
-            updated_at=updated_at,
-        )
+        return self._row_to_incident(row)
 
     def set_status(self, incident_id: int, status: str) -> Optional[Incident]:
-        updated_at = datetime.datetime.utcnow().isoformat()
-        self._db.execute(
-            "UPDATE incidents SET status = ?, updated_at = ? WHERE id = ?",
-            (status, updated_at, incident_id),
-        )
-        return self.get_incident(incident_id)
+        updated_at = datetime.datetime.utcnow()
+        with self._db.transaction() as tx:
+            row = tx.query_one(
+                "UPDATE incidents SET status = ?, updated_at = ?, updated_ms = ? WHERE id = ? RETURNING *",
+                (status, updated_at.isoformat(), to_epoch_ms(updated_at), incident_id),
+            )
+        if row is None:
+            return None
+        return self._row_to_incident(row)
 
     def delete_incident(self, incident_id: int) -> bool:
         cur = self._db.execute(
@@ -65,3 +73,15 @@ class IncidentStore:
             (incident_id,),
         )
         return cur.rowcount > 0
+
+    async def create_incident_async(self, title: str, description: str, created_by: int) -> Incident:
+        return await self._db.run(self.create_incident, title, description, created_by)
+
+    async def get_incident_async(self, incident_id: int) -> Optional[Incident]:
+        return await self._db.run_read(self.get_incident, incident_id)
+
+    async def set_status_async(self, incident_id: int, status: str) -> Optional[Incident]:
+        return await self._db.run(self.set_status, incident_id, status)
+
+    async def delete_incident_async(self, incident_id: int) -> bool:
+        return await self._db.run(self.delete_incident, incident_id)
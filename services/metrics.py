@@ -0,0 +1,157 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+import bisect
+import threading
+
+
+# Upper bucket bounds in milliseconds, doubling from 10µs to ~10s.
+LATENCY_BOUNDS_MS: List[float] = [0.01 * 2 ** i for i in range(21)]
+ROW_BOUNDS: List[float] = [0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000]
+
+
+class Histogram:
+    def __init__(self, bounds: Sequence[float]) -> None:
+        self.bounds = list(bounds)
+        # One extra bucket for values above the last bound.
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction: float) -> float:
+        # Reports the upper bound of the bucket holding the percentile, so the
+        # result is an upper estimate with the precision of the bucket layout.
+        if self.count == 0:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.bounds[index] if index < len(self.bounds) else self.max
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def copy(self) -> "Histogram":
+        clone = Histogram(self.bounds)
+        clone.counts = list(self.counts)
+        clone.count = self.count
+        clone.total = self.total
+        clone.max = self.max
+        return clone
+
+
+@dataclass
+class StatementStats:
+    template: str
+    latency_ms: Histogram
+    lock_wait_ms: Histogram
+    rows: Histogram
+
+    @property
+    def calls(self) -> int:
+        return self.latency_ms.count
+
+    @property
+    def total_ms(self) -> float:
+        return self.latency_ms.total + self.lock_wait_ms.total
+
+
+@dataclass
+class MetricsSnapshot:
+    statements: List[StatementStats]
+    lock_wait_ms: Histogram
+    queue_wait_ms: Dict[str, Histogram]
+
+    def top(self, count: int, key: str = "total") -> List[StatementStats]:
+        sorters = {
+            "total": lambda s: s.total_ms,
+            "calls": lambda s: s.calls,
+            "p95": lambda s: s.latency_ms.percentile(0.95),
+            "lock": lambda s: s.lock_wait_ms.total,
+            "rows": lambda s: s.rows.total,
+        }
+        return sorted(self.statements, key=sorters[key], reverse=True)[:count]
+
+
+class DatabaseMetrics:
+    def __init__(self, max_templates: int = 500) -> None:
+        self.max_templates = max_templates
+        self._lock = threading.Lock()
+        self._statements: Dict[str, StatementStats] = {}
+        # Raw SQL text -> normalized template, so whitespace is collapsed once per statement.
+        self._templates: Dict[str, str] = {}
+        self._lock_wait = Histogram(LATENCY_BOUNDS_MS)
+        self._queue_wait: Dict[str, Histogram] = {}
+
+    def _template(self, sql: str) -> str:
+        template = self._templates.get(sql)
+        if template is None:
+            template = " ".join(sql.split())
+            if len(self._templates) < self.max_templates * 4:
+                self._templates[sql] = template
+        return template
+
+    def record_statement(self, sql: str, elapsed: float, rows: int, lock_wait: Optional[float] = None) -> None:
+        template = self._template(sql)
+        with self._lock:
+            stats = self._statements.get(template)
+            if stats is None:
+                if len(self._statements) >= self.max_templates:
+                    template = "(other)"
+                    stats = self._statements.get(template)
+                if stats is None:
+                    stats = StatementStats(
+                        template=template,
+                        latency_ms=Histogram(LATENCY_BOUNDS_MS),
+                        lock_wait_ms=Histogram(LATENCY_BOUNDS_MS),
+                        rows=Histogram(ROW_BOUNDS),
+                    )
+                    self._statements[template] = stats
+            stats.latency_ms.record(elapsed * 1000)
+            stats.rows.record(max(rows, 0))
+            if lock_wait is not None:
+                stats.lock_wait_ms.record(lock_wait * 1000)
+
+    def record_lock_wait(self, waited: float) -> None:
+        with self._lock:
+            self._lock_wait.record(waited * 1000)
+
+    def record_queue_wait(self, pool: str, waited: float) -> None:
+        with self._lock:
+            histogram = self._queue_wait.get(pool)
+            if histogram is None:
+                histogram = self._queue_wait[pool] = Histogram(LATENCY_BOUNDS_MS)
+            histogram.record(waited * 1000)
+
+    def snapshot(self) -> MetricsSnapshot:
+        with self._lock:
+            return MetricsSnapshot(
+                statements=[
+                    StatementStats(
+                        template=s.template,
+                        latency_ms=s.latency_ms.copy(),
+                        lock_wait_ms=s.lock_wait_ms.copy(),
+                        rows=s.rows.copy(),
+                    )
+                    for s in self._statements.values()
+                ],
+                lock_wait_ms=self._lock_wait.copy(),
+                queue_wait_ms={name: h.copy() for name, h in self._queue_wait.items()},
+            )
+
+    def reset(self) -> None:
+        with self._lock:
+            self._statements.clear()
+            self._lock_wait = Histogram(LATENCY_BOUNDS_MS)
+            self._queue_wait.clear()
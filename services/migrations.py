@@ -0,0 +1,468 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
+import sqlite3
+
+if TYPE_CHECKING:
+    from services.database import Database, Transaction
+
+
+# A backfill processes one chunk per call: it receives its saved (step, last_rowid)
+# progress and returns the next progress, or None once it is finished.
+BackfillFn = Callable[["Transaction", int, int, int], Optional[Tuple[int, int]]]
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    script: str
+    backfill: Optional[BackfillFn] = None
+
+
+# ISO-8601 TEXT -> epoch milliseconds, evaluated inside SQLite.
+def _iso_to_ms(column: str) -> str:
+    return f"CAST(ROUND((julianday({column}) - 2440587.5) * 86400000.0) AS INTEGER)"
+
+
+def epoch_ms_sql(prefix: str) -> str:
+    # The {prefix}_ms column, or its ISO value on rows the backfill has not reached yet.
+    return f"COALESCE({prefix}_ms, {_iso_to_ms(prefix + '_at')})"
+
+
+def time_sql(db: "Database", prefix: str) -> str:
+    # Rows the epoch-ms backfill has not reached yet have NULL *_ms values, which
+    # range filters and keyset comparisons would drop; until it finishes, sort
+    # and filter on the ISO fallback instead (without the index).
+    return epoch_ms_sql(prefix) if db.backfilling else f"{prefix}_ms"
+
+
+_EPOCH_MS_COLUMNS: List[Tuple[str, List[str]]] = [
+    ("punishments", ["created", "expires"]),
+    ("notes", ["created"]),
+    ("jails", ["created", "expires"]),
+    ("incidents", ["created", "updated"]),
+    ("tickets", ["updated"]),
+]
+
+
+def _backfill_epoch_ms(tx: "Transaction", step: int, last_rowid: int, chunk_size: int) -> Optional[Tuple[int, int]]:
+    if step >= len(_EPOCH_MS_COLUMNS):
+        return None
+    table, prefixes = _EPOCH_MS_COLUMNS[step]
+    row = tx.query_one(
+        f"SELECT MAX(rowid) AS upper FROM (SELECT rowid FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?)",
+        (last_rowid, chunk_size),
+    )
+    upper = row["upper"] if row is not None else None
+    if upper is None:
+        return step + 1, 0
+    assignments = ", ".join(f"{p}_ms = COALESCE({p}_ms, {_iso_to_ms(p + '_at')})" for p in prefixes)
+    tx.execute(
+        f"UPDATE {table} SET {assignments} WHERE rowid > ? AND rowid <= ?",
+        (last_rowid, upper),
+    )
+    return step, int(upper)
+
+
+RECENT_RING_SIZE = 5
+
+
+def _infraction_counters_script() -> str:
+    # Counters per (guild, user, action) plus the newest RECENT_RING_SIZE
+    # punishments and notes per user, maintained by triggers so summaries never
+    # read the history tables. Notes are counted under the action 'Note'.
+    # created_ms may still be NULL on rows the migration-2 backfill has not
+    # reached yet, so the initial load falls back to the ISO column.
+    p_ms = epoch_ms_sql("created")
+    p_exp = epoch_ms_sql("expires")
+    ring = RECENT_RING_SIZE
+    parts = [
+        """
+        CREATE TABLE IF NOT EXISTS infraction_counters (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            total INTEGER NOT NULL,
+            last_ms INTEGER,
+            PRIMARY KEY (guild_id, user_id, action)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS infraction_recent (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            created_ms INTEGER NOT NULL,
+            record_id INTEGER NOT NULL,
+            moderator_id INTEGER NOT NULL,
+            action TEXT,
+            detail TEXT,
+            expires_ms INTEGER,
+            PRIMARY KEY (guild_id, user_id, kind, created_ms, record_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_infraction_recent_record ON infraction_recent (kind, record_id);
+        """
+    ]
+    for kind, table, action, detail, expires in (
+        ("punishment", "punishments", "new.action", "new.reason", "new.expires_ms"),
+        ("note", "notes", "'Note'", "new.text", "NULL"),
+    ):
+        old_action = action.replace("new.", "old.")
+        refill_detail = detail.replace("new.", "")
+        refill_expires = expires.replace("new.", "")
+        parts.append(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_counters_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO infraction_counters (guild_id, user_id, action, total, last_ms)
+                VALUES (new.guild_id, new.user_id, {action}, 1, new.created_ms)
+                ON CONFLICT (guild_id, user_id, action) DO UPDATE SET
+                    total = total + 1,
+                    last_ms = MAX(COALESCE(last_ms, excluded.last_ms), excluded.last_ms);
+                INSERT OR REPLACE INTO infraction_recent (
+                    guild_id, user_id, kind, created_ms, record_id, moderator_id, action, detail, expires_ms
+                )
+                SELECT new.guild_id, new.user_id, '{kind}', new.created_ms, new.id, new.moderator_id,
+                    {action}, substr({detail}, 1, 200), {expires}
+                WHERE new.created_ms IS NOT NULL;
+                DELETE FROM infraction_recent
+                WHERE guild_id = new.guild_id AND user_id = new.user_id AND kind = '{kind}'
+                    AND (created_ms, record_id) < (
+                        SELECT created_ms, record_id FROM infraction_recent
+                        WHERE guild_id = new.guild_id AND user_id = new.user_id AND kind = '{kind}'
+                        ORDER BY created_ms DESC, record_id DESC
+                        LIMIT 1 OFFSET {ring - 1}
+                    );
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS {table}_counters_delete AFTER DELETE ON {table} BEGIN
+                UPDATE infraction_counters SET
+                    total = total - 1,
+                    last_ms = CASE WHEN old.created_ms < last_ms THEN last_ms ELSE (
+                        SELECT MAX(created_ms) FROM {table}
+                        WHERE guild_id = old.guild_id AND user_id = old.user_id
+                            AND {old_action.replace("old.", "")} = {old_action}
+                    ) END
+                WHERE guild_id = old.guild_id AND user_id = old.user_id AND action = {old_action};
+                DELETE FROM infraction_counters
+                WHERE guild_id = old.guild_id AND user_id = old.user_id AND action = {old_action} AND total <= 0;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS {table}_recent_delete AFTER DELETE ON {table}
+            WHEN EXISTS (SELECT 1 FROM infraction_recent WHERE kind = '{kind}' AND record_id = old.id) BEGIN
+                -- A recent entry went away; refill the ring from the user's history index.
+                DELETE FROM infraction_recent
+                WHERE guild_id = old.guild_id AND user_id = old.user_id AND kind = '{kind}';
+                INSERT INTO infraction_recent (
+                    guild_id, user_id, kind, created_ms, record_id, moderator_id, action, detail, expires_ms
+                )
+                SELECT guild_id, user_id, '{kind}', created_ms, id, moderator_id,
+                    {old_action.replace("old.", "")}, substr({refill_detail}, 1, 200), {refill_expires}
+                FROM {table}
+                WHERE guild_id = old.guild_id AND user_id = old.user_id AND created_ms IS NOT NULL
+                ORDER BY created_ms DESC, id DESC
+                LIMIT {ring};
+            END;
+            """
+        )
+    for kind, table, action, detail, expires in (
+        ("punishment", "punishments", "action", "reason", p_exp),
+        ("note", "notes", "'Note'", "text", "NULL"),
+    ):
+        parts.append(
+            f"""
+            INSERT OR REPLACE INTO infraction_counters (guild_id, user_id, action, total, last_ms)
+            SELECT guild_id, user_id, {action}, COUNT(*), MAX({p_ms})
+            FROM {table}
+            GROUP BY guild_id, user_id, {action};
+
+            INSERT OR REPLACE INTO infraction_recent (
+                guild_id, user_id, kind, created_ms, record_id, moderator_id, action, detail, expires_ms
+            )
+            SELECT guild_id, user_id, '{kind}', ms, id, moderator_id, act, substr(detail, 1, 200), exp
+            FROM (
+                SELECT guild_id, user_id, id, moderator_id, {action} AS act, {detail} AS detail,
+                    {p_ms} AS ms, {expires} AS exp,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY guild_id, user_id ORDER BY {p_ms} DESC, id DESC
+                    ) AS position
+                FROM {table}
+            )
+            WHERE position <= {ring} AND ms IS NOT NULL;
+            """
+        )
+    return "\n".join(parts)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        version=1,
+        name="baseline schema",
+        script="""
+        CREATE TABLE IF NOT EXISTS punishments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            moderator_id INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            reason TEXT,
+            created_at TEXT NOT NULL,
+            expires_at TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS notes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            moderator_id INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS jails (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            role_id INTEGER NOT NULL,
+            reason TEXT,
+            created_at TEXT NOT NULL,
+            expires_at TEXT,
+            PRIMARY KEY (guild_id, user_id)
+        );
+
+        CREATE TABLE IF NOT EXISTS incidents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            status TEXT NOT NULL,
+            created_by INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS tickets (
+            id INTEGER PRIMARY KEY,
+            priority TEXT NOT NULL,
+            status TEXT NOT NULL,
+            reporter_id INTEGER,
+            escalated_by INTEGER,
+            updated_at TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS auto_roles (
+            guild_id INTEGER NOT NULL,
+            trigger TEXT NOT NULL,
+            role_id INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, trigger)
+        );
+
+        CREATE TABLE IF NOT EXISTS reaction_roles (
+            guild_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            emoji TEXT NOT NULL,
+            role_id INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, message_id, emoji)
+        );
+
+        CREATE TABLE IF NOT EXISTS ticket_config (
+            guild_id INTEGER PRIMARY KEY,
+            category_id INTEGER NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS ticket_channels (
+            ticket_id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS staff_whitelist (
+            user_id INTEGER PRIMARY KEY,
+            level TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS ticket_transcripts (
+            guild_id INTEGER PRIMARY KEY,
+            channel_id INTEGER NOT NULL
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_punishments_guild ON punishments (guild_id);
+        CREATE INDEX IF NOT EXISTS idx_punishments_guild_user ON punishments (guild_id, user_id);
+        CREATE INDEX IF NOT EXISTS idx_notes_guild_user ON notes (guild_id, user_id);
+        """,
+    ),
+    Migration(
+        version=2,
+        name="integer epoch-millisecond timestamps",
+        script="""
+        ALTER TABLE punishments ADD COLUMN created_ms INTEGER;
+        ALTER TABLE punishments ADD COLUMN expires_ms INTEGER;
+        ALTER TABLE notes ADD COLUMN created_ms INTEGER;
+        ALTER TABLE jails ADD COLUMN created_ms INTEGER;
+        ALTER TABLE jails ADD COLUMN expires_ms INTEGER;
+        ALTER TABLE incidents ADD COLUMN created_ms INTEGER;
+        ALTER TABLE incidents ADD COLUMN updated_ms INTEGER;
+        ALTER TABLE tickets ADD COLUMN updated_ms INTEGER;
+        """,
+        backfill=_backfill_epoch_ms,
+    ),
+    Migration(
+        version=3,
+        name="indexes for hot store queries",
+        script="""
+        DROP INDEX IF EXISTS idx_punishments_guild;
+        DROP INDEX IF EXISTS idx_punishments_guild_user;
+        DROP INDEX IF EXISTS idx_notes_guild_user;
+        CREATE INDEX IF NOT EXISTS idx_punishments_guild_created ON punishments (guild_id, created_ms);
+        CREATE INDEX IF NOT EXISTS idx_punishments_guild_user_created ON punishments (guild_id, user_id, created_ms);
+        CREATE INDEX IF NOT EXISTS idx_notes_guild_created ON notes (guild_id, created_ms);
+        CREATE INDEX IF NOT EXISTS idx_notes_guild_user_created ON notes (guild_id, user_id, created_ms);
+        CREATE INDEX IF NOT EXISTS idx_tickets_reporter_status ON tickets (reporter_id, status, updated_ms);
+        CREATE INDEX IF NOT EXISTS idx_ticket_channels_guild_channel ON ticket_channels (guild_id, channel_id);
+        """,
+    ),
+    Migration(
+        version=4,
+        name="indexes for filtered history queries",
+        script="""
+        CREATE INDEX IF NOT EXISTS idx_punishments_guild_moderator_created ON punishments (guild_id, moderator_id, created_ms);
+        CREATE INDEX IF NOT EXISTS idx_punishments_guild_action_created ON punishments (guild_id, action, created_ms);
+        """,
+    ),
+    Migration(
+        version=5,
+        name="retention policies",
+        script="""
+        CREATE TABLE IF NOT EXISTS retention_policies (
+            guild_id INTEGER PRIMARY KEY,
+            archive_after_days INTEGER NOT NULL,
+            purge_after_days INTEGER
+        );
+        """,
+    ),
+    Migration(
+        version=6,
+        name="full-text search over reasons and notes",
+        # External-content FTS5 tables: the text lives only in punishments/notes,
+        # the triggers keep the index in step with every insert, update and delete
+        # (including retention moving rows out). guild_id and user_id are indexed
+        # as tokens so a search is filtered by the FTS index itself.
+        script="""
+        CREATE VIRTUAL TABLE IF NOT EXISTS punishments_fts USING fts5(
+            reason, guild_id, user_id,
+            content='punishments', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+            text, guild_id, user_id,
+            content='notes', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+
+        CREATE TRIGGER IF NOT EXISTS punishments_fts_insert AFTER INSERT ON punishments BEGIN
+            INSERT INTO punishments_fts (rowid, reason, guild_id, user_id)
+            VALUES (new.id, new.reason, new.guild_id, new.user_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS punishments_fts_delete AFTER DELETE ON punishments BEGIN
+            INSERT INTO punishments_fts (punishments_fts, rowid, reason, guild_id, user_id)
+            VALUES ('delete', old.id, old.reason, old.guild_id, old.user_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS punishments_fts_update AFTER UPDATE OF reason, guild_id, user_id ON punishments BEGIN
+            INSERT INTO punishments_fts (punishments_fts, rowid, reason, guild_id, user_id)
+            VALUES ('delete', old.id, old.reason, old.guild_id, old.user_id);
+            INSERT INTO punishments_fts (rowid, reason, guild_id, user_id)
+            VALUES (new.id, new.reason, new.guild_id, new.user_id);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+            INSERT INTO notes_fts (rowid, text, guild_id, user_id)
+            VALUES (new.id, new.text, new.guild_id, new.user_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+            INSERT INTO notes_fts (notes_fts, rowid, text, guild_id, user_id)
+            VALUES ('delete', old.id, old.text, old.guild_id, old.user_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE OF text, guild_id, user_id ON notes BEGIN
+            INSERT INTO notes_fts (notes_fts, rowid, text, guild_id, user_id)
+            VALUES ('delete', old.id, old.text, old.guild_id, old.user_id);
+            INSERT INTO notes_fts (rowid, text, guild_id, user_id)
+            VALUES (new.id, new.text, new.guild_id, new.user_id);
+        END;
+
+        INSERT INTO punishments_fts (punishments_fts) VALUES ('rebuild');
+        INSERT INTO notes_fts (notes_fts) VALUES ('rebuild');
+        """,
+    ),
+    Migration(
+        version=7,
+        name="per-user infraction counters",
+        script=_infraction_counters_script(),
+    ),
+    Migration(
+        version=8,
+        name="reaction-role panel channels",
+        # NULL for panels set up before this; filled in by /react-role set, clear or sync.
+        script="ALTER TABLE reaction_roles ADD COLUMN channel_id INTEGER;",
+    ),
+]
+
+
+def _ensure_bookkeeping(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_backfills (
+            version INTEGER PRIMARY KEY,
+            step INTEGER NOT NULL DEFAULT 0,
+            last_rowid INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    conn.commit()
+
+
+def apply_migrations(conn: sqlite3.Connection) -> List[int]:
+    _ensure_bookkeeping(conn)
+    current = int(conn.execute("PRAGMA user_version").fetchone()[0])
+    applied: List[int] = []
+    for migration in MIGRATIONS:
+        if migration.version <= current:
+            continue
+        backfill_sql = ""
+        if migration.backfill is not None:
+            backfill_sql = f"INSERT OR IGNORE INTO schema_backfills (version) VALUES ({migration.version});"
+        try:
+            conn.executescript(
+                f"""
+                BEGIN IMMEDIATE;
+                {migration.script}
+                {backfill_sql}
+                PRAGMA user_version = {migration.version};
+                COMMIT;
+                """
+            )
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        applied.append(migration.version)
+    return applied
+
+
+def pending_backfills(conn: sqlite3.Connection) -> List[Migration]:
+    rows = conn.execute("SELECT version FROM schema_backfills ORDER BY version").fetchall()
+    versions = {int(row[0]) for row in rows}
+    return [m for m in MIGRATIONS if m.version in versions and m.backfill is not None]
+
+
+def run_backfill_chunk(tx: "Transaction", migration: Migration, chunk_size: int) -> bool:
+    row = tx.query_one(
+        "SELECT step, last_rowid FROM schema_backfills WHERE version = ?",
+        (migration.version,),
+    )
+    if row is None or migration.backfill is None:
+        return False
+    progress = migration.backfill(tx, int(row["step"]), int(row["last_rowid"]), chunk_size)
+    if progress is None:
+        tx.execute("DELETE FROM schema_backfills WHERE version = ?", (migration.version,))
+        return False
+    tx.execute(
+        "UPDATE schema_backfills SET step = ?, last_rowid = ? WHERE version = ?",
+        (progress[0], progress[1], migration.version),
+    )
+    return True
@@ -0,0 +1,68 @@
+from typing import Awaitable, Callable, TypeVar
+import asyncio
+
+import discord
+
+
+T = TypeVar("T")
+
+
+class RatePacer:
+    # Spaces calls at least 1/rate seconds apart so background jobs leave most of
+    # a route's budget to live traffic. discord.py still honours the bucket
+    # headers itself; on a 429 (seen by call, or reported through backoff) the
+    # pacer halves its rate, then recovers by 10% per call that goes through.
+    def __init__(self, rate: float, *, min_rate: float = 0.2) -> None:
+        self.rate = rate
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate) if rate > 0 else 0.0
+        self._next = 0.0
+        self.waited = 0.0
+        self.requests = 0
+        self.backoffs = 0
+
+    async def wait(self) -> None:
+        if self.rate <= 0:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next)
+        self._next = slot + 1 / self.rate
+        if slot > now:
+            self.waited += slot - now
+            await asyncio.sleep(slot - now)
+
+    def ok(self) -> None:
+        if 0 < self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate * 1.1)
+
+    def backoff(self, retry_after: float = 0.0) -> None:
+        if self.rate <= 0:
+            return
+        self.backoffs += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        now = asyncio.get_running_loop().time()
+        self._next = max(self._next, now + retry_after)
+
+    async def call(self, request: Callable[[], Awaitable[T]], *, max_attempts: int = 5) -> T:
+        # Runs request in its slot, retrying 429s in later slots; other errors propagate.
+        for attempt in range(1, max_attempts + 1):
+            await self.wait()
+            self.requests += 1
+            try:
+                result = await request()
+            except discord.HTTPException as exc:
+                if exc.status != 429 or attempt >= max_attempts:
+                    raise
+                self.backoff(retry_after_seconds(exc))
+                continue
+            self.ok()
+            return result
+        raise RuntimeError("max_attempts must be at least 1")
+
+
+def retry_after_seconds(exc: discord.HTTPException, default: float = 1.0) -> float:
+    headers = getattr(exc.response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After") or default)
+    except ValueError:
+        return default
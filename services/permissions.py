@@ -72,13 +72,13 @@ def is_staff():
                 for required_id in config.staff_role_ids:
                     if required_id in member_role_ids:
                         return True
-        db = getattr(client, "db", None)
-        if db is not None:
+        whitelist = getattr(client, "staff_whitelist", None)
+        if whitelist is not None:
             try:
-                row = db.query_one("SELECT level FROM staff_whitelist WHERE user_id = ?", (member.id,))
+                level = await whitelist.get_level_async(member.id)
             except Exception:
-                row = None
-            if row is not None:
+                level = None
+            if level is not None:
                 return True
         raise app_commands.CheckFailure("You do not have permission to use this command")
 
@@ -0,0 +1,280 @@
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import time
+
+import discord
+
+from services.pacing import RatePacer
+from services.reaction_roles import ReactionRolePanel, emoji_key
+
+
+# Discord returns at most this many users per reaction page.
+REACTION_PAGE_SIZE = 100
+RECONCILE_REASON = "Reaction-role reconciliation"
+
+
+@dataclass
+class ReconcileReport:
+    guilds: int = 0
+    panels: int = 0
+    scanned: int = 0
+    skipped: int = 0
+    reactors: int = 0
+    requests: int = 0
+    added: int = 0
+    removed: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+
+    def eta(self) -> Optional[float]:
+        if not self.scanned or self.scanned + self.skipped >= self.panels:
+            return None
+        done = self.scanned + self.skipped
+        return self.seconds / done * (self.panels - done)
+
+
+def _format_seconds(seconds: float) -> str:
+    minutes, secs = divmod(int(seconds), 60)
+    return f"{minutes}m {secs:02d}s" if minutes else f"{secs}s"
+
+
+class ReactionRoleReconciler:
+    def __init__(
+        self,
+        bot: Any,
+        *,
+        rate: float = 5.0,
+        concurrency: int = 4,
+        max_attempts: int = 5,
+        progress_interval: float = 15.0,
+    ) -> None:
+        self.bot = bot
+        # Reads (messages, reaction users) and member edits are separate routes.
+        self.read_pacer = RatePacer(rate)
+        self.write_pacer = RatePacer(rate)
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.progress_interval = progress_interval
+        self.running = False
+        self.last_report: Optional[ReconcileReport] = None
+
+    async def _read(self, report: ReconcileReport, call: Callable[[], Awaitable[Any]]) -> Any:
+        report.requests += 1
+        return await self.read_pacer.call(call, max_attempts=self.max_attempts)
+
+    async def _reactors(self, report: ReconcileReport, reaction: discord.Reaction) -> Set[int]:
+        users: Set[int] = set()
+        after: Optional[discord.Object] = None
+        while True:
+            page = await self._read(
+                report,
+                lambda: _collect(reaction.users(limit=REACTION_PAGE_SIZE, after=after)),
+            )
+            users.update(user.id for user in page if not user.bot)
+            if len(page) < REACTION_PAGE_SIZE:
+                return users
+            after = discord.Object(id=page[-1].id)
+
+    async def _scan(
+        self, report: ReconcileReport, guild: discord.Guild, panel: ReactionRolePanel
+    ) -> Optional[Dict[int, Set[int]]]:
+        # role id -> user ids reacting with any of the panel's emoji for it, or None
+        # when the panel could not be read.
+        channel = guild.get_channel(panel.channel_id) if panel.channel_id else None
+        if not isinstance(channel, discord.TextChannel):
+            return None
+        try:
+            message = await self._read(report, lambda: channel.fetch_message(panel.message_id))
+            reactions = {emoji_key(reaction.emoji): reaction for reaction in message.reactions}
+            holders: Dict[int, Set[int]] = {}
+            for emoji, role_id in panel.mappings.items():
+                users = holders.setdefault(role_id, set())
+                reaction = reactions.get(emoji_key(emoji))
+                if reaction is not None:
+                    users.update(await self._reactors(report, reaction))
+        except discord.HTTPException:
+            return None
+        return holders
+
+    def _diff(
+        self,
+        guild: discord.Guild,
+        reacted: Dict[int, Set[int]],
+        incomplete: Set[int],
+        keep: Optional[Set[int]],
+    ) -> Dict[int, Tuple[List[discord.Role], List[discord.Role]]]:
+        # member id -> (roles to add, roles to remove). keep is None for an add-only
+        # run, else the roles never taken away (see _run).
+        fixes: Dict[int, Tuple[List[discord.Role], List[discord.Role]]] = {}
+        me = guild.me
+        for role_id, users in reacted.items():
+            role = guild.get_role(role_id)
+            if role is None or role.managed or (me is not None and role >= me.top_role):
+                continue
+            for user_id in users:
+                member = guild.get_member(user_id)
+                if member is not None and role not in member.roles:
+                    fixes.setdefault(member.id, ([], []))[0].append(role)
+            # Skipped on add-only runs, for kept roles, and when a panel for this role
+            # could not be read, since absent reactions then prove nothing.
+            if keep is None or role_id in keep or role_id in incomplete:
+                continue
+            for member in guild.members:
+                if member.id not in users and not member.bot and role in member.roles:
+                    fixes.setdefault(member.id, ([], []))[1].append(role)
+        return fixes
+
+    async def _confirm_removals(
+        self,
+        report: ReconcileReport,
+        guild: discord.Guild,
+        panels: List[ReactionRolePanel],
+        fixes: Dict[int, Tuple[List[discord.Role], List[discord.Role]]],
+    ) -> None:
+        # The scan can take minutes and members react meanwhile, so the panels
+        # behind pending removals are read again and a removal only goes ahead
+        # if the member is still not reacting.
+        roles = {role.id for _, remove in fixes.values() for role in remove}
+        if not roles:
+            return
+        current: Dict[int, Set[int]] = {}
+        unreadable: Set[int] = set()
+        for panel in panels:
+            if roles.isdisjoint(panel.mappings.values()):
+                continue
+            holders = await self._scan(report, guild, panel)
+            if holders is None:
+                unreadable.update(panel.mappings.values())
+                continue
+            for role_id, users in holders.items():
+                current.setdefault(role_id, set()).update(users)
+        for member_id, (_, remove) in fixes.items():
+            remove[:] = [
+                role for role in remove if role.id not in unreadable and member_id not in current.get(role.id, ())
+            ]
+
+    async def _apply(
+        self, report: ReconcileReport, guild: discord.Guild, fixes: Dict[int, Tuple[List[discord.Role], List[discord.Role]]]
+    ) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fix(member: discord.Member, add: List[discord.Role], remove: List[discord.Role]) -> None:
+            async with semaphore:
+                await self.write_pacer.wait()
+                result = await self.bot.role_queue.mutate(member, add=add, remove=remove, reason=RECONCILE_REASON)
+            if result.ok:
+                self.write_pacer.ok()
+                report.added += len(result.added)
+                report.removed += len(result.removed)
+            else:
+                if result.attempts > 1:
+                    self.write_pacer.backoff()
+                report.failed += len(add) + len(remove)
+
+        tasks = []
+        for member_id, (add, remove) in fixes.items():
+            member = guild.get_member(member_id)
+            if member is not None and (add or remove):
+                tasks.append(fix(member, add, remove))
+        await asyncio.gather(*tasks)
+
+    def _progress_embed(self, report: ReconcileReport, done: bool) -> discord.Embed:
+        embed = discord.Embed(
+            title="Reaction-role reconciliation" + (" finished" if done else " running"),
+            colour=discord.Colour.green() if done and not report.failed else discord.Colour.blurple(),
+        )
+        lines = [
+            f"Panels: {report.scanned}/{report.panels} scanned in {report.guilds} server(s), {report.skipped} unreadable",
+            f"Reactions read: {report.reactors} users in {report.requests} requests",
+            f"Roles fixed: +{report.added} / -{report.removed}, {report.failed} failed",
+        ]
+        eta = report.eta()
+        if done:
+            lines.append(f"Took {_format_seconds(report.seconds)}")
+        elif eta is not None:
+            lines.append(f"Elapsed {_format_seconds(report.seconds)}, about {_format_seconds(eta)} left")
+        embed.description = "\n".join(lines)
+        return embed
+
+    async def run(self, guilds: Optional[List[discord.Guild]] = None, *, remove: bool = False) -> ReconcileReport:
+        # Add-only unless remove is set: a member can hold a panel role for other
+        # reasons (a manual grant, say) without reacting.
+        if self.running:
+            raise RuntimeError("Reaction-role reconciliation is already running")
+        self.running = True
+        try:
+            return await self._run(self.bot.guilds if guilds is None else guilds, remove)
+        finally:
+            self.running = False
+
+    async def _run(self, guilds: List[discord.Guild], remove: bool) -> ReconcileReport:
+        report = ReconcileReport()
+        started = time.perf_counter()
+        work: List[Tuple[discord.Guild, List[ReactionRolePanel]]] = []
+        for guild in guilds:
+            panels = await self.bot.reaction_roles.get_panels_async(guild.id)
+            if panels:
+                work.append((guild, panels))
+                report.panels += len(panels)
+        report.guilds = len(work)
+        if not work:
+            self.last_report = report
+            return report
+        log_channel = None
+        for guild in guilds:
+            log_channel = self.bot.get_log_channel(guild)
+            if log_channel is not None:
+                break
+        progress: Optional[discord.Message] = None
+        if log_channel is not None:
+            try:
+                progress = await log_channel.send(embed=self._progress_embed(report, False))
+            except discord.HTTPException:
+                progress = None
+        last_update = time.perf_counter()
+
+        async def update(done: bool) -> None:
+            nonlocal last_update
+            now = time.perf_counter()
+            report.seconds = now - started
+            if progress is None or (not done and now - last_update < self.progress_interval):
+                return
+            last_update = now
+            try:
+                await progress.edit(embed=self._progress_embed(report, done))
+            except discord.HTTPException:
+                pass
+
+        for guild, panels in work:
+            if not getattr(guild, "chunked", True):
+                await guild.chunk()
+            reacted: Dict[int, Set[int]] = {}
+            incomplete: Set[int] = set()
+            for panel in panels:
+                holders = await self._scan(report, guild, panel)
+                if holders is None:
+                    report.skipped += 1
+                    incomplete.update(panel.mappings.values())
+                else:
+                    report.scanned += 1
+                    for role_id, users in holders.items():
+                        reacted.setdefault(role_id, set()).update(users)
+                        report.reactors += len(users)
+                await update(False)
+            keep: Optional[Set[int]] = None
+            if remove:
+                # Auto roles (join, verify) are handed out without a reaction.
+                keep = set((await self.bot.auto_roles.all_triggers_async(guild.id)).values())
+            fixes = self._diff(guild, reacted, incomplete, keep)
+            if remove:
+                await self._confirm_removals(report, guild, panels, fixes)
+            await self._apply(report, guild, fixes)
+            await update(False)
+        await update(True)
+        self.last_report = report
+        return report
+
+
+async def _collect(iterator: Any) -> List[Any]:
+    return [item async for item in iterator]
@@ -1,37 +1,228 @@
-from typing import Dict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+import re
+import threading
 
+import discord
+
+from services.cache import ConfigCache
 from services.database import Database
 
 
+VARIATION_SELECTORS = frozenset("\ufe0e\ufe0f")
+# <:name:id>, <a:name:id>, name:id or a bare id.
+_CUSTOM_EMOJI = re.compile(r"<a?:\w+:(\d+)>|\w+:(\d+)|(\d{15,})")
+
+
+def emoji_key(emoji: Union[str, discord.PartialEmoji, discord.Emoji]) -> str:
+    # Custom emoji match by id whatever name they were stored under; unicode emoji
+    # by code point, ignoring the variation selectors clients add or drop.
+    if isinstance(emoji, (discord.PartialEmoji, discord.Emoji)):
+        if emoji.id is not None:
+            return str(emoji.id)
+        text = emoji.name or ""
+    else:
+        text = emoji.strip()
+        match = _CUSTOM_EMOJI.fullmatch(text)
+        if match is not None:
+            return next(group for group in match.groups() if group)
+    return "-".join(f"{ord(char):x}" for char in text if char not in VARIATION_SELECTORS)
+
+
+def _stored_order(row: Any) -> Tuple[int, int]:
+    # Mappings of a message in the order they were added (rowid; an update keeps
+    # its row), which is the order a panel's reactions are placed in. Sorted in
+    # Python because the primary-key index walks a guild's rows by emoji.
+    return int(row["message_id"]), int(row["rowid"])
+
+
+@dataclass
+class ReactionRolePanel:
+    guild_id: int
+    message_id: int
+    channel_id: Optional[int]
+    # stored emoji -> role id
+    mappings: Dict[str, int]
+
+
+class ReactionRoleIndex:
+    # message id -> (guild id, emoji key -> role id) for every configured message.
+    # Readers on the event loop never lock: writers build a new inner dict and
+    # swap it in, so a reader sees either the old or the new mapping.
+    def __init__(self) -> None:
+        self._messages: Dict[int, Tuple[int, Dict[str, int]]] = {}
+        self._lock = threading.Lock()
+        # Bumped on every write; a load that overlapped one is redone.
+        self._version = 0
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def role_for(self, guild_id: int, message_id: int, emoji: Union[str, discord.PartialEmoji]) -> Optional[int]:
+        entry = self._messages.get(message_id)
+        if entry is None or entry[0] != guild_id:
+            return None
+        return entry[1].get(emoji_key(emoji))
+
+    def set(self, guild_id: int, message_id: int, emoji: str, role_id: int) -> None:
+        with self._lock:
+            self._version += 1
+            entry = self._messages.get(message_id)
+            mapping = dict(entry[1]) if entry is not None and entry[0] == guild_id else {}
+            mapping[emoji_key(emoji)] = role_id
+            self._messages[message_id] = (guild_id, mapping)
+
+    def discard(self, guild_id: int, message_id: int, emoji: Optional[str] = None) -> None:
+        with self._lock:
+            self._version += 1
+            entry = self._messages.get(message_id)
+            if entry is None or entry[0] != guild_id:
+                return
+            key = None if emoji is None else emoji_key(emoji)
+            mapping = {} if key is None else {k: v for k, v in entry[1].items() if k != key}
+            if mapping:
+                self._messages[message_id] = (guild_id, mapping)
+            else:
+                del self._messages[message_id]
+
+    def version(self) -> int:
+        with self._lock:
+            return self._version
+
+    def replace(self, messages: Dict[int, Tuple[int, Dict[str, int]]], version: int) -> bool:
+        with self._lock:
+            if version != self._version:
+                return False
+            self._messages = messages
+            return True
+
+
 class ReactionRoleStore:
-    def __init__(self, db: Database) -> None:
+    def __init__(self, db: Database, cache: Optional[ConfigCache] = None) -> None:
         self._db = db
+        self._cache = cache or ConfigCache()
+        self.index = ReactionRoleIndex()
+
+    def _load_guild(self, guild_id: int) -> Dict[int, Dict[str, int]]:
+        rows = self._db.for_guild(guild_id).query_all(
+            "SELECT rowid, message_id, emoji, role_id FROM reaction_roles WHERE guild_id = ?",
+            (guild_id,),
+        )
+        mappings: Dict[int, Dict[str, int]] = {}
+        for row in sorted(rows, key=_stored_order):
+            mappings.setdefault(int(row["message_id"]), {})[str(row["emoji"])] = int(row["role_id"])
+        return mappings
 
-    def set_mapping(self, guild_id: int, message_id: int, emoji: str, role_id: int) -> None:
-        self._db.execute(
+    def _written(self, guild_id: int) -> None:
+        # Commit before dropping the entry so the next load cannot read the old row.
+        self._db.for_guild(guild_id).flush()
+        self._cache.invalidate(("reaction_roles", guild_id))
+
+    def load(self) -> int:
+        # Builds the reaction index from every guild's rows; returns the number of messages.
+        while True:
+            version = self.index.version()
+            messages: Dict[int, Tuple[int, Dict[str, int]]] = {}
+            for db in self._db.guild_databases():
+                for row in db.query_all("SELECT guild_id, message_id, emoji, role_id FROM reaction_roles"):
+                    _, mapping = messages.setdefault(int(row["message_id"]), (int(row["guild_id"]), {}))
+                    mapping[emoji_key(str(row["emoji"]))] = int(row["role_id"])
+            if self.index.replace(messages, version):
+                return len(messages)
+
+    def set_mapping(
+        self, guild_id: int, message_id: int, emoji: str, role_id: int, channel_id: Optional[int] = None
+    ) -> None:
+        self._db.for_guild(guild_id).execute(
             """
-            INSERT INTO reaction_roles (guild_id, message_id, emoji, role_id)
-            VALUES (?, ?, ?, ?)
-            ON CONFLICT(guild_id, message_id, emoji) DO UPDATE SET role_id = excluded.role_id
+            INSERT INTO reaction_roles (guild_id, message_id, emoji, role_id, channel_id)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(guild_id, message_id, emoji) DO UPDATE SET
+                role_id = excluded.role_id,
+                channel_id = COALESCE(excluded.channel_id, channel_id)
             """,
-            (guild_id, message_id, emoji, role_id),
+            (guild_id, message_id, emoji, role_id, channel_id),
         )
+        self._written(guild_id)
+        self.index.set(guild_id, message_id, emoji, role_id)
+
+    def set_channel(self, guild_id: int, message_id: int, channel_id: int) -> None:
+        self._db.for_guild(guild_id).execute(
+            "UPDATE reaction_roles SET channel_id = ? WHERE guild_id = ? AND message_id = ?",
+            (channel_id, guild_id, message_id),
+        )
+        self._written(guild_id)
 
     def clear_message(self, guild_id: int, message_id: int) -> None:
-        self._db.execute(
+        self._db.for_guild(guild_id).execute(
             "DELETE FROM reaction_roles WHERE guild_id = ? AND message_id = ?",
             (guild_id, message_id),
         )
+        self._written(guild_id)
+        self.index.discard(guild_id, message_id)
 
     def clear_mapping(self, guild_id: int, message_id: int, emoji: str) -> None:
-        self._db.execute(
+        self._db.for_guild(guild_id).execute(
             "DELETE FROM reaction_roles WHERE guild_id = ? AND message_id = ? AND emoji = ?",
             (guild_id, message_id, emoji),
-            )
+        )
+        self._written(guild_id)
+        self.index.discard(guild_id, message_id, emoji)
 
     def get_mappings_for_message(self, guild_id: int, message_id: int) -> Dict[str, int]:
-        rows = self._db.query_all(
-            "SELECT emoji, role_id FROM reaction_roles WHERE guild_id = ? AND message_id = ?",
-            (guild_id, message_id),
+        mappings = self._cache.get(("reaction_roles", guild_id), lambda: self._load_guild(guild_id))
+        return dict(mappings.get(message_id, {}))
+
+    def get_panels(self, guild_id: int) -> List[ReactionRolePanel]:
+        rows = self._db.for_guild(guild_id).query_all(
+            """
+            SELECT rowid, message_id, channel_id, emoji, role_id FROM reaction_roles
+            WHERE guild_id = ?
+            """,
+            (guild_id,),
+        )
+        panels: Dict[int, ReactionRolePanel] = {}
+        for row in sorted(rows, key=_stored_order):
+            message_id = int(row["message_id"])
+            panel = panels.get(message_id)
+            if panel is None:
+                panel = panels[message_id] = ReactionRolePanel(guild_id, message_id, None, {})
+            if row["channel_id"] is not None:
+                panel.channel_id = int(row["channel_id"])
+            panel.mappings[str(row["emoji"])] = int(row["role_id"])
+        return list(panels.values())
+
+    def role_for_reaction(
+        self, guild_id: int, message_id: int, emoji: Union[str, discord.PartialEmoji]
+    ) -> Optional[int]:
+        # The reaction hot path: answered from the index, never from SQLite, so
+        # reactions on ordinary messages cost one dict lookup.
+        return self.index.role_for(guild_id, message_id, emoji)
+
+    async def load_async(self) -> int:
+        return await self._db.run_read(self.load)
+
+    async def set_mapping_async(
+        self, guild_id: int, message_id: int, emoji: str, role_id: int, channel_id: Optional[int] = None
+    ) -> None:
+        await self._db.for_guild(guild_id).run(self.set_mapping, guild_id, message_id, emoji, role_id, channel_id)
+
+    async def set_channel_async(self, guild_id: int, message_id: int, channel_id: int) -> None:
+        await self._db.for_guild(guild_id).run(self.set_channel, guild_id, message_id, channel_id)
+
+    async def get_panels_async(self, guild_id: int) -> List[ReactionRolePanel]:
+        return await self._db.for_guild(guild_id).run_read(self.get_panels, guild_id)
+
+    async def clear_message_async(self, guild_id: int, message_id: int) -> None:
+        await self._db.for_guild(guild_id).run(self.clear_message, guild_id, message_id)
+
+    async def clear_mapping_async(self, guild_id: int, message_id: int, emoji: str) -> None:
+        await self._db.for_guild(guild_id).run(self.clear_mapping, guild_id, message_id, emoji)
+
+    async def get_mappings_for_message_async(self, guild_id: int, message_id: int) -> Dict[str, int]:
+        mappings = await self._cache.get_async(
+            ("reaction_roles", guild_id),
+            lambda: self._load_guild(guild_id),
+            self._db.for_guild(guild_id),
         )
-        return {str(row["emoji"]): int(row["role_id"]) for row in rows}
+        return dict(mappings.get(message_id, {}))
@@ -0,0 +1,69 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import asyncio
+
+import discord
+
+from services.pacing import RatePacer
+from services.reaction_roles import emoji_key
+
+
+# Discord allows roughly four reaction changes per second per channel.
+REACTION_RATE = 4.0
+
+
+@dataclass
+class EmojiSyncResult:
+    emoji: str
+    # "added", "present", "removed" (a bot reaction with no mapping) or "failed"
+    action: str
+    error: Optional[str] = None
+
+
+class ReactionSyncEngine:
+    def __init__(self, *, rate: float = REACTION_RATE, max_attempts: int = 5) -> None:
+        self.rate = rate
+        self.max_attempts = max(1, max_attempts)
+        # The reaction routes are limited per channel, so syncs of different
+        # panels in one channel share a pacer and other channels run in parallel.
+        self._pacers: Dict[int, RatePacer] = {}
+
+    def pacer(self, channel_id: int) -> RatePacer:
+        pacer = self._pacers.get(channel_id)
+        if pacer is None:
+            pacer = self._pacers[channel_id] = RatePacer(self.rate)
+        return pacer
+
+    async def sync(self, message: discord.Message, mappings: Dict[str, int]) -> List[EmojiSyncResult]:
+        pacer = self.pacer(message.channel.id)
+        present = {emoji_key(reaction.emoji): reaction for reaction in message.reactions}
+        wanted = {emoji_key(emoji) for emoji in mappings}
+        results: List[EmojiSyncResult] = []
+
+        async def remove(reaction: discord.Reaction) -> EmojiSyncResult:
+            try:
+                await pacer.call(
+                    lambda: message.remove_reaction(reaction.emoji, message.guild.me),  # type: ignore[arg-type]
+                    max_attempts=self.max_attempts,
+                )
+            except discord.HTTPException as exc:
+                return EmojiSyncResult(str(reaction.emoji), "failed", exc.text or str(exc))
+            return EmojiSyncResult(str(reaction.emoji), "removed")
+
+        stale = [reaction for key, reaction in present.items() if reaction.me and key not in wanted]
+        removals = asyncio.gather(*(remove(reaction) for reaction in stale))
+        # Additions stay sequential, in the mapping's stored order: Discord shows
+        # reactions in the order they were added.
+        for emoji in mappings:
+            reaction = present.get(emoji_key(emoji))
+            if reaction is not None and reaction.me:
+                results.append(EmojiSyncResult(emoji, "present"))
+                continue
+            try:
+                await pacer.call(lambda: message.add_reaction(emoji), max_attempts=self.max_attempts)
+            except discord.HTTPException as exc:
+                results.append(EmojiSyncResult(emoji, "failed", exc.text or str(exc)))
+                continue
+            results.append(EmojiSyncResult(emoji, "added"))
+        results.extend(await removals)
+        return results
@@ -0,0 +1,255 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import datetime
+import re
+
+from services.database import Database, from_epoch_ms, to_epoch_ms
+
+
+ARCHIVE_ALIAS = "archive"
+ARCHIVE_COLUMNS: Dict[str, List[str]] = {
+    "punishments": [
+        "id", "guild_id", "user_id", "moderator_id", "action", "reason",
+        "created_at", "expires_at", "created_ms", "expires_ms",
+    ],
+    "notes": ["id", "guild_id", "user_id", "moderator_id", "text", "created_at", "created_ms"],
+}
+ARCHIVE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS archive.punishments (
+        id INTEGER PRIMARY KEY,
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        moderator_id INTEGER NOT NULL,
+        action TEXT NOT NULL,
+        reason TEXT,
+        created_at TEXT NOT NULL,
+        expires_at TEXT,
+        created_ms INTEGER,
+        expires_ms INTEGER
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS archive.notes (
+        id INTEGER PRIMARY KEY,
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        moderator_id INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        created_ms INTEGER
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS archive.idx_punishments_guild_created ON punishments (guild_id, created_ms)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_punishments_guild_user_created ON punishments (guild_id, user_id, created_ms)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_notes_guild_created ON notes (guild_id, created_ms)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_notes_guild_user_created ON notes (guild_id, user_id, created_ms)",
+]
+_ARCHIVE_NAME = re.compile(r"^history-(\d{4})\.db$")
+DAY_MS = 86_400_000
+
+
+@dataclass
+class RetentionPolicy:
+    guild_id: int
+    archive_after_days: int
+    purge_after_days: Optional[int]
+
+
+@dataclass
+class RetentionReport:
+    archived: int = 0
+    purged: int = 0
+    vacuumed_pages: int = 0
+
+
+def archive_path(archive_dir: Path, year: int) -> Path:
+    return archive_dir / f"history-{year:04d}.db"
+
+
+def archive_files(archive_dir: Path) -> List[Tuple[int, Path]]:
+    # Newest period first, which is the order history lookups want.
+    if not archive_dir.is_dir():
+        return []
+    found = []
+    for path in archive_dir.iterdir():
+        match = _ARCHIVE_NAME.match(path.name)
+        if match:
+            found.append((int(match.group(1)), path))
+    return sorted(found, reverse=True)
+
+
+def guild_archive_dir(archive_dir: Path, db: Database) -> Path:
+    # Shards number their rows independently, so each one archives into its own
+    # directory to keep preserved ids unique within an archive file.
+    if db.guild_id is None:
+        return archive_dir
+    return archive_dir / f"guild-{db.guild_id}"
+
+
+def guild_archive_files(archive_dir: Path, db: Database) -> List[Tuple[int, Path]]:
+    found = archive_files(archive_dir)
+    if db.guild_id is not None:
+        # Rows archived before sharding was enabled stay in the shared directory.
+        found = sorted(found + archive_files(guild_archive_dir(archive_dir, db)), reverse=True)
+    return found
+
+
+class RetentionService:
+    def __init__(self, db: Database, archive_dir: Path) -> None:
+        self._db = db
+        self.archive_dir = archive_dir
+        self.chunk_size = 2000
+        self.vacuum_pages = 1000
+        self.sweep_interval = 6 * 3600
+
+    def _row_to_policy(self, row) -> RetentionPolicy:
+        return RetentionPolicy(
+            guild_id=row["guild_id"],
+            archive_after_days=row["archive_after_days"],
+            purge_after_days=row["purge_after_days"],
+        )
+
+    def set_policy(self, policy: RetentionPolicy) -> None:
+        self._db.execute(
+            """
+            INSERT INTO retention_policies (guild_id, archive_after_days, purge_after_days)
+            VALUES (?, ?, ?)
+            ON CONFLICT(guild_id) DO UPDATE SET
+                archive_after_days = excluded.archive_after_days,
+                purge_after_days = excluded.purge_after_days
+            """,
+            (policy.guild_id, policy.archive_after_days, policy.purge_after_days),
+        )
+
+    def get_policy(self, guild_id: int) -> Optional[RetentionPolicy]:
+        row = self._db.query_one("SELECT * FROM retention_policies WHERE guild_id = ?", (guild_id,))
+        if row is None:
+            return None
+        return self._row_to_policy(row)
+
+    def clear_policy(self, guild_id: int) -> None:
+        self._db.execute("DELETE FROM retention_policies WHERE guild_id = ?", (guild_id,))
+
+    def all_policies(self) -> List[RetentionPolicy]:
+        rows = self._db.query_all("SELECT * FROM retention_policies")
+        return [self._row_to_policy(row) for row in rows]
+
+    def archive_chunk(self, policy: RetentionPolicy, table: str, now_ms: int) -> int:
+        db = self._db.for_guild(policy.guild_id)
+        cutoff_ms = now_ms - policy.archive_after_days * DAY_MS
+        rows = db.query_all(
+            f"""
+            SELECT id, created_ms FROM {table}
+            WHERE guild_id = ? AND created_ms < ?
+            ORDER BY created_ms ASC, id ASC
+            LIMIT ?
+            """,
+            (policy.guild_id, cutoff_ms, self.chunk_size),
+        )
+        by_year: Dict[int, List[int]] = {}
+        for row in rows:
+            by_year.setdefault(from_epoch_ms(row["created_ms"]).year, []).append(row["id"])
+        columns = ", ".join(ARCHIVE_COLUMNS[table])
+        target_dir = guild_archive_dir(self.archive_dir, db)
+        target_dir.mkdir(parents=True, exist_ok=True)
+        for year, ids in by_year.items():
+            marks = ", ".join("?" for _ in ids)
+            with db.attached(archive_path(target_dir, year), ARCHIVE_ALIAS):
+                # Copy and delete commit separately: WAL commits are not atomic across
+                # files, and INSERT OR IGNORE on the preserved id makes a retry after a
+                # crash between the two harmless.
+                with db.transaction() as tx:
+                    for statement in ARCHIVE_SCHEMA:
+                        tx.execute(statement)
+                    tx.execute(
+                        f"INSERT OR IGNORE INTO archive.{table} ({columns}) "
+                        f"SELECT {columns} FROM main.{table} WHERE id IN ({marks})",
+                        ids,
+                    )
+                with db.transaction() as tx:
+                    tx.execute(f"DELETE FROM main.{table} WHERE id IN ({marks})", ids)
+        return len(rows)
+
+    def purge(self, policy: RetentionPolicy, now_ms: int) -> int:
+        if policy.purge_after_days is None:
+            return 0
+        cutoff_ms = now_ms - policy.purge_after_days * DAY_MS
+        cutoff_year = from_epoch_ms(cutoff_ms).year
+        db = self._db.for_guild(policy.guild_id)
+        purged = 0
+        for year, path in guild_archive_files(self.archive_dir, db):
+            if year > cutoff_year:
+                continue
+            with db.attached(path, ARCHIVE_ALIAS):
+                with db.transaction() as tx:
+                    for table in ARCHIVE_COLUMNS:
+                        cur = tx.execute(
+                            f"DELETE FROM archive.{table} WHERE guild_id = ? AND created_ms < ?",
+                            (policy.guild_id, cutoff_ms),
+                        )
+                        purged += max(cur.rowcount, 0)
+        return purged
+
+    def _touched(self, policies: List[RetentionPolicy]) -> List[Database]:
+        # With a sharded database each policy's rows live in their own file.
+        touched: List[Database] = []
+        for policy in policies:
+            db = self._db.for_guild(policy.guild_id)
+            if all(db is not seen for seen in touched):
+                touched.append(db)
+        return touched
+
+    def sweep(self, guild_id: Optional[int] = None) -> RetentionReport:
+        # Every guild's policy, or only guild_id's.
+        report = RetentionReport()
+        policies = [p for p in self.all_policies() if guild_id is None or p.guild_id == guild_id]
+        if not policies:
+            return report
+        now_ms = to_epoch_ms(datetime.datetime.utcnow())
+        for policy in policies:
+            for table in ARCHIVE_COLUMNS:
+                while True:
+                    moved = self.archive_chunk(policy, table, now_ms)
+                    report.archived += moved
+                    if moved < self.chunk_size:
+                        break
+            report.purged += self.purge(policy, now_ms)
+        # Files still on auto_vacuum=NONE reclaim nothing here; converting them
+        # needs a full VACUUM, which is left to /retention compact.
+        for db in self._touched(policies):
+            report.vacuumed_pages += db.incremental_vacuum(self.vacuum_pages)
+        return report
+
+    async def sweep_async(self, guild_id: Optional[int] = None) -> RetentionReport:
+        # Same steps as sweep(), but each chunk is its own writer job so regular
+        # writes interleave with a large backlog instead of queueing behind it.
+        report = RetentionReport()
+        policies = [p for p in await self.all_policies_async() if guild_id is None or p.guild_id == guild_id]
+        if not policies:
+            return report
+        now_ms = to_epoch_ms(datetime.datetime.utcnow())
+        for policy in policies:
+            for table in ARCHIVE_COLUMNS:
+                while True:
+                    moved = await self._db.for_guild(policy.guild_id).run(self.archive_chunk, policy, table, now_ms)
+                    report.archived += moved
+                    if moved < self.chunk_size:
+                        break
+            report.purged += await self._db.for_guild(policy.guild_id).run(self.purge, policy, now_ms)
+        for db in self._touched(policies):
+            report.vacuumed_pages += await db.run(db.incremental_vacuum, self.vacuum_pages)
+        return report
+
+    async def set_policy_async(self, policy: RetentionPolicy) -> None:
+        await self._db.run(self.set_policy, policy)
+
+    async def get_policy_async(self, guild_id: int) -> Optional[RetentionPolicy]:
+        return await self._db.run_read(self.get_policy, guild_id)
+
+    async def clear_policy_async(self, guild_id: int) -> None:
+        await self._db.run(self.clear_policy, guild_id)
+
+    async def all_policies_async(self) -> List[RetentionPolicy]:
+        return await self._db.run_read(self.all_policies)
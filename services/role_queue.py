@@ -0,0 +1,165 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import asyncio
+
+import discord
+
+from services.pacing import retry_after_seconds
+
+
+# Audit log reasons longer than this are rejected by Discord.
+MAX_REASON_LENGTH = 512
+
+
+@dataclass
+class RoleMutationResult:
+    ok: bool
+    added: List[int] = field(default_factory=list)
+    removed: List[int] = field(default_factory=list)
+    attempts: int = 0
+    merged: int = 1
+    error: Optional[str] = None
+
+
+class _Batch:
+    __slots__ = ("member", "changes", "reasons", "waiters")
+
+    def __init__(self, member: discord.Member) -> None:
+        self.member = member
+        # role id -> True to add, False to remove; the latest request for a role wins.
+        self.changes: Dict[int, bool] = {}
+        self.reasons: List[str] = []
+        self.waiters: List[asyncio.Future] = []
+
+    def reason(self) -> Optional[str]:
+        if not self.reasons:
+            return None
+        return "; ".join(dict.fromkeys(self.reasons))[:MAX_REASON_LENGTH]
+
+
+class RoleMutationQueue:
+    def __init__(
+        self,
+        *,
+        window: float = 0.25,
+        max_attempts: int = 5,
+        max_retry_delay: float = 30.0,
+        settle: float = 10.0,
+    ) -> None:
+        self.window = window
+        self.max_attempts = max(1, max_attempts)
+        self.max_retry_delay = max_retry_delay
+        self.settle = settle
+        self._pending: Dict[Tuple[int, int], _Batch] = {}
+        # One edit in flight per member; later batches wait behind it.
+        self._locks: Dict[Tuple[int, int], asyncio.Lock] = {}
+        # Changes this queue made recently. The gateway's member update can reach
+        # the cache after the next batch is built, so these are laid over the
+        # cached roles to keep that batch from undoing them.
+        self._applied: Dict[Tuple[int, int], Tuple[Dict[int, bool], float]] = {}
+        self.requests = 0
+        self.mutations = 0
+        self.rate_limited = 0
+
+    async def add(self, member: discord.Member, role: discord.abc.Snowflake, *, reason: Optional[str] = None) -> RoleMutationResult:
+        return await self.mutate(member, add=[role], reason=reason)
+
+    async def remove(self, member: discord.Member, role: discord.abc.Snowflake, *, reason: Optional[str] = None) -> RoleMutationResult:
+        return await self.mutate(member, remove=[role], reason=reason)
+
+    async def mutate(
+        self,
+        member: discord.Member,
+        *,
+        add: Sequence[discord.abc.Snowflake] = (),
+        remove: Sequence[discord.abc.Snowflake] = (),
+        reason: Optional[str] = None,
+    ) -> RoleMutationResult:
+        key = (member.guild.id, member.id)
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = _Batch(member)
+            self._pending[key] = batch
+            asyncio.get_running_loop().create_task(self._flush(key, batch))
+        for role in add:
+            batch.changes[role.id] = True
+        for role in remove:
+            batch.changes[role.id] = False
+        if reason:
+            batch.reasons.append(reason)
+        self.mutations += 1
+        waiter = asyncio.get_running_loop().create_future()
+        batch.waiters.append(waiter)
+        return await waiter
+
+    async def _flush(self, key: Tuple[int, int], batch: _Batch) -> None:
+        await asyncio.sleep(self.window)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Requests keep merging into the batch until its turn comes.
+            if self._pending.get(key) is batch:
+                del self._pending[key]
+            try:
+                result = await self._apply(key, batch)
+            except Exception as exc:
+                result = RoleMutationResult(ok=False, error=str(exc) or type(exc).__name__)
+        if key not in self._pending:
+            self._locks.pop(key, None)
+        result.merged = len(batch.waiters)
+        for waiter in batch.waiters:
+            if not waiter.done():
+                waiter.set_result(result)
+
+    def _current_roles(self, key: Tuple[int, int], member: discord.Member) -> Set[int]:
+        roles = {role.id for role in member.roles if not role.is_default()}
+        applied = self._applied.get(key)
+        if applied is not None:
+            if asyncio.get_running_loop().time() - applied[1] >= self.settle:
+                del self._applied[key]
+            else:
+                for role_id, wanted in applied[0].items():
+                    if wanted:
+                        roles.add(role_id)
+                    else:
+                        roles.discard(role_id)
+        return roles
+
+    def _remember(self, key: Tuple[int, int], changes: Dict[int, bool]) -> None:
+        now = asyncio.get_running_loop().time()
+        previous = self._applied.get(key)
+        merged = dict(previous[0]) if previous is not None and now - previous[1] < self.settle else {}
+        merged.update(changes)
+        self._applied[key] = (merged, now)
+        if len(self._applied) > 1024:
+            for stale in [k for k, (_, at) in self._applied.items() if now - at >= self.settle]:
+                del self._applied[stale]
+
+    async def _apply(self, key: Tuple[int, int], batch: _Batch) -> RoleMutationResult:
+        guild = batch.member.guild
+        attempts = 0
+        while True:
+            member = guild.get_member(batch.member.id) or batch.member
+            current = self._current_roles(key, member)
+            added = [role_id for role_id, wanted in batch.changes.items() if wanted and role_id not in current]
+            removed = [role_id for role_id, wanted in batch.changes.items() if not wanted and role_id in current]
+            if not added and not removed:
+                return RoleMutationResult(ok=True, attempts=attempts)
+            roles = (current - set(removed)) | set(added)
+            attempts += 1
+            self.requests += 1
+            try:
+                await member.edit(roles=[discord.Object(id=role_id) for role_id in roles], reason=batch.reason())
+            except discord.RateLimited as exc:
+                delay = exc.retry_after
+            except discord.HTTPException as exc:
+                if exc.status != 429:
+                    return RoleMutationResult(ok=False, attempts=attempts, error=exc.text or str(exc))
+                delay = retry_after_seconds(exc)
+            else:
+                self._remember(key, batch.changes)
+                return RoleMutationResult(ok=True, added=added, removed=removed, attempts=attempts)
+            self.rate_limited += 1
+            if attempts >= self.max_attempts:
+                return RoleMutationResult(ok=False, attempts=attempts, error="rate limited")
+            await asyncio.sleep(min(delay, self.max_retry_delay))
+
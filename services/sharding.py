@@ -0,0 +1,260 @@
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+import contextlib
+import threading
+import time
+
+from services.database import Database, Transaction
+from services.metrics import DatabaseMetrics
+from services.migrations import pending_backfills, run_backfill_chunk
+
+
+# Tables whose rows belong to exactly one guild. They live in per-guild shard
+# files; everything else (tickets, incidents, staff whitelist, retention
+# policies) stays in the catalog database.
+SHARDED_TABLES = (
+    "punishments",
+    "notes",
+    "jails",
+    "reaction_roles",
+    "auto_roles",
+    "ticket_config",
+    "ticket_transcripts",
+)
+SHARD_ALIAS = "shard"
+# An open shard not used for this long (and with no jobs in flight) may be
+# closed once more than max_open_shards are open.
+SHARD_IDLE_SECONDS = 30.0
+
+
+def _data_columns(columns: List[str], keys: List[str]) -> List[str]:
+    # A surrogate id is not part of a row's content: shard and catalog number rows independently.
+    return [c for c in columns if c != "id"] if keys == ["id"] else columns
+
+
+class ShardedDatabase(Database):
+    def __init__(
+        self,
+        path: Path,
+        shard_dir: Path,
+        *,
+        group_commit_window: float = 0.0,
+        group_commit_max: int = 100,
+        read_pool_size: int = 4,
+        shard_read_pool_size: int = 2,
+        max_open_shards: int = 256,
+        metrics: Optional[DatabaseMetrics] = None,
+    ) -> None:
+        super().__init__(
+            path,
+            group_commit_window=group_commit_window,
+            group_commit_max=group_commit_max,
+            read_pool_size=read_pool_size,
+            metrics=metrics,
+        )
+        self.shard_dir = shard_dir
+        self.shard_read_pool_size = shard_read_pool_size
+        # Each open shard holds a writer connection and, once used, its executor
+        # threads; least recently used idle shards are closed beyond this many.
+        self.max_open_shards = max(1, max_open_shards)
+        self._shards: Dict[int, Database] = {}
+        self._shards_lock = threading.Lock()
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+        self._split_catalog()
+
+    def shard_path(self, guild_id: int) -> Path:
+        return self.shard_dir / f"guild-{guild_id}.db"
+
+    def for_guild(self, guild_id: int) -> Database:
+        shard = self._shards.get(guild_id)
+        if shard is not None:
+            shard.last_used = time.monotonic()
+            return shard
+        evicted: List[Database] = []
+        with self._shards_lock:
+            shard = self._shards.get(guild_id)
+            if shard is None:
+                # Every shard carries the full schema so the stores' SQL runs unchanged;
+                # each one has its own writer lock, WAL and reader pool.
+                shard = Database(
+                    self.shard_path(guild_id),
+                    group_commit_window=self.group_commit_window,
+                    group_commit_max=self.group_commit_max,
+                    read_pool_size=self.shard_read_pool_size,
+                    metrics=self.metrics,
+                )
+                shard.guild_id = guild_id
+                self._shards[guild_id] = shard
+                evicted = self._idle_shards_locked()
+            shard.last_used = time.monotonic()
+        for idle in evicted:
+            idle.close()
+        return shard
+
+    def _idle_shards_locked(self) -> List[Database]:
+        # Removes (for the caller to close) the least recently used shards beyond
+        # max_open_shards that have been idle for SHARD_IDLE_SECONDS. Recently used
+        # ones may still be referenced by a caller between two awaits.
+        excess = len(self._shards) - self.max_open_shards
+        if excess <= 0:
+            return []
+        cutoff = time.monotonic() - SHARD_IDLE_SECONDS
+        idle = sorted(
+            (item for item in self._shards.items() if not item[1].busy and item[1].last_used < cutoff),
+            key=lambda item: item[1].last_used,
+        )[:excess]
+        for guild_id, _ in idle:
+            del self._shards[guild_id]
+        return [shard for _, shard in idle]
+
+    @contextlib.contextmanager
+    def _borrowed(self, guild_id: int) -> Iterator[Database]:
+        # For whole-bot passes: a shard that was not open is closed again afterwards
+        # unless something else asked for it meanwhile, so a pass over thousands of
+        # guilds never holds them all open.
+        opened = guild_id not in self._shards
+        shard = self.for_guild(guild_id)
+        handed_out = shard.last_used
+        try:
+            yield shard
+        finally:
+            if opened and shard.last_used == handed_out and not shard.busy:
+                with self._shards_lock:
+                    mine = self._shards.get(guild_id) is shard
+                    if mine:
+                        del self._shards[guild_id]
+                if mine:
+                    shard.close()
+
+    def storage_files(self) -> List[Tuple[str, Path]]:
+        files = super().storage_files()
+        for path in sorted(self.shard_dir.glob("guild-*.db")):
+            files.append((f"{self.shard_dir.name}/{path.name}", path))
+        return files
+
+    def guild_ids(self) -> List[int]:
+        # Every guild with a shard on disk, without opening any of them.
+        prefix = len("guild-")
+        return sorted(int(path.stem[prefix:]) for path in self.shard_dir.glob("guild-*.db"))
+
+    def guild_databases(self) -> Iterator[Database]:
+        # Every shard on disk, one at a time; see _borrowed.
+        for guild_id in self.guild_ids():
+            with self._borrowed(guild_id) as shard:
+                yield shard
+
+    def shard_ids(self) -> List[int]:
+        # Guilds whose shard is open right now.
+        with self._shards_lock:
+            return sorted(self._shards)
+
+    def _split_catalog(self) -> None:
+        # Rows written while sharding was off (or by an older version) still sit
+        # in the catalog; move each guild's rows into its shard once at startup.
+        guild_ids = set()
+        for table in SHARDED_TABLES:
+            rows = self.query_all(f"SELECT DISTINCT guild_id FROM {table}")
+            guild_ids.update(int(row["guild_id"]) for row in rows)
+        if not guild_ids:
+            return
+        # Shards only run their own backfills, so finish the catalog's first.
+        self.flush()
+        with self._locked():
+            backfills = pending_backfills(self._conn)
+        for migration in backfills:
+            while True:
+                with self.transaction() as tx:
+                    if not run_backfill_chunk(tx, migration, self.backfill_chunk_size):
+                        break
+            self._backfilling.discard(migration.version)
+        for guild_id in sorted(guild_ids):
+            with self._borrowed(guild_id) as shard:
+                self._move_to_shard(guild_id, shard)
+
+    def _table_columns(self, table: str) -> Tuple[List[str], List[str]]:
+        # (columns, primary-key columns) of a catalog table.
+        rows = self.query_all(f"PRAGMA main.table_info({table})")
+        return [row["name"] for row in rows], [row["name"] for row in rows if row["pk"]]
+
+    def move_guild_from_catalog(self, guild_id: int) -> None:
+        self._move_to_shard(guild_id, self.for_guild(guild_id))
+
+    def _move_to_shard(self, guild_id: int, shard: Database) -> None:
+        layouts = {table: self._table_columns(table) for table in SHARDED_TABLES}
+        with self.attached(shard.path, SHARD_ALIAS):
+            # Copy and delete commit separately, as in the retention sweep, so each
+            # step is safe to repeat: a catalog row is only deleted once an
+            # identical row exists in the shard.
+            with self.transaction() as tx:
+                for table, (columns, keys) in layouts.items():
+                    self._copy_to_shard(tx, guild_id, table, columns, keys)
+            with self.transaction() as tx:
+                for table, (columns, keys) in layouts.items():
+                    same = " AND ".join(f"s.{c} IS m.{c}" for c in _data_columns(columns, keys))
+                    tx.execute(
+                        f"""
+                        DELETE FROM main.{table} AS m
+                        WHERE m.guild_id = ? AND EXISTS (SELECT 1 FROM {SHARD_ALIAS}.{table} AS s WHERE {same})
+                        """,
+                        (guild_id,),
+                    )
+                    left = tx.query_one(f"SELECT COUNT(*) AS n FROM main.{table} WHERE guild_id = ?", (guild_id,))
+                    if left is not None and left["n"]:
+                        print(f"Sharding: {left['n']} {table} row(s) of guild {guild_id} did not reach the shard; kept in the catalog")
+
+    def _copy_to_shard(self, tx: Transaction, guild_id: int, table: str, columns: List[str], keys: List[str]) -> None:
+        if keys == ["id"]:
+            # The shard hands out its own AUTOINCREMENT ids, so catalog ids may
+            # already be taken there; copy without them and skip rows already copied.
+            data = _data_columns(columns, keys)
+            names = ", ".join(data)
+            same = " AND ".join(f"s.{c} IS m.{c}" for c in data)
+            tx.execute(
+                f"""
+                INSERT INTO {SHARD_ALIAS}.{table} ({names})
+                SELECT {names} FROM main.{table} AS m
+                WHERE m.guild_id = ? AND NOT EXISTS (SELECT 1 FROM {SHARD_ALIAS}.{table} AS s WHERE {same})
+                """,
+                (guild_id,),
+            )
+            return
+        # Keyed tables: catalog rows are only written while sharding is off, so
+        # they are newer than a shard row with the same key and replace it.
+        names = ", ".join(columns)
+        same_key = " AND ".join(f"s.{c} = m.{c}" for c in keys)
+        same = " AND ".join(f"s.{c} IS m.{c}" for c in columns)
+        row = tx.query_one(
+            f"""
+            SELECT COUNT(*) AS n FROM main.{table} AS m JOIN {SHARD_ALIAS}.{table} AS s ON {same_key}
+            WHERE m.guild_id = ? AND NOT ({same})
+            """,
+            (guild_id,),
+        )
+        if row is not None and row["n"]:
+            print(f"Sharding: {row['n']} {table} row(s) of guild {guild_id} replace shard rows with the same key")
+        tx.execute(
+            f"INSERT OR REPLACE INTO {SHARD_ALIAS}.{table} ({names}) SELECT {names} FROM main.{table} AS m WHERE m.guild_id = ?",
+            (guild_id,),
+        )
+
+    def drop_guild(self, guild_id: int) -> None:
+        with self._shards_lock:
+            shard = self._shards.pop(guild_id, None)
+        if shard is not None:
+            shard.close()
+        path = self.shard_path(guild_id)
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{path}{suffix}").unlink(missing_ok=True)
+
+    def flush(self) -> None:
+        super().flush()
+        for shard in list(self._shards.values()):
+            shard.flush()
+
+    def close(self) -> None:
+        with self._shards_lock:
+            shards = list(self._shards.values())
+            self._shards.clear()
+        for shard in shards:
+            shard.close()
+        super().close()
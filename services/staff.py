@@ -0,0 +1,48 @@
+from typing import Optional
+
+from services.cache import ConfigCache
+from services.database import Database
+
+
+class StaffWhitelistStore:
+    def __init__(self, db: Database, cache: Optional[ConfigCache] = None) -> None:
+        self._db = db
+        self._cache = cache or ConfigCache()
+
+    def _load_level(self, user_id: int) -> Optional[str]:
+        row = self._db.query_one("SELECT level FROM staff_whitelist WHERE user_id = ?", (user_id,))
+        if row is None:
+            return None
+        return str(row["level"])
+
+    def _written(self, user_id: int) -> None:
+        # Commit before dropping the entry so the next load cannot read the old row.
+        self._db.flush()
+        self._cache.invalidate(("staff_whitelist", user_id))
+
+    def get_level(self, user_id: int) -> Optional[str]:
+        return self._cache.get(("staff_whitelist", user_id), lambda: self._load_level(user_id))
+
+    def set_level(self, user_id: int, level: str) -> None:
+        self._db.execute(
+            """
+            INSERT INTO staff_whitelist (user_id, level)
+            VALUES (?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET level = excluded.level
+            """,
+            (user_id, level),
+        )
+        self._written(user_id)
+
+    def remove(self, user_id: int) -> None:
+        self._db.execute("DELETE FROM staff_whitelist WHERE user_id = ?", (user_id,))
+        self._written(user_id)
+
+    async def get_level_async(self, user_id: int) -> Optional[str]:
+        return await self._cache.get_async(("staff_whitelist", user_id), lambda: self._load_level(user_id), self._db)
+
+    async def set_level_async(self, user_id: int, level: str) -> None:
+        await self._db.run(self.set_level, user_id, level)
+
+    async def remove_async(self, user_id: int) -> None:
+        await self._db.run(self.remove, user_id)
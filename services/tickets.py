@@ -2,7 +2,9 @@ from dataclasses import dataclass
 from typing import Optional
 import datetime
 
-from services.database import Database
+from services.cache import ConfigCache
+from services.database import Database, row_datetime, to_epoch_ms
+from services.migrations import time_sql
 
 
 @dataclass
@@ -16,11 +18,27 @@ class Ticket:
 
 
 class TicketService:
-    def __init__(self, db: Database) -> None:
+    def __init__(self, db: Database, cache: Optional[ConfigCache] = None) -> None:
         self._db = db
+        self._cache = cache or ConfigCache()
+
+    def _row_to_ticket(self, row) -> Ticket:
+        return Ticket(
+            id=row["id"],
+            priority=row["priority"],
+            status=row["status"],
+            reporter_id=row["reporter_id"],
+            escalated_by=row["escalated_by"],
+            updated_at=row_datetime(row, "updated"),
+        )
+
+    def _written(self, table: str, guild_id: int) -> None:
+        # Commit before dropping the entry so the next load cannot read the old row.
+        self._db.for_guild(guild_id).flush()
+        self._cache.invalidate((table, guild_id))
 
     def set_category(self, guild_id: int, category_id: int) -> None:
-        self._db.execute(
+        self._db.for_guild(guild_id).execute(
             """
             INSERT INTO ticket_config (guild_id, category_id)
             VALUES (?, ?)
@@ -28,9 +46,13 @@ class TicketService:
             """,
             (guild_id, category_id),
         )
+        self._written("ticket_config", guild_id)
 
     def get_category(self, guild_id: int) -> Optional[int]:
-        row = self._db.query_one(
+        return self._cache.get(("ticket_config", guild_id), lambda: self._load_category(guild_id))
+
+    def _load_category(self, guild_id: int) -> Optional[int]:
+        row = self._db.for_guild(guild_id).query_one(
             "SELECT category_id FROM ticket_config WHERE guild_id = ?",
             (guild_id,),
         )
@@ -39,7 +61,7 @@ class TicketService:
         return int(row["category_id"])
 
     def set_transcript_channel(self, guild_id: int, channel_id: int) -> None:
-        self._db.execute(
+        self._db.for_guild(guild_id).execute(
             """
             INSERT INTO ticket_transcripts (guild_id, channel_id)
             VALUES (?, ?)
@@ -47,9 +69,13 @@ class TicketService:
             """,
             (guild_id, channel_id),
         )
+        self._written("ticket_transcripts", guild_id)
 
     def get_transcript_channel(self, guild_id: int) -> Optional[int]:
-        row = self._db.query_one(
+        return self._cache.get(("ticket_transcripts", guild_id), lambda: self._load_transcript_channel(guild_id))
+
+    def _load_transcript_channel(self, guild_id: int) -> Optional[int]:
+        row = self._db.for_guild(guild_id).query_one(
             "SELECT channel_id FROM ticket_transcripts WHERE guild_id = ?",
             (guild_id,),
         )
@@ -61,21 +87,18 @@ class TicketService:
         priority = priority.lower()
         if priority not in {"low", "medium", "high", "critical"}:
             priority = "medium"
-        now = datetime.datetime.utcnow().isoformat()
-        row = self._db.query_one("SELECT MAX(id) AS max_id FROM tickets", ())
-        next_id = 1
-        if row is not None and row["max_id"] is not None:
-            next_id = int(row["max_id"]) + 1
-        self._db.execute(
-            """
-            INSERT INTO tickets (id, priority, status, reporter_id, escalated_by, updated_at)
-            VALUES (?, ?, 'open', ?, NULL, ?)
-            """,
-            (next_id, priority, reporter_id, now),
-        )
-        ticket = self.get_ticket(next_id)
-        assert ticket is not None
-        return ticket
+        now = datetime.datetime.utcnow()
+        with self._db.transaction() as tx:
+            row = tx.query_one(
+                """
+                INSERT INTO tickets (id, priority, status, reporter_id, escalated_by, updated_at, updated_ms)
+                SELECT COALESCE(MAX(id), 0) + 1, ?, 'open', ?, NULL, ?, ? FROM tickets
+                RETURNING *
+                """,
+                (priority, reporter_id, now.isoformat(), to_epoch_ms(now)),
+            )
+        assert row is not None
+        return self._row_to_ticket(row)
 
     def link_channel(self, ticket_id: int, guild_id: int, channel_id: int) -> None:
         self._db.execute(
@@ -108,77 +131,57 @@ class TicketService:
         )
         if row is None:
             return None
-        updated_at = datetime.datetime.fromisoformat(row["updated_at"])
-        return Ticket(
-            id=row["id"],
-            priority=row["priority"],
-            status=row["status"],
-            reporter_id=row["reporter_id"],
-            escalated_by=row["escalated_by"],
-            updated_at=updated_at,
-        )
+        return self._row_to_ticket(row)
 
     def get_open_ticket_for_user(self, guild_id: int, user_id: int) -> Optional[Ticket]:
         row = self._db.query_one(
-            """
+            f"""
             SELECT t.*
             FROM tickets t
             JOIN ticket_channels c ON t.id = c.ticket_id
             WHERE c.guild_id = ? AND t.reporter_id = ? AND t.status = 'open'
-            ORDER BY t.updated_at DESC
+            ORDER BY {time_sql(self._db, 't.updated')} DESC
             LIMIT 1
             """,
             (guild_id, user_id),
         )
         if row is None:
             return None
-        updated_at = datetime.datetime.fromisoformat(row["updated_at"])
-        return Ticket(
-            id=row["id"],
-            priority=row["priority"],
-            status=row["status"],
-            reporter_id=row["reporter_id"],
-            escalated_by=row["escalated_by"],
-            updated_at=updated_at,
-        )
+        return self._row_to_ticket(row)
 
     def escalate_ticket(self, ticket_id: int, priority: str, escalated_by: int) -> Ticket:
         priority = priority.lower()
         if priority not in {"low", "medium", "high", "critical"}:
             priority = "medium"
-        now = datetime.datetime.utcnow().isoformat()
-        existing = self._db.query_one(
-            "SELECT id FROM tickets WHERE id = ?",
-            (ticket_id,),
-        )
-        if existing is None:
-            self._db.execute(
-                """
-                INSERT INTO tickets (id, priority, status, reporter_id, escalated_by, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                (ticket_id, priority, "escalated", None, escalated_by, now),
-            )
-        else:
-            self._db.execute(
+        now = datetime.datetime.utcnow()
+        with self._db.transaction() as tx:
+            row = tx.query_one(
                 """
-                UPDATE tickets
-                SET priority = ?, status = 'escalated', escalated_by = ?, updated_at = ?
-                WHERE id = ?
+                INSERT INTO tickets (id, priority, status, reporter_id, escalated_by, updated_at, updated_ms)
+                VALUES (?, ?, 'escalated', NULL, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    priority = excluded.priority,
+                    status = 'escalated',
+                    escalated_by = excluded.escalated_by,
+                    updated_at = excluded.updated_at,
+                    updated_ms = excluded.updated_ms
+                RETURNING *
                 """,
-                (priority, escalated_by, now, ticket_id),
+                (ticket_id, priority, escalated_by, now.isoformat(), to_epoch_ms(now)),
             )
-        ticket = self.get_ticket(ticket_id)
-        assert ticket is not None
-        return ticket
+        assert row is not None
+        return self._row_to_ticket(row)
 
     def close_ticket(self, ticket_id: int) -> Optional[Ticket]:
-        now = datetime.datetime.utcnow().isoformat()
-        self._db.execute(
-            "UPDATE tickets SET status = 'closed', updated_at = ? WHERE id = ?",
-            (now, ticket_id),
-        )
-        return self.get_ticket(ticket_id)
+        now = datetime.datetime.utcnow()
+        with self._db.transaction() as tx:
+            row = tx.query_one(
+                "UPDATE tickets SET status = 'closed', updated_at = ?, updated_ms = ? WHERE id = ? RETURNING *",
+                (now.isoformat(), to_epoch_ms(now), ticket_id),
+            )
+        if row is None:
+            return None
+        return self._row_to_ticket(row)
 
     def get_ticket(self, ticket_id: int) -> Optional[Ticket]:
         row = self._db.query_one(
@@ -187,12 +190,51 @@ class TicketService:
         )
         if row is None:
             return None
-        updated_at = datetime.datetime.fromisoformat(row["updated_at"])
-        return Ticket(
-            id=row["id"],
-            priority=row["priority"],
-            status=row["status"],
-            reporter_id=row["reporter_id"],
-            escalated_by=row["escalated_by"],
-            updated_at=updated_at,
+        return self._row_to_ticket(row)
+
+    async def set_category_async(self, guild_id: int, category_id: int) -> None:
+        await self._db.for_guild(guild_id).run(self.set_category, guild_id, category_id)
+
+    async def get_category_async(self, guild_id: int) -> Optional[int]:
+        return await self._cache.get_async(
+            ("ticket_config", guild_id),
+            lambda: self._load_category(guild_id),
+            self._db.for_guild(guild_id),
         )
+
+    async def set_transcript_channel_async(self, guild_id: int, channel_id: int) -> None:
+        await self._db.for_guild(guild_id).run(self.set_transcript_channel, guild_id, channel_id)
+
+    async def get_transcript_channel_async(self, guild_id: int) -> Optional[int]:
+        return await self._cache.get_async(
+            ("ticket_transcripts", guild_id),
+            lambda: self._load_transcript_channel(guild_id),
+            self._db.for_guild(guild_id),
+        )
+
+    async def create_ticket_async(self, reporter_id: int, priority: str = "medium") -> Ticket:
+        return await self._db.run(self.create_ticket, reporter_id, priority)
+
+    async def link_channel_async(self, ticket_id: int, guild_id: int, channel_id: int, *, durable: bool = False) -> None:
+        if durable:
+            await self._db.run_durable(self.link_channel, ticket_id, guild_id, channel_id)
+        else:
+            await self._db.run(self.link_channel, ticket_id, guild_id, channel_id)
+
+    async def get_channel_for_ticket_async(self, ticket_id: int) -> Optional[int]:
+        return await self._db.run_read(self.get_channel_for_ticket, ticket_id)
+
+    async def get_ticket_by_channel_async(self, guild_id: int, channel_id: int) -> Optional[Ticket]:
+        return await self._db.run_read(self.get_ticket_by_channel, guild_id, channel_id)
+
+    async def get_open_ticket_for_user_async(self, guild_id: int, user_id: int) -> Optional[Ticket]:
+        return await self._db.run_read(self.get_open_ticket_for_user, guild_id, user_id)
+
+    async def escalate_ticket_async(self, ticket_id: int, priority: str, escalated_by: int) -> Ticket:
+        return await self._db.run(self.escalate_ticket, ticket_id, priority, escalated_by)
+
+    async def close_ticket_async(self, ticket_id: int) -> Optional[Ticket]:
+        return await self._db.run(self.close_ticket, ticket_id)
+
+    async def get_ticket_async(self, ticket_id: int) -> Optional[Ticket]:
+        return await self._db.run_read(self.get_ticket, ticket_id)